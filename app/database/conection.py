@@ -0,0 +1,177 @@
+# =================================================================================
+# MÓDULO DE GERENCIAMENTO DE CONEXÕES (conection.py)
+# Local: app/database/conection.py
+# =================================================================================
+
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from queue import LifoQueue, Empty, Full
+
+logger = logging.getLogger(__name__)
+
+# PRAGMAs aplicados em toda conexão nova (uma única vez, na abertura).
+DEFAULT_PRAGMAS = ["PRAGMA foreign_keys = ON;"]
+
+
+class ConnectionPool:
+    """
+    Pool pequeno de conexões SQLite de longa duração (checkout/return).
+
+    As conexões são abertas sob demanda, configuradas uma única vez
+    (row_factory e PRAGMAs) e devolvidas ao pool depois de cada uso, evitando
+    o custo de abrir e fechar o arquivo do banco a cada consulta.
+    """
+
+    def __init__(self, db_path: str, max_size: int = 4, pragmas: list = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.pragmas = list(pragmas) if pragmas is not None else list(DEFAULT_PRAGMAS)
+        # LIFO: a conexão usada mais recentemente é a primeira a ser reutilizada
+        # (caches de página "quentes").
+        self._idle = LifoQueue(maxsize=max_size)
+        self._closed = False
+
+    def _open(self) -> sqlite3.Connection:
+        """Abre e configura uma nova conexão física com o banco de dados."""
+        # check_same_thread=False: a conexão pode ser devolvida ao pool e
+        # reutilizada por outra thread do Flet (nunca por duas ao mesmo tempo).
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        logger.info(f"Nova conexão do pool aberta para '{self.db_path}'.")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """Retira uma conexão ociosa do pool ou abre uma nova se não houver."""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return self._open()
+
+    def release(self, conn: sqlite3.Connection):
+        """Devolve a conexão ao pool, descartando-a se o pool estiver cheio ou fechado."""
+        try:
+            # Nunca devolve ao pool uma conexão com transação pendente.
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Conexão quebrada: descarta.
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except Full:
+            self._discard(conn)
+
+    @staticmethod
+    def _discard(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager usado pela camada de consultas.
+
+        Entrega uma conexão do pool (ou None se não for possível conectar,
+        mantendo o contrato de get_db_connection) e a devolve ao final. Se o
+        bloco levantar uma exceção, a transação pendente é desfeita.
+        """
+        try:
+            conn = self.acquire()
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao conectar ao banco de dados SQLite: {e}", exc_info=True)
+            yield None
+            return
+        try:
+            yield conn
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """Fecha todas as conexões ociosas e impede que novas sejam guardadas."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                break
+
+
+class CheckpointScheduler:
+    """
+    Thread em segundo plano que mantém o arquivo -wal limitado.
+
+    A cada `interval` segundos executa um checkpoint PASSIVE (não bloqueia
+    leitores nem escritores). Se o arquivo -wal passar de `max_wal_bytes`,
+    executa um checkpoint TRUNCATE para zerá-lo.
+    """
+
+    def __init__(self, db_path: str, interval: float = 30.0, max_wal_bytes: int = 16 * 1024 * 1024):
+        self.db_path = db_path
+        self.interval = interval
+        self.max_wal_bytes = max_wal_bytes
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def wal_path(self) -> str:
+        return self.db_path + "-wal"
+
+    def wal_size(self) -> int:
+        """Tamanho atual do arquivo -wal em bytes (0 se não existir)."""
+        try:
+            return os.path.getsize(self.wal_path)
+        except OSError:
+            return 0
+
+    def checkpoint(self) -> tuple:
+        """Executa um checkpoint agora e retorna (busy, paginas_wal, paginas_copiadas)."""
+        mode = "TRUNCATE" if self.wal_size() > self.max_wal_bytes else "PASSIVE"
+        conn = sqlite3.connect(self.db_path, timeout=1.0)
+        try:
+            result = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+            logger.debug(f"Checkpoint {mode} executado: {result}")
+            return tuple(result)
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except sqlite3.Error as e:
+                logger.warning(f"Falha no checkpoint do WAL: {e}")
+
+    def start(self):
+        """Inicia a thread de checkpoint (idempotente)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="wal-checkpoint", daemon=True)
+        self._thread.start()
+        logger.info(f"Agendador de checkpoint do WAL iniciado (intervalo de {self.interval}s).")
+
+    def stop(self):
+        """Para a thread e faz um último checkpoint."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.checkpoint()
+        except sqlite3.Error as e:
+            logger.warning(f"Falha no checkpoint final do WAL: {e}")
@@ -2,9 +2,15 @@
 # MÓDULO DE BANCO DE DADOS (database.py)
 # =================================================================================
 
+import contextvars
 import sqlite3
 import logging
 import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from .conection import ConnectionPool, CheckpointScheduler
+from .migrations import run_migrations
 
 # Configuração básica do logger para registrar eventos importantes.
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,6 +21,37 @@ DB_FILE = "dose_certa.db"
 # Garante que o caminho do banco de dados seja na raiz do projeto para fácil acesso.
 DB_PATH = os.path.join(os.getcwd(), DB_FILE)
 
+# =================================================================================
+# PERFIS DE DESEMPENHO (PRAGMAs aplicados a cada conexão do pool)
+# =================================================================================
+
+DB_PROFILES = {
+    # Modo tradicional: rollback journal e fsync completo a cada commit.
+    "compatibilidade": [
+        "PRAGMA foreign_keys = ON;",
+        "PRAGMA journal_mode = DELETE;",
+        "PRAGMA synchronous = FULL;",
+    ],
+    # WAL: leitores não bloqueiam escritores e os commits não fazem fsync
+    # (apenas os checkpoints), mantendo a durabilidade contra falhas do app.
+    "desempenho": [
+        "PRAGMA foreign_keys = ON;",
+        "PRAGMA journal_mode = WAL;",
+        "PRAGMA synchronous = NORMAL;",
+        "PRAGMA cache_size = -8000;",  # ~8 MB de cache de páginas
+        "PRAGMA mmap_size = 67108864;",  # 64 MB mapeados em memória
+        "PRAGMA temp_store = MEMORY;",
+        "PRAGMA busy_timeout = 5000;",
+    ],
+}
+
+# Perfil ativo. Pode ser alterado pela variável de ambiente DOSE_CERTA_DB_PROFILE.
+DB_PROFILE = os.environ.get("DOSE_CERTA_DB_PROFILE", "desempenho")
+
+# Intervalo (s) e tamanho máximo do arquivo -wal usados pelo agendador de checkpoint.
+WAL_CHECKPOINT_INTERVAL = 30.0
+WAL_MAX_BYTES = 16 * 1024 * 1024
+
 def get_db_connection():
     """Cria e retorna um objeto de conexão com o banco de dados SQLite."""
     try:
@@ -30,6 +67,213 @@ def get_db_connection():
         logger.error(f"Erro ao conectar ao banco de dados SQLite: {e}", exc_info=True)
         return None
 
+def get_profile_pragmas(profile: str = None) -> list:
+    """Retorna a lista de PRAGMAs de um perfil (o perfil ativo se nenhum for informado)."""
+    name = profile or DB_PROFILE
+    if name not in DB_PROFILES:
+        logger.warning(f"Perfil de banco '{name}' desconhecido. Usando 'compatibilidade'.")
+        name = "compatibilidade"
+    return DB_PROFILES[name]
+
+# Pool de conexões de longa duração usado pela camada de consultas (queries.py).
+_pool = ConnectionPool(DB_PATH, pragmas=get_profile_pragmas())
+# Agendador de checkpoint do WAL (criado por start_checkpoint_scheduler).
+_checkpoint_scheduler = None
+
+def db_connection():
+    """
+    Retorna um context manager que empresta uma conexão do pool.
+
+    Uso: `with db_connection() as conn:`. A conexão já vem com row_factory e
+    PRAGMAs configurados e volta ao pool ao final do bloco (conn é None se a
+    conexão falhar). Dentro de use_establishment(), a conexão é a do banco
+    daquele estabelecimento.
+    """
+    establishment = _current_establishment.get()
+    if establishment is None:
+        return _pool.connection()
+    return _tenant_pool(establishment).connection()
+
+def set_database_path(path: str, profile: str = None):
+    """
+    Aponta o módulo para outro arquivo de banco (ex.: testes e benchmarks),
+    recriando o pool. Opcionalmente troca o perfil de desempenho.
+    """
+    global DB_PATH, DB_PROFILE, _pool
+    stop_checkpoint_scheduler()
+    _pool.close_all()
+    DB_PATH = path
+    if profile:
+        DB_PROFILE = profile
+    _pool = ConnectionPool(DB_PATH, pragmas=get_profile_pragmas())
+
+def start_checkpoint_scheduler():
+    """Inicia o checkpoint periódico do WAL quando o perfil ativo usa WAL."""
+    global _checkpoint_scheduler
+    if "PRAGMA journal_mode = WAL;" not in get_profile_pragmas():
+        return None
+    if _checkpoint_scheduler is None:
+        _checkpoint_scheduler = CheckpointScheduler(
+            DB_PATH, interval=WAL_CHECKPOINT_INTERVAL, max_wal_bytes=WAL_MAX_BYTES
+        )
+    _checkpoint_scheduler.start()
+    return _checkpoint_scheduler
+
+def is_checkpoint_scheduler_running() -> bool:
+    return _checkpoint_scheduler is not None
+
+def stop_checkpoint_scheduler():
+    """Para o checkpoint periódico (executando um checkpoint final)."""
+    global _checkpoint_scheduler
+    if _checkpoint_scheduler is not None:
+        _checkpoint_scheduler.stop()
+        _checkpoint_scheduler = None
+
+def close_pool():
+    """Fecha as conexões ociosas do pool (ex.: ao encerrar o aplicativo)."""
+    _pool.close_all()
+    close_tenant_pools()
+
+# =================================================================================
+# BANCOS POR ESTABELECIMENTO (IMPLANTAÇÕES COMPARTILHADAS)
+# =================================================================================
+# Quando um mesmo backend atende vários bares, cada estabelecimento tem o seu
+# próprio arquivo de banco (mesmo esquema e migrações, criado no primeiro uso).
+# O estabelecimento atual fica em uma ContextVar: dentro de use_establishment(),
+# db_connection() empresta conexões do pool daquele arquivo e toda a camada de
+# consultas enxerga apenas os dados dele, sem filtros por estabelecimento nas
+# consultas e com os índices de sempre. Fora dele vale o banco principal
+# (DB_PATH), como no aplicativo de um só bar.
+#
+# Threads novas começam sem estabelecimento (a ContextVar não é herdada). Os
+# caches em memória dos serviços (códigos de barras, fichas, cardápio) têm uma
+# instância por arquivo de banco (DatabaseScoped), e os objetos ligados a um
+# banco (ex.: MenuAvailability) guardam o estabelecimento em que foram criados.
+
+# Pasta dos bancos por estabelecimento. Pode ser alterada pela variável de
+# ambiente DOSE_CERTA_TENANT_DIR.
+TENANT_DIR = os.environ.get("DOSE_CERTA_TENANT_DIR", os.path.join(os.getcwd(), "estabelecimentos"))
+# Pools abertos ao mesmo tempo (os menos usados recentemente são fechados) e
+# conexões ociosas guardadas por pool. Cada conexão em WAL usa 3 arquivos
+# abertos (banco, -wal e -shm); reabrir um banco fechado custa ~2 ms, porque a
+# última conexão a fechar apaga o -wal.
+TENANT_MAX_POOLS = 256
+TENANT_POOL_SIZE = 1
+
+_current_establishment = contextvars.ContextVar("estabelecimento_atual", default=None)
+_tenant_pools = OrderedDict()
+_tenant_lock = threading.Lock()
+# Estabelecimentos cujo banco já foi criado/migrado neste processo: reabrir um
+# pool fechado pelo LRU não repete a criação das tabelas.
+_tenant_ready = set()
+
+def tenant_database_path(id_estabelecimento: int) -> str:
+    """Caminho do arquivo de banco de um estabelecimento."""
+    return os.path.join(TENANT_DIR, f"estabelecimento_{int(id_estabelecimento):06d}.db")
+
+def get_current_establishment():
+    """Estabelecimento atual (None = banco principal)."""
+    return _current_establishment.get()
+
+def current_database_path() -> str:
+    """Arquivo de banco usado por db_connection() neste contexto."""
+    establishment = _current_establishment.get()
+    return DB_PATH if establishment is None else tenant_database_path(establishment)
+
+@contextmanager
+def use_establishment(id_estabelecimento: int):
+    """
+    Direciona as consultas do bloco para o banco do estabelecimento.
+
+    Uso: `with use_establishment(id_estabelecimento): queries.get_all_items_with_details()`.
+    None volta ao banco principal (ex.: um objeto criado fora de qualquer estabelecimento).
+    """
+    token = _current_establishment.set(None if id_estabelecimento is None else int(id_estabelecimento))
+    try:
+        yield
+    finally:
+        _current_establishment.reset(token)
+
+def _tenant_pool(id_estabelecimento: int) -> ConnectionPool:
+    """Pool do banco do estabelecimento (aberto e migrado no primeiro uso)."""
+    with _tenant_lock:
+        pool = _tenant_pools.get(id_estabelecimento)
+        if pool is not None:
+            _tenant_pools.move_to_end(id_estabelecimento)
+            return pool
+        os.makedirs(TENANT_DIR, exist_ok=True)
+        pool = ConnectionPool(tenant_database_path(id_estabelecimento), max_size=TENANT_POOL_SIZE,
+                              pragmas=get_profile_pragmas())
+        if id_estabelecimento not in _tenant_ready:
+            with pool.connection() as conn:
+                if conn is not None:
+                    _create_schema(conn)
+                    _tenant_ready.add(id_estabelecimento)
+        _tenant_pools[id_estabelecimento] = pool
+        while len(_tenant_pools) > TENANT_MAX_POOLS:
+            # Conexões emprestadas do pool fechado são descartadas ao voltar.
+            _tenant_pools.popitem(last=False)[1].close_all()
+        return pool
+
+class DatabaseScoped:
+    """
+    Uma instância de `factory()` por arquivo de banco, para os caches em memória
+    dos serviços. Atributos e métodos são os da instância do banco atual
+    (current_database_path()), então um cache nunca responde com dados de outro
+    estabelecimento. Guarda as TENANT_MAX_POOLS + 1 instâncias usadas mais
+    recentemente; uma descartada é recriada vazia no próximo uso.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instances = OrderedDict()
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Instância do banco atual (criada no primeiro uso)."""
+        path = current_database_path()
+        with self._lock:
+            instance = self._instances.get(path)
+            if instance is not None:
+                self._instances.move_to_end(path)
+                return instance
+            instance = self._instances[path] = self._factory()
+            while len(self._instances) > TENANT_MAX_POOLS + 1:
+                self._instances.popitem(last=False)
+            return instance
+
+    def listener(self, method: str):
+        """
+        Função para os queries.add_*_change_listener: chama `method` na instância
+        do banco em que a escrita foi feita, se ela existir (sem instância, não
+        há nada em cache para invalidar).
+        """
+        def notify(*args):
+            with self._lock:
+                instance = self._instances.get(current_database_path())
+            if instance is not None:
+                getattr(instance, method)(*args)
+        return notify
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+def close_tenant_pools(id_estabelecimento: int = None):
+    """Fecha o pool de um estabelecimento (ou de todos)."""
+    with _tenant_lock:
+        ids = list(_tenant_pools) if id_estabelecimento is None else [id_estabelecimento]
+        for establishment in ids:
+            pool = _tenant_pools.pop(establishment, None)
+            if pool is not None:
+                pool.close_all()
+
+def set_tenant_directory(path: str):
+    """Aponta os bancos por estabelecimento para outra pasta (ex.: testes e benchmarks)."""
+    global TENANT_DIR
+    close_tenant_pools()
+    _tenant_ready.clear()
+    TENANT_DIR = path
+
 # Lista contendo os comandos SQL para criar cada uma das tabelas do aplicativo.
 CREATE_TABLES_SQL = [
     """
@@ -119,26 +363,29 @@ CREATE_TABLES_SQL = [
     """
 ]
 
-def initialize_database():
-    """Executa o script de criação de todas as tabelas do banco de dados."""
-    logger.info("Iniciando a inicialização do banco de dados...")
-    conn = get_db_connection()
-    if conn is None:
-        logger.error("Não foi possível inicializar o banco de dados: falha na conexão.")
-        return
+def _create_schema(conn: sqlite3.Connection):
+    """Cria as tabelas que faltarem e aplica as migrações pendentes."""
     try:
         cursor = conn.cursor()
         for table_sql in CREATE_TABLES_SQL:
             cursor.execute(table_sql)
         conn.commit()
-        logger.info("Todas as tabelas foram criadas ou já existiam. Banco de dados pronto para uso.")
+        logger.info("Todas as tabelas foram criadas ou já existiam.")
+        # Atualiza bancos existentes no lugar (índices, novas colunas, etc.).
+        run_migrations(conn)
+        logger.info("Banco de dados pronto para uso.")
     except sqlite3.Error as e:
         logger.error(f"Ocorreu um erro ao criar as tabelas: {e}", exc_info=True)
         conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-            logger.info("Conexão com o banco de dados fechada.")
+
+def initialize_database():
+    """Executa o script de criação de todas as tabelas do banco de dados."""
+    logger.info(f"Iniciando a inicialização do banco de dados (perfil '{DB_PROFILE}')...")
+    with db_connection() as conn:
+        if conn is None:
+            logger.error("Não foi possível inicializar o banco de dados: falha na conexão.")
+            return
+        _create_schema(conn)
 
 # Permite que este script seja executado diretamente para inicializar o banco.
 if __name__ == '__main__':
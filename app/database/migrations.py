@@ -0,0 +1,553 @@
+# =================================================================================
+# MÓDULO DE MIGRAÇÕES DO ESQUEMA (migrations.py)
+# Local: app/database/migrations.py
+# =================================================================================
+
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# =================================================================================
+# CAPTURA DE MUDANÇAS PARA A SINCRONIZAÇÃO COM A NUVEM
+# =================================================================================
+
+# Tabelas acompanhadas: todas as de CREATE_TABLES_SQL e as de pedidos. Tabelas
+# derivadas (saldos_estoque, snapshots, itens_busca) ficam de fora: são
+# reconstruídas a partir das demais em cada aparelho.
+# Para cada tabela, None = qualquer UPDATE é registrado; uma tupla = só UPDATEs
+# dessas colunas (itens.quantidade_estoque é derivada do livro e muda a cada
+# venda; registrá-la encheria a fila de envio). Ao acrescentar colunas a uma
+# tabela com lista, recrie o trigger de UPDATE dela em uma nova migração.
+CHANGE_CAPTURE_TABLES = {
+    "usuarios": None,
+    "estabelecimentos": None,
+    "categorias": None,
+    "unidades_medida": None,
+    "itens": ("id_categoria", "id_unidade_medida", "nome", "custo_unitario", "codigo_barras", "ativo",
+              "id_ficha_tecnica"),
+    "locais_estoque": None,
+    "contagens": None,
+    "contagem_itens": None,
+    "movimentacoes_estoque": None,
+    "fichas_tecnicas": None,
+    "ficha_tecnica_itens": None,
+    "cardapio_categorias": None,
+    "cardapio_itens": None,
+    "pedidos": None,
+    "pedido_itens": None,
+}
+
+# Enquanto esta chave existir em app_metadados, nada é registrado (ex.: ao
+# aplicar mudanças que vieram da nuvem, que não devem voltar para a fila).
+# Quem a cria e apaga na mesma transação não afeta as outras conexões.
+CAPTURE_PAUSED_KEY = "sync_captura_pausada"
+
+
+def _change_capture_sql(table: str, update_columns: tuple = None) -> list:
+    """Triggers que registram em sync_outbox cada INSERT/UPDATE/DELETE da tabela."""
+    when = f"WHEN NOT EXISTS (SELECT 1 FROM app_metadados WHERE chave = '{CAPTURE_PAUSED_KEY}')"
+    update_of = f"UPDATE OF {', '.join(update_columns)}" if update_columns else "UPDATE"
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_ai AFTER INSERT ON {table} {when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', new.id, 'I');
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_au AFTER {update_of} ON {table} {when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', new.id, 'U');
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_sync_ad AFTER DELETE ON {table} {when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', old.id, 'D');
+        END;
+        """,
+        # Linhas que já existiam antes da captura entram na fila para o primeiro envio.
+        f"INSERT INTO sync_outbox (tabela, id_linha, operacao) SELECT '{table}', id, 'I' FROM {table} ORDER BY id;",
+    ]
+
+
+# --- Versões por linha/campo (relógio lógico híbrido) ----------------------------
+
+# Tabelas de livro: só recebem inserções, e a junção entre aparelhos é a união
+# das linhas (nada é sobrescrito nem apagado). Não precisam de versões.
+LEDGER_TABLES = ("contagens", "contagem_itens", "movimentacoes_estoque")
+# Tabelas de cadastro com junção campo a campo: edições de campos diferentes
+# da mesma linha em aparelhos diferentes são todas mantidas.
+FIELD_MERGE_TABLES = {
+    "itens": CHANGE_CAPTURE_TABLES["itens"],
+    "categorias": ("nome",),
+    "unidades_medida": ("nome", "sigla"),
+}
+# As demais tabelas sincronizadas têm uma versão por linha (vence a mais nova).
+
+# Relógio lógico híbrido em um só inteiro: milissegundos desde 1970 * 65536 +
+# contador. A cada escrita: relógio = MAX(relógio + 1, agora * 65536), então
+# ele acompanha o relógio de parede e nunca anda para trás.
+_NOW_HLC_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER) * 65536"
+_TICK_SQL = f"UPDATE sync_relogio SET hlc = MAX(hlc + 1, {_NOW_HLC_SQL}) WHERE id = 1;"
+
+
+def _versioned_capture_sql(table: str, update_columns: tuple = None) -> list:
+    """
+    Recria os triggers de captura de uma tabela versionada: além da fila de
+    envio, avançam o relógio e gravam a versão em sync_versoes. Nas tabelas de
+    FIELD_MERGE_TABLES a versão da linha (coluna '') é a da criação e cada
+    edição versiona só os campos alterados; um campo sem versão própria vale
+    a da linha. Nas demais, toda escrita versiona a linha inteira.
+    """
+    when = f"WHEN NOT EXISTS (SELECT 1 FROM app_metadados WHERE chave = '{CAPTURE_PAUSED_KEY}')"
+    upsert = """
+            ON CONFLICT (tabela, id_linha, coluna) DO UPDATE SET hlc = excluded.hlc, origem = NULL;"""
+    hlc = "(SELECT hlc FROM sync_relogio WHERE id = 1)"
+    field_columns = FIELD_MERGE_TABLES.get(table)
+    if field_columns:
+        changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in field_columns)
+        versions = " UNION ALL ".join(
+            f"SELECT '{c}' AS coluna WHERE old.{c} IS NOT new.{c}" for c in field_columns)
+        update_of, update_when = f"UPDATE OF {', '.join(field_columns)}", f"{when} AND ({changed})"
+        update_versions = f"SELECT '{table}', new.id, coluna, {hlc}, NULL FROM ({versions}) WHERE true"
+    else:
+        update_of = f"UPDATE OF {', '.join(update_columns)}" if update_columns else "UPDATE"
+        update_when = when
+        update_versions = f"SELECT '{table}', new.id, '', {hlc}, NULL WHERE true"
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_sync_ai;",
+        f"DROP TRIGGER IF EXISTS trg_{table}_sync_au;",
+        f"DROP TRIGGER IF EXISTS trg_{table}_sync_ad;",
+        f"""
+        CREATE TRIGGER trg_{table}_sync_ai AFTER INSERT ON {table} {when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', new.id, 'I');
+            {_TICK_SQL}
+            INSERT INTO sync_versoes (tabela, id_linha, coluna, hlc, origem)
+            SELECT '{table}', new.id, '', {hlc}, NULL WHERE true{upsert}
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_{table}_sync_au AFTER {update_of} ON {table} {update_when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', new.id, 'U');
+            {_TICK_SQL}
+            INSERT INTO sync_versoes (tabela, id_linha, coluna, hlc, origem)
+            {update_versions}{upsert}
+        END;
+        """,
+        # A exclusão deixa uma "lápide" (versão da linha) e descarta as dos campos.
+        f"""
+        CREATE TRIGGER trg_{table}_sync_ad AFTER DELETE ON {table} {when} BEGIN
+            INSERT INTO sync_outbox (tabela, id_linha, operacao) VALUES ('{table}', old.id, 'D');
+            {_TICK_SQL}
+            DELETE FROM sync_versoes WHERE tabela = '{table}' AND id_linha = old.id AND coluna != '';
+            INSERT INTO sync_versoes (tabela, id_linha, coluna, hlc, origem)
+            SELECT '{table}', old.id, '', {hlc}, NULL WHERE true{upsert}
+        END;
+        """,
+    ]
+
+
+# rowid de itens_busca a partir da migração 11: (tamanho do nome << 32) | id do
+# item. O FTS5 devolve as correspondências em ordem de rowid, ou seja, dos
+# nomes mais curtos (mais próximos do digitado) para os mais longos; uma busca
+# com ORDER BY rowid LIMIT n para nos n melhores sem ler as demais.
+# O id do item é rowid & SEARCH_KEY_ID_MASK.
+SEARCH_KEY_ID_MASK = 0xFFFFFFFF
+
+
+def _search_key(alias: str) -> str:
+    return f"((length({alias}.nome) << 32) | {alias}.id)"
+
+
+def _search_index_sql() -> list:
+    """Recria itens_busca com o rowid ordenado pelo tamanho do nome, e os triggers que a mantêm."""
+    triggers = ["trg_itens_busca_ai", "trg_itens_busca_au", "trg_itens_busca_ad", "trg_categorias_busca_au",
+                "trg_categorias_busca_ad", "trg_unidades_busca_au", "trg_unidades_busca_ad"]
+    return [
+        *[f"DROP TRIGGER IF EXISTS {name};" for name in triggers],
+        "DROP TABLE IF EXISTS itens_busca;",
+        """
+        CREATE VIRTUAL TABLE itens_busca USING fts5 (
+            nome, categoria, unidade,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """,
+        f"""
+        INSERT INTO itens_busca (rowid, nome, categoria, unidade)
+        SELECT {_search_key("i")}, i.nome, c.nome, u.nome
+        FROM itens i
+        LEFT JOIN categorias c ON i.id_categoria = c.id
+        LEFT JOIN unidades_medida u ON i.id_unidade_medida = u.id;
+        """,
+        f"""
+        CREATE TRIGGER trg_itens_busca_ai AFTER INSERT ON itens BEGIN
+            INSERT INTO itens_busca (rowid, nome, categoria, unidade) VALUES (
+                {_search_key("new")}, new.nome,
+                (SELECT nome FROM categorias WHERE id = new.id_categoria),
+                (SELECT nome FROM unidades_medida WHERE id = new.id_unidade_medida)
+            );
+        END;
+        """,
+        # O rowid muda junto com o tamanho do nome: apaga e insere de novo.
+        f"""
+        CREATE TRIGGER trg_itens_busca_au
+        AFTER UPDATE OF nome, id_categoria, id_unidade_medida ON itens BEGIN
+            DELETE FROM itens_busca WHERE rowid = {_search_key("old")};
+            INSERT INTO itens_busca (rowid, nome, categoria, unidade) VALUES (
+                {_search_key("new")}, new.nome,
+                (SELECT nome FROM categorias WHERE id = new.id_categoria),
+                (SELECT nome FROM unidades_medida WHERE id = new.id_unidade_medida)
+            );
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_itens_busca_ad AFTER DELETE ON itens BEGIN
+            DELETE FROM itens_busca WHERE rowid = {_search_key("old")};
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_categorias_busca_au AFTER UPDATE OF nome ON categorias BEGIN
+            UPDATE itens_busca SET categoria = new.nome
+            WHERE rowid IN (SELECT {_search_key("itens")} FROM itens WHERE id_categoria = new.id);
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_categorias_busca_ad AFTER DELETE ON categorias BEGIN
+            UPDATE itens_busca SET categoria = NULL
+            WHERE rowid IN (SELECT {_search_key("itens")} FROM itens WHERE id_categoria = old.id);
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_unidades_busca_au AFTER UPDATE OF nome ON unidades_medida BEGIN
+            UPDATE itens_busca SET unidade = new.nome
+            WHERE rowid IN (SELECT {_search_key("itens")} FROM itens WHERE id_unidade_medida = new.id);
+        END;
+        """,
+        f"""
+        CREATE TRIGGER trg_unidades_busca_ad AFTER DELETE ON unidades_medida BEGIN
+            UPDATE itens_busca SET unidade = NULL
+            WHERE rowid IN (SELECT {_search_key("itens")} FROM itens WHERE id_unidade_medida = old.id);
+        END;
+        """,
+    ]
+
+
+# =================================================================================
+# LISTA ORDENADA DE MIGRAÇÕES
+# Cada entrada é (versão, descrição, [comandos SQL]). A versão aplicada fica
+# gravada no próprio arquivo do banco via PRAGMA user_version, então bancos
+# antigos (dose_certa.db já existentes) são atualizados no lugar.
+# NUNCA altere uma migração já publicada: adicione uma nova no final.
+# =================================================================================
+
+MIGRATIONS = [
+    (
+        1,
+        "Índices secundários para as colunas de busca mais usadas",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_estabelecimentos_id_usuario ON estabelecimentos (id_usuario);",
+            "CREATE INDEX IF NOT EXISTS idx_locais_estoque_id_estabelecimento ON locais_estoque (id_estabelecimento);",
+            "CREATE INDEX IF NOT EXISTS idx_movimentacoes_item_data ON movimentacoes_estoque (id_item, data_movimentacao);",
+            "CREATE INDEX IF NOT EXISTS idx_movimentacoes_data ON movimentacoes_estoque (data_movimentacao);",
+            "CREATE INDEX IF NOT EXISTS idx_contagem_itens_contagem_item ON contagem_itens (id_contagem, id_item);",
+            "CREATE INDEX IF NOT EXISTS idx_contagem_itens_item ON contagem_itens (id_item);",
+            "CREATE INDEX IF NOT EXISTS idx_ficha_tecnica_itens_ficha ON ficha_tecnica_itens (id_ficha_tecnica);",
+            "CREATE INDEX IF NOT EXISTS idx_itens_codigo_barras ON itens (codigo_barras);",
+        ],
+    ),
+    (
+        2,
+        "Tabela de metadados do aplicativo (impressão digital do esquema e do catálogo)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS app_metadados (
+                chave TEXT PRIMARY KEY, valor TEXT NOT NULL,
+                atualizado_em TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+            );
+            """,
+        ],
+    ),
+    (
+        3,
+        "Busca textual (FTS5) sobre nomes de itens, categorias e unidades",
+        [
+            # Índices usados pelos triggers ao propagar renomeações de categorias/unidades.
+            "CREATE INDEX IF NOT EXISTS idx_itens_id_categoria ON itens (id_categoria);",
+            "CREATE INDEX IF NOT EXISTS idx_itens_id_unidade_medida ON itens (id_unidade_medida);",
+            # rowid da tabela de busca = itens.id. remove_diacritics permite
+            # achar "agua" em "Água"; prefix='2 3' acelera a busca por prefixo.
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS itens_busca USING fts5 (
+                nome, categoria, unidade,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            );
+            """,
+            """
+            INSERT INTO itens_busca (rowid, nome, categoria, unidade)
+            SELECT i.id, i.nome, c.nome, u.nome
+            FROM itens i
+            LEFT JOIN categorias c ON i.id_categoria = c.id
+            LEFT JOIN unidades_medida u ON i.id_unidade_medida = u.id;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_itens_busca_ai AFTER INSERT ON itens BEGIN
+                INSERT INTO itens_busca (rowid, nome, categoria, unidade) VALUES (
+                    new.id, new.nome,
+                    (SELECT nome FROM categorias WHERE id = new.id_categoria),
+                    (SELECT nome FROM unidades_medida WHERE id = new.id_unidade_medida)
+                );
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_itens_busca_au
+            AFTER UPDATE OF nome, id_categoria, id_unidade_medida ON itens BEGIN
+                UPDATE itens_busca SET
+                    nome = new.nome,
+                    categoria = (SELECT nome FROM categorias WHERE id = new.id_categoria),
+                    unidade = (SELECT nome FROM unidades_medida WHERE id = new.id_unidade_medida)
+                WHERE rowid = new.id;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_itens_busca_ad AFTER DELETE ON itens BEGIN
+                DELETE FROM itens_busca WHERE rowid = old.id;
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_categorias_busca_au AFTER UPDATE OF nome ON categorias BEGIN
+                UPDATE itens_busca SET categoria = new.nome
+                WHERE rowid IN (SELECT id FROM itens WHERE id_categoria = new.id);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_categorias_busca_ad AFTER DELETE ON categorias BEGIN
+                UPDATE itens_busca SET categoria = NULL
+                WHERE rowid IN (SELECT id FROM itens WHERE id_categoria = old.id);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_unidades_busca_au AFTER UPDATE OF nome ON unidades_medida BEGIN
+                UPDATE itens_busca SET unidade = new.nome
+                WHERE rowid IN (SELECT id FROM itens WHERE id_unidade_medida = new.id);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_unidades_busca_ad AFTER DELETE ON unidades_medida BEGIN
+                UPDATE itens_busca SET unidade = NULL
+                WHERE rowid IN (SELECT id FROM itens WHERE id_unidade_medida = old.id);
+            END;
+            """,
+        ],
+    ),
+    (
+        4,
+        "Livro de movimentações por local e saldos materializados por item/local",
+        [
+            # Movimentações passam a registrar o local; quantidade é gravada com sinal
+            # (+ entradas, - saídas), então o saldo é sempre a soma do livro.
+            "ALTER TABLE movimentacoes_estoque ADD COLUMN id_local_estoque INTEGER REFERENCES locais_estoque (id);",
+            "CREATE INDEX IF NOT EXISTS idx_movimentacoes_local_item ON movimentacoes_estoque (id_local_estoque, id_item);",
+            """
+            CREATE TABLE IF NOT EXISTS saldos_estoque (
+                id_item INTEGER NOT NULL, id_local_estoque INTEGER NOT NULL,
+                quantidade REAL NOT NULL DEFAULT 0,
+                atualizado_em TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+                PRIMARY KEY (id_item, id_local_estoque),
+                FOREIGN KEY (id_item) REFERENCES itens (id) ON DELETE CASCADE,
+                FOREIGN KEY (id_local_estoque) REFERENCES locais_estoque (id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_saldos_estoque_local ON saldos_estoque (id_local_estoque);",
+        ],
+    ),
+    (
+        5,
+        "Fotografias (snapshots) periódicas dos saldos para consultas históricas",
+        [
+            # Cabeçalho: o saldo fotografado corresponde exatamente às
+            # movimentações com id <= id_ultima_movimentacao daquele local.
+            """
+            CREATE TABLE IF NOT EXISTS snapshots_estoque (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, id_local_estoque INTEGER NOT NULL,
+                data_snapshot TEXT NOT NULL, id_ultima_movimentacao INTEGER NOT NULL DEFAULT 0,
+                id_contagem INTEGER,
+                FOREIGN KEY (id_local_estoque) REFERENCES locais_estoque (id) ON DELETE CASCADE,
+                FOREIGN KEY (id_contagem) REFERENCES contagens (id) ON DELETE SET NULL
+            );
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_snapshots_estoque_local_data ON snapshots_estoque (id_local_estoque, data_snapshot);",
+            """
+            CREATE TABLE IF NOT EXISTS snapshot_saldos (
+                id_snapshot INTEGER NOT NULL, id_item INTEGER NOT NULL, quantidade REAL NOT NULL,
+                PRIMARY KEY (id_snapshot, id_item),
+                FOREIGN KEY (id_snapshot) REFERENCES snapshots_estoque (id) ON DELETE CASCADE
+            ) WITHOUT ROWID;
+            """,
+        ],
+    ),
+    (
+        6,
+        "Índice de cobertura para o relatório de divergências de contagem",
+        [
+            # Com as quantidades no índice, o relatório agrega contagem_itens lendo
+            # só o índice (sem buscar cada linha na tabela). Substitui o índice
+            # simples em id_item, que passa a ser um prefixo deste.
+            """
+            CREATE INDEX IF NOT EXISTS idx_contagem_itens_item_quantidades
+            ON contagem_itens (id_item, id_contagem, quantidade_contada, quantidade_sistema);
+            """,
+            "DROP INDEX IF EXISTS idx_contagem_itens_item;",
+        ],
+    ),
+    (
+        7,
+        "Itens preparados: item produzido por uma ficha técnica (sub-receitas)",
+        [
+            # Um item com id_ficha_tecnica (ex.: "Xarope da casa") é feito pela ficha;
+            # quando ele aparece como ingrediente de outra ficha, é expandido nela.
+            "ALTER TABLE itens ADD COLUMN id_ficha_tecnica INTEGER REFERENCES fichas_tecnicas (id) ON DELETE SET NULL;",
+            "CREATE INDEX IF NOT EXISTS idx_itens_id_ficha_tecnica ON itens (id_ficha_tecnica);",
+            "CREATE INDEX IF NOT EXISTS idx_ficha_tecnica_itens_item ON ficha_tecnica_itens (id_item);",
+        ],
+    ),
+    (
+        8,
+        "Pedidos do delivery recebidos pelo cardápio digital",
+        [
+            # `codigo` é gerado pelo cliente (ou pelo servidor) e torna o envio
+            # idempotente: reenviar o mesmo pedido não o duplica. Nome e preço
+            # ficam copiados em pedido_itens, como estavam no momento do pedido.
+            """
+            CREATE TABLE IF NOT EXISTS pedidos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, codigo TEXT UNIQUE NOT NULL,
+                cliente_nome TEXT NOT NULL, cliente_telefone TEXT, endereco TEXT, observacoes TEXT,
+                total REAL NOT NULL, status TEXT NOT NULL DEFAULT 'recebido',
+                recebido_em TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS pedido_itens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, id_pedido INTEGER NOT NULL, id_cardapio_item INTEGER,
+                nome_venda TEXT NOT NULL, quantidade INTEGER NOT NULL, preco_unitario REAL NOT NULL,
+                observacao TEXT,
+                FOREIGN KEY (id_pedido) REFERENCES pedidos (id) ON DELETE CASCADE,
+                FOREIGN KEY (id_cardapio_item) REFERENCES cardapio_itens (id) ON DELETE SET NULL
+            );
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_pedidos_status_recebido ON pedidos (status, recebido_em);",
+            "CREATE INDEX IF NOT EXISTS idx_pedido_itens_pedido ON pedido_itens (id_pedido);",
+        ],
+    ),
+    (
+        9,
+        "Captura de mudanças (fila de envio) para a sincronização com a nuvem",
+        [
+            # versao é a ordem global das mudanças; AUTOINCREMENT garante que ela
+            # nunca volte atrás depois que as entradas já enviadas forem apagadas.
+            # Sem índices secundários: cada escrita acompanhada custa um único
+            # INSERT no fim da árvore.
+            """
+            CREATE TABLE IF NOT EXISTS sync_outbox (
+                versao INTEGER PRIMARY KEY AUTOINCREMENT, tabela TEXT NOT NULL, id_linha INTEGER NOT NULL,
+                operacao TEXT NOT NULL CHECK (operacao IN ('I', 'U', 'D')),
+                registrado_em TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+            );
+            """,
+            *[sql for table, columns in CHANGE_CAPTURE_TABLES.items() for sql in _change_capture_sql(table, columns)],
+        ],
+    ),
+    (
+        10,
+        "Versões por linha e por campo (relógio lógico híbrido) para juntar edições de vários aparelhos",
+        [
+            "CREATE TABLE IF NOT EXISTS sync_relogio (id INTEGER PRIMARY KEY CHECK (id = 1), hlc INTEGER NOT NULL);",
+            "INSERT OR IGNORE INTO sync_relogio (id, hlc) VALUES (1, 0);",
+            # coluna '' = versão da linha (ou lápide, se a linha foi apagada);
+            # origem = aparelho que fez a mudança (NULL = este aparelho).
+            """
+            CREATE TABLE IF NOT EXISTS sync_versoes (
+                tabela TEXT NOT NULL, id_linha INTEGER NOT NULL, coluna TEXT NOT NULL,
+                hlc INTEGER NOT NULL, origem TEXT,
+                PRIMARY KEY (tabela, id_linha, coluna)
+            ) WITHOUT ROWID;
+            """,
+            # Linhas de livro recebidas ganham id local (os ids de aparelhos diferentes
+            # colidem); o par (origem, id_origem) as identifica e evita duplicatas.
+            """
+            CREATE TABLE IF NOT EXISTS sync_ids (
+                tabela TEXT NOT NULL, origem TEXT NOT NULL, id_origem INTEGER NOT NULL, id_local INTEGER NOT NULL,
+                PRIMARY KEY (tabela, origem, id_origem)
+            ) WITHOUT ROWID;
+            """,
+            *[sql for table, columns in CHANGE_CAPTURE_TABLES.items() if table not in LEDGER_TABLES
+              for sql in _versioned_capture_sql(table, columns)],
+        ],
+    ),
+    (
+        11,
+        "Busca textual ordenada pelo tamanho do nome (rowid de itens_busca)",
+        _search_index_sql(),
+    ),
+    (
+        12,
+        "Identidade global das linhas sincronizadas (sync_ids para todas as tabelas)",
+        [
+            # Toda linha sincronizada é identificada por (aparelho que a criou, id lá).
+            # sync_ids passa a mapear também os cadastros; `apelido` = 1 marca um
+            # par ligado a uma linha que já existia aqui com a mesma chave natural
+            # (ex.: a categoria "Vinhos" criada nos dois aparelhos), que continua
+            # sendo enviada pela própria identidade.
+            "ALTER TABLE sync_ids ADD COLUMN apelido INTEGER NOT NULL DEFAULT 0;",
+            # Envio: id local -> identidade global das linhas que vieram de fora.
+            "CREATE INDEX IF NOT EXISTS idx_sync_ids_local ON sync_ids (tabela, id_local) WHERE apelido = 0;",
+        ],
+    ),
+]
+
+# Versão mais recente do esquema conhecida por este código.
+LATEST_VERSION = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Lê a versão do esquema gravada no arquivo do banco (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Aplica, em ordem, todas as migrações com versão maior que a do banco.
+    Cada migração roda em sua própria transação junto com a atualização do
+    user_version: ou ela é aplicada por inteiro, ou nada muda.
+    Retorna a versão final do esquema.
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        logger.info(f"Esquema do banco já está na versão {current}. Nenhuma migração pendente.")
+        return current
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Aplicando migração {version}: {description}")
+        try:
+            conn.execute("BEGIN")
+            for sql in statements:
+                conn.execute(sql)
+            # PRAGMA não aceita parâmetros; a versão vem da lista acima (inteiro).
+            conn.execute(f"PRAGMA user_version = {int(version)};")
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Falha ao aplicar a migração {version}: {e}", exc_info=True)
+            conn.rollback()
+            raise
+        current = version
+
+    logger.info(f"Migrações concluídas. Esquema na versão {current}.")
+    return current
+
+
+def explain_query_plan(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> list:
+    """Retorna as linhas de detalhe do EXPLAIN QUERY PLAN de uma consulta."""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+    return [row[3] for row in rows]
@@ -2,83 +2,278 @@
 # MÓDULO DE CONSULTAS AO BANCO DE DADOS (queries.py)
 # =================================================================================
 
+import json
 import logging
-from .database import get_db_connection
+import os
+import threading
+from .database import current_database_path, db_connection
+from .migrations import (
+    CAPTURE_PAUSED_KEY, CHANGE_CAPTURE_TABLES, LEDGER_TABLES, SEARCH_KEY_ID_MASK,
+    get_schema_version as _read_schema_version,
+)
 
 logger = logging.getLogger("DB_QUERIES")
 
+# Funções chamadas com o ID do item sempre que um item é criado, alterado ou
+# excluído por esta camada (ex.: caches em memória que precisam ser invalidados).
+# O aviso sai no contexto da escrita: dentro de use_establishment(),
+# current_database_path() diz de qual banco ela é (ver DatabaseScoped).
+_item_change_listeners = []
+
+
+def add_item_change_listener(listener):
+    """Registra uma função `listener(item_id)` chamada após cada escrita em itens."""
+    if listener not in _item_change_listeners:
+        _item_change_listeners.append(listener)
+
+
+def remove_item_change_listener(listener):
+    """Cancela o registro feito por add_item_change_listener (nada acontece se não estiver registrado)."""
+    if listener in _item_change_listeners:
+        _item_change_listeners.remove(listener)
+
+
+def _notify_item_change(item_id: int):
+    for listener in list(_item_change_listeners):
+        try:
+            listener(item_id)
+        except Exception as e:
+            logger.error(f"Erro ao notificar alteração do item ID {item_id}: {e}", exc_info=True)
+
+
+# Mesma ideia para as fichas técnicas: listener(id_ficha) após cada escrita
+# em fichas_tecnicas ou ficha_tecnica_itens.
+_recipe_change_listeners = []
+
+
+def add_recipe_change_listener(listener):
+    """Registra uma função `listener(id_ficha)` chamada após cada escrita em fichas técnicas."""
+    if listener not in _recipe_change_listeners:
+        _recipe_change_listeners.append(listener)
+
+
+def remove_recipe_change_listener(listener):
+    """Cancela o registro feito por add_recipe_change_listener (nada acontece se não estiver registrado)."""
+    if listener in _recipe_change_listeners:
+        _recipe_change_listeners.remove(listener)
+
+
+def _notify_recipe_change(recipe_id: int):
+    for listener in list(_recipe_change_listeners):
+        try:
+            listener(recipe_id)
+        except Exception as e:
+            logger.error(f"Erro ao notificar alteração da ficha técnica ID {recipe_id}: {e}", exc_info=True)
+
+
+# E para o cardápio: listener(id_cardapio_item) após cada escrita em cardapio_itens
+# (None para escritas em cardapio_categorias).
+_menu_change_listeners = []
+
+
+def add_menu_change_listener(listener):
+    """Registra uma função `listener(id_cardapio_item)` chamada após cada escrita no cardápio."""
+    if listener not in _menu_change_listeners:
+        _menu_change_listeners.append(listener)
+
+
+def remove_menu_change_listener(listener):
+    """Cancela o registro feito por add_menu_change_listener (nada acontece se não estiver registrado)."""
+    if listener in _menu_change_listeners:
+        _menu_change_listeners.remove(listener)
+
+
+def _notify_menu_change(menu_item_id: int):
+    for listener in list(_menu_change_listeners):
+        try:
+            listener(menu_item_id)
+        except Exception as e:
+            logger.error(f"Erro ao notificar alteração do item de cardápio ID {menu_item_id}: {e}", exc_info=True)
+
+
+# E para os saldos: listener(variacoes) após cada gravação no livro, com
+# variacoes = {(id_item, id_local_estoque): variação}, ou None quando todos os
+# saldos foram reconstruídos.
+_stock_change_listeners = []
+
+
+def add_stock_change_listener(listener):
+    """Registra uma função `listener(variacoes)` chamada após cada alteração de saldos."""
+    if listener not in _stock_change_listeners:
+        _stock_change_listeners.append(listener)
+
+
+def remove_stock_change_listener(listener):
+    """Cancela o registro feito por add_stock_change_listener (nada acontece se não estiver registrado)."""
+    if listener in _stock_change_listeners:
+        _stock_change_listeners.remove(listener)
+
+
+def _notify_stock_change(deltas_by_local):
+    for listener in list(_stock_change_listeners):
+        try:
+            listener(deltas_by_local)
+        except Exception as e:
+            logger.error(f"Erro ao notificar alteração de saldos: {e}", exc_info=True)
+
+# =================================================================================
+# CACHE DE DADOS DE REFERÊNCIA (categorias e unidades de medida)
+# =================================================================================
+# Tabelas pequenas que quase nunca mudam, mas que o formulário de itens lê a
+# cada abertura e as listagens juntavam a cada página. Ficam em memória por
+# arquivo de banco (o principal ou o do estabelecimento atual; a troca do
+# arquivo, como numa restauração de backup, muda a chave) e são invalidadas
+# pelas escritas desta camada: find_or_create_*, bulk_seed e os lotes da
+# sincronização. Escritas feitas por outro processo só aparecem depois de
+# invalidate_reference_cache().
+#
+# Cada invalidação avança a versão da tabela; uma leitura do banco que começou
+# antes dela não guarda o resultado (já velho) no cache.
+
+_REFERENCE_QUERIES = {
+    "categorias": "SELECT id, nome FROM categorias ORDER BY nome",
+    "unidades_medida": "SELECT id, nome, sigla FROM unidades_medida ORDER BY nome",
+}
+_reference_lock = threading.Lock()
+# (arquivo, tabela) -> (versão, linhas, {id: nome})
+_reference_cache = {}
+_reference_versions = {}
+_reference_generation = 0
+_reference_stats = {"acertos": 0, "faltas": 0, "invalidacoes": 0}
+
+
+def _reference_key(tabela: str) -> tuple:
+    path = current_database_path()
+    try:
+        return path, os.stat(path).st_ino, tabela
+    except OSError:
+        return path, None, tabela
+
+
+def _reference_entry(tabela: str) -> tuple:
+    """(linhas, {id: nome}) da tabela, do cache ou do banco."""
+    key = _reference_key(tabela)
+    with _reference_lock:
+        version = (_reference_generation, _reference_versions.get(key, 0))
+        cached = _reference_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _reference_stats["acertos"] += 1
+            return cached[1], cached[2]
+        _reference_stats["faltas"] += 1
+    with db_connection() as conn:
+        if conn is None:
+            return (), {}
+        rows = tuple(dict(row) for row in conn.execute(_REFERENCE_QUERIES[tabela]))
+    names = {row["id"]: row["nome"] for row in rows}
+    with _reference_lock:
+        if (_reference_generation, _reference_versions.get(key, 0)) == version:
+            _reference_cache[key] = (version, rows, names)
+    return rows, names
+
+
+def _invalidate_reference(tabela: str):
+    """Descarta a tabela do cache do banco atual (chamada depois de cada escrita nela)."""
+    key = _reference_key(tabela)
+    with _reference_lock:
+        _reference_versions[key] = _reference_versions.get(key, 0) + 1
+        _reference_cache.pop(key, None)
+        _reference_stats["invalidacoes"] += 1
+
+
+def invalidate_reference_cache():
+    """Descarta categorias e unidades em cache de todos os bancos (ex.: após escritas externas)."""
+    global _reference_generation
+    with _reference_lock:
+        _reference_generation += 1
+        _reference_cache.clear()
+        _reference_stats["invalidacoes"] += 1
+
+
+def get_reference_cache_stats() -> dict:
+    """Contadores do cache: {"acertos", "faltas", "invalidacoes"}."""
+    with _reference_lock:
+        return dict(_reference_stats)
+
+
+def _with_reference_names(rows) -> list:
+    """Linhas de itens (id, nome, id_categoria, id_unidade_medida) com os nomes de categoria e unidade."""
+    categories = _reference_entry("categorias")[1]
+    units = _reference_entry("unidades_medida")[1]
+    items = []
+    for row in rows:
+        item = dict(row)
+        item["categoria"] = categories.get(item["id_categoria"])
+        item["unidade"] = units.get(item["id_unidade_medida"])
+        items.append(item)
+    return items
+
 # ... (todas as funções anteriores como get_user_by_email, has_establishment, etc. permanecem aqui) ...
 
 
 def has_real_user() -> bool:
-    conn = get_db_connection()
-    if conn is None:
-        return True
-    try:
-        cursor = conn.execute(
-            "SELECT 1 FROM usuarios WHERE email != ?", ("admin@dosedata.com",)
-        )
-        return cursor.fetchone() is not None
-    except Exception as e:
-        logger.error(
-            f"Erro ao verificar a existência de usuário real: {e}", exc_info=True
-        )
-        return True
-    finally:
-        if conn:
-            conn.close()
+    with db_connection() as conn:
+        if conn is None:
+            return True
+        try:
+            cursor = conn.execute(
+                "SELECT 1 FROM usuarios WHERE email != ?", ("admin@dosedata.com",)
+            )
+            return cursor.fetchone() is not None
+        except Exception as e:
+            logger.error(
+                f"Erro ao verificar a existência de usuário real: {e}", exc_info=True
+            )
+            return True
 
 
 def get_user_by_email(email: str):
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.execute("SELECT * FROM usuarios WHERE email = ?", (email,))
         return cursor.fetchone()
-    finally:
-        if conn:
-            conn.close()
 
 
 def create_user(nome: str, email: str, senha_hash: str, whatsapp: str = None):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return
+        try:
+            conn.execute(
+                "INSERT INTO usuarios (nome, email, senha_hash, whatsapp) VALUES (?, ?, ?, ?)",
+                (nome, email, senha_hash, whatsapp),
+            )
+            conn.commit()
+        except conn.IntegrityError:
+            logger.warning(f"Usuário com e-mail '{email}' já existe no banco de dados.")
+
+
+def update_user_password_hash(user_id: int, senha_hash: str):
+    with db_connection() as conn:
+        if conn is None:
+            return
         conn.execute(
-            "INSERT INTO usuarios (nome, email, senha_hash, whatsapp) VALUES (?, ?, ?, ?)",
-            (nome, email, senha_hash, whatsapp),
+            "UPDATE usuarios SET senha_hash = ? WHERE id = ?", (senha_hash, user_id)
         )
         conn.commit()
-    except conn.IntegrityError:
-        logger.warning(f"Usuário com e-mail '{email}' já existe no banco de dados.")
-    finally:
-        if conn:
-            conn.close()
 
 
 def has_establishment(user_id: int) -> bool:
-    conn = get_db_connection()
-    if conn is None:
-        return False
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return False
         cursor = conn.execute(
             "SELECT 1 FROM estabelecimentos WHERE id_usuario = ?", (user_id,)
         )
         return cursor.fetchone() is not None
-    finally:
-        if conn:
-            conn.close()
 
 
 def complete_onboarding(
     user_id: int, user_name: str, establishment_name: str, location_name: str
 ):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return
         cursor = conn.cursor()
         cursor.execute(
             "UPDATE usuarios SET nome = ? WHERE id = ?", (user_name, user_id)
@@ -93,30 +288,22 @@ def complete_onboarding(
             (establishment_id, location_name),
         )
         conn.commit()
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_establishment_by_user_id(user_id: int):
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.execute(
             "SELECT * FROM estabelecimentos WHERE id_usuario = ?", (user_id,)
         )
         return cursor.fetchone()
-    finally:
-        if conn:
-            conn.close()
 
 
 def find_or_create_category(nome: str) -> int:
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM categorias WHERE nome = ?", (nome,))
         row = cursor.fetchone()
@@ -125,17 +312,14 @@ def find_or_create_category(nome: str) -> int:
         else:
             cursor.execute("INSERT INTO categorias (nome) VALUES (?)", (nome,))
             conn.commit()
+            _invalidate_reference("categorias")
             return cursor.lastrowid
-    finally:
-        if conn:
-            conn.close()
 
 
 def find_or_create_unit(nome: str, sigla: str) -> int:
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM unidades_medida WHERE nome = ?", (nome,))
         row = cursor.fetchone()
@@ -146,17 +330,14 @@ def find_or_create_unit(nome: str, sigla: str) -> int:
                 "INSERT INTO unidades_medida (nome, sigla) VALUES (?, ?)", (nome, sigla)
             )
             conn.commit()
+            _invalidate_reference("unidades_medida")
             return cursor.lastrowid
-    finally:
-        if conn:
-            conn.close()
 
 
 def create_item_if_not_exists(nome: str, id_categoria: int, id_unidade_medida: int):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return
         cursor = conn.cursor()
         cursor.execute("SELECT id FROM itens WHERE nome = ?", (nome,))
         row = cursor.fetchone()
@@ -166,9 +347,140 @@ def create_item_if_not_exists(nome: str, id_categoria: int, id_unidade_medida: i
                 (nome, id_categoria, id_unidade_medida),
             )
             conn.commit()
-    finally:
-        if conn:
-            conn.close()
+
+
+# =================================================================================
+# QUERIES DE METADADOS DO APLICATIVO
+# =================================================================================
+
+
+def get_metadata(chave: str):
+    """Lê um valor da tabela app_metadados (None se não existir ou se a tabela ainda não foi criada)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT valor FROM app_metadados WHERE chave = ?", (chave,)
+            ).fetchone()
+        except conn.OperationalError:
+            # Banco novo ou anterior à migração 2: ainda não há metadados.
+            return None
+        return row["valor"] if row else None
+
+
+def set_metadata(chave: str, valor: str):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute(
+            """
+            INSERT INTO app_metadados (chave, valor) VALUES (?, ?)
+            ON CONFLICT (chave) DO UPDATE SET
+                valor = excluded.valor, atualizado_em = datetime('now', 'localtime')
+            """,
+            (chave, valor),
+        )
+        conn.commit()
+
+
+def get_metadata_by_prefix(prefixo: str) -> dict:
+    """Todas as entradas de app_metadados cuja chave começa com `prefixo`: {chave: valor}."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        cursor = conn.execute(
+            "SELECT chave, valor FROM app_metadados WHERE substr(chave, 1, length(:p)) = :p ORDER BY chave",
+            {"p": prefixo},
+        )
+        return {row["chave"]: row["valor"] for row in cursor}
+
+
+def delete_metadata(chave: str):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("DELETE FROM app_metadados WHERE chave = ?", (chave,))
+        conn.commit()
+
+
+def get_schema_version():
+    """Versão do esquema (PRAGMA user_version) do banco atual; None sem conexão."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        return _read_schema_version(conn)
+
+
+# =================================================================================
+# QUERIES PARA O POVOAMENTO EM LOTE (seeder)
+# =================================================================================
+
+
+def count_missing_seed_rows(categories: list, units: list, item_names: list) -> int:
+    """
+    Conta, em UMA consulta, quantas categorias, unidades e itens do catálogo
+    ainda não existem no banco. As listas são enviadas como JSON e expandidas
+    com json_each, então o custo não depende de quantos parâmetros o SQLite aceita.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+        row = conn.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM json_each(?) j
+                  WHERE NOT EXISTS (SELECT 1 FROM categorias c WHERE c.nome = j.value))
+              + (SELECT COUNT(*) FROM json_each(?) j
+                  WHERE NOT EXISTS (SELECT 1 FROM unidades_medida u WHERE u.nome = j.value))
+              + (SELECT COUNT(*) FROM json_each(?) j
+                  WHERE NOT EXISTS (SELECT 1 FROM itens i WHERE i.nome = j.value))
+            """,
+            (json.dumps(categories), json.dumps(units), json.dumps(item_names)),
+        ).fetchone()
+        return row[0]
+
+
+def bulk_seed(categories: list, units: list, items: list) -> int:
+    """
+    Insere categorias, unidades e itens em uma única transação.
+
+    :param categories: Lista de nomes de categorias.
+    :param units: Lista de tuplas (nome, sigla).
+    :param items: Lista de tuplas (nome, nome_categoria, nome_unidade).
+    :return: Número de itens efetivamente inseridos.
+
+    Linhas já existentes são ignoradas (INSERT OR IGNORE) e as chaves
+    estrangeiras dos itens são resolvidas no próprio SQL pelos índices
+    UNIQUE de nome; itens com categoria ou unidade inexistentes são ignorados.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+        with conn:
+            new_categories = conn.executemany(
+                "INSERT OR IGNORE INTO categorias (nome) VALUES (?)",
+                ((nome,) for nome in categories),
+            ).rowcount
+            new_units = conn.executemany(
+                "INSERT OR IGNORE INTO unidades_medida (nome, sigla) VALUES (?, ?)",
+                units,
+            ).rowcount
+            # rowcount, e não total_changes: este também conta as linhas gravadas por triggers.
+            inserted = conn.executemany(
+                """
+                INSERT OR IGNORE INTO itens (nome, id_categoria, id_unidade_medida)
+                SELECT ?, c.id, u.id
+                FROM categorias c, unidades_medida u
+                WHERE c.nome = ? AND u.nome = ?
+                """,
+                items,
+            ).rowcount
+    if new_categories:
+        _invalidate_reference("categorias")
+    if new_units:
+        _invalidate_reference("unidades_medida")
+    return inserted
 
 
 # =================================================================================
@@ -176,27 +488,116 @@ def create_item_if_not_exists(nome: str, id_categoria: int, id_unidade_medida: i
 # =================================================================================
 
 
+# Colunas comuns às consultas de listagem de itens. Os nomes de categoria e
+# unidade vêm do cache de dados de referência (_with_reference_names), sem junções.
+_ITEM_LIST_SELECT = """
+    SELECT i.id, i.nome, i.id_categoria, i.id_unidade_medida
+    FROM itens i
+"""
+
+
 def get_all_items_with_details():
-    conn = get_db_connection()
-    if conn is None:
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        cursor = conn.execute(_ITEM_LIST_SELECT + " ORDER BY i.nome")
+        rows = cursor.fetchall()
+    return _with_reference_names(rows)
+
+
+def get_items_page(after: tuple = None, limit: int = 50):
+    """
+    Busca uma página de itens ordenada por (nome, id) usando paginação por
+    chave (keyset): em vez de OFFSET, continua a partir do último (nome, id)
+    já carregado, então o custo de cada página não cresce com a posição.
+
+    :param after: Tupla (nome, id) do último item da página anterior, ou None para a primeira.
+    :param limit: Quantidade máxima de itens na página.
+    :return: Lista de dicionários no mesmo formato de get_all_items_with_details.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        if after is None:
+            cursor = conn.execute(
+                _ITEM_LIST_SELECT + " ORDER BY i.nome, i.id LIMIT ?", (limit,)
+            )
+        else:
+            # A comparação de row values usa o índice UNIQUE de nome (que já
+            # carrega o rowid), sem varrer a tabela.
+            cursor = conn.execute(
+                _ITEM_LIST_SELECT
+                + " WHERE (i.nome, i.id) > (?, ?) ORDER BY i.nome, i.id LIMIT ?",
+                (after[0], after[1], limit),
+            )
+        rows = cursor.fetchall()
+    return _with_reference_names(rows)
+
+
+def _build_match_expression(text: str) -> str:
+    """
+    Converte o texto digitado em uma expressão MATCH do FTS5: cada palavra
+    vira um prefixo entre aspas ("gin tanq" -> "gin"* "tanq"*), e todas
+    precisam aparecer (E implícito). Aspas são escapadas.
+    """
+    tokens = [token.replace('"', '""') for token in text.split()]
+    return " ".join(f'"{token}"*' for token in tokens if token)
+
+
+# Melhores correspondências de uma expressão MATCH: o rowid de itens_busca
+# começa pelo tamanho do nome (migração 11), então ORDER BY rowid LIMIT já
+# devolve os nomes mais curtos sem ler nem ordenar as demais.
+_SEARCH_TOP_SQL = f"""
+    SELECT rowid & {SEARCH_KEY_ID_MASK} FROM itens_busca
+    WHERE itens_busca MATCH ?
+    ORDER BY rowid
+    LIMIT ?
+"""
+
+
+def search_items(text: str, limit: int = 50):
+    """
+    Busca itens por prefixo em nome, categoria e unidade (tabela FTS5
+    itens_busca). Ordem de relevância: primeiro os itens cujo NOME contém
+    todas as palavras, depois os que casam via categoria/unidade; dentro de
+    cada grupo, nomes mais curtos (mais próximos do digitado) primeiro.
+
+    A ordenação não usa bm25 de propósito: o bm25 precisa percorrer a lista
+    completa de cada termo para calcular suas estatísticas, o que custa
+    dezenas de ms em catálogos grandes com termos comuns. A ordem por
+    tamanho vem do próprio rowid do índice, e o LIMIT só corta os piores.
+    Retorna dicionários no mesmo formato de get_items_page.
+    """
+    expression = _build_match_expression(text)
+    if not expression:
         return []
-    try:
-        cursor = conn.execute(
-            """
-            SELECT 
-                i.id, i.nome, i.id_categoria, i.id_unidade_medida,
-                c.nome as categoria, 
-                u.nome as unidade 
-            FROM itens i
-            LEFT JOIN categorias c ON i.id_categoria = c.id
-            LEFT JOIN unidades_medida u ON i.id_unidade_medida = u.id
-            ORDER BY i.nome
-        """
-        )
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        if conn:
-            conn.close()
+    in_name = f"{{nome}} : ({expression})"
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        ranked = [(1, row[0]) for row in conn.execute(_SEARCH_TOP_SQL, (in_name, limit))]
+        if len(ranked) < limit:
+            ranked += [(0, row[0]) for row in conn.execute(
+                _SEARCH_TOP_SQL, (f"({expression}) NOT {in_name}", limit - len(ranked))
+            )]
+        if not ranked:
+            return []
+        priority = {item_id: group for group, item_id in ranked}
+        rows = conn.execute(
+            _ITEM_LIST_SELECT + " WHERE i.id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(priority)),),
+        ).fetchall()
+    rows.sort(key=lambda row: (-priority[row["id"]], len(row["nome"]), row["nome"]))
+    return _with_reference_names(rows)
+
+
+def get_item_with_details(item_id: int):
+    """Busca um item no mesmo formato das listagens (com nomes de categoria e unidade)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        row = conn.execute(_ITEM_LIST_SELECT + " WHERE i.id = ?", (item_id,)).fetchone()
+    return _with_reference_names([row])[0] if row else None
 
 
 # --- NOVA FUNÇÃO ---
@@ -204,85 +605,1286 @@ def get_item_by_id(item_id: int):
     """
     Busca um item específico pelo seu ID para preencher o formulário de edição.
     """
-    conn = get_db_connection()
-    if conn is None:
-        return None
-    try:
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.execute("SELECT * FROM itens WHERE id = ?", (item_id,))
         return cursor.fetchone()
-    finally:
-        if conn:
-            conn.close()
 
 
 def get_all_categories():
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    try:
-        cursor = conn.execute("SELECT id, nome FROM categorias ORDER BY nome")
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        if conn:
-            conn.close()
+    """Categorias ordenadas por nome (do cache de dados de referência)."""
+    return [dict(row) for row in _reference_entry("categorias")[0]]
 
 
 def get_all_units():
-    conn = get_db_connection()
-    if conn is None:
-        return []
-    try:
+    """Unidades de medida ordenadas por nome (do cache de dados de referência)."""
+    return [dict(row) for row in _reference_entry("unidades_medida")[0]]
+
+
+def add_item(nome: str, id_categoria: int, id_unidade_medida: int, codigo_barras: str = None) -> int:
+    """Insere um item e retorna o seu ID (None se já existir um item com o mesmo nome)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            cursor = conn.execute(
+                "INSERT INTO itens (nome, id_categoria, id_unidade_medida, codigo_barras) VALUES (?, ?, ?, ?)",
+                (nome, id_categoria, id_unidade_medida, codigo_barras or None),
+            )
+            conn.commit()
+            logger.info(f"QUERIES: Item '{nome}' adicionado com sucesso.")
+        except conn.IntegrityError:
+            logger.warning(f"QUERIES: Item com nome '{nome}' já existe.")
+            return None
+    _notify_item_change(cursor.lastrowid)
+    return cursor.lastrowid
+
+
+# Valor padrão de update_item: mantém o código de barras atual do item.
+_KEEP_BARCODE = object()
+
+
+def update_item(
+    item_id: int, nome: str, id_categoria: int, id_unidade_medida: int, codigo_barras=_KEEP_BARCODE
+):
+    """
+    Atualiza o cadastro de um item. Sem `codigo_barras`, o código atual é
+    mantido; "" ou None o apagam.
+    """
+    assignments = "nome = ?, id_categoria = ?, id_unidade_medida = ?"
+    params = [nome, id_categoria, id_unidade_medida]
+    if codigo_barras is not _KEEP_BARCODE:
+        assignments += ", codigo_barras = ?"
+        params.append(codigo_barras or None)
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute(f"UPDATE itens SET {assignments} WHERE id = ?", (*params, item_id))
+        conn.commit()
+        logger.info(f"QUERIES: Item ID {item_id} atualizado com sucesso.")
+    _notify_item_change(item_id)
+
+
+def delete_item(item_id: int):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("DELETE FROM itens WHERE id = ?", (item_id,))
+        conn.commit()
+        logger.info(f"QUERIES: Item ID {item_id} excluído com sucesso.")
+    _notify_item_change(item_id)
+
+
+def update_item_cost(item_id: int, custo_unitario: float):
+    """Atualiza o custo unitário de um item (base do custo das fichas técnicas)."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("UPDATE itens SET custo_unitario = ? WHERE id = ?", (custo_unitario, item_id))
+        conn.commit()
+        logger.info(f"QUERIES: Custo do item ID {item_id} atualizado para {custo_unitario}.")
+    _notify_item_change(item_id)
+
+
+# =================================================================================
+# QUERIES DE FICHAS TÉCNICAS
+# =================================================================================
+
+
+def create_recipe(nome: str, componentes: list, rendimento: float = 1, descricao: str = None) -> int:
+    """
+    Cria uma ficha técnica com seus componentes em uma transação.
+
+    :param componentes: Tuplas (id_item, quantidade) para o rendimento informado.
+    :return: O ID da ficha (None se já existir uma ficha com o mesmo nome).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO fichas_tecnicas (nome, descricao, rendimento) VALUES (?, ?, ?)",
+                    (nome, descricao, rendimento),
+                )
+                recipe_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO ficha_tecnica_itens (id_ficha_tecnica, id_item, quantidade) VALUES (?, ?, ?)",
+                    [(recipe_id, item_id, quantidade) for item_id, quantidade in componentes],
+                )
+            logger.info(f"QUERIES: Ficha técnica '{nome}' criada com {len(componentes)} componente(s).")
+        except conn.IntegrityError:
+            logger.warning(f"QUERIES: Ficha técnica com nome '{nome}' já existe.")
+            return None
+    _notify_recipe_change(recipe_id)
+    return recipe_id
+
+
+def update_recipe(recipe_id: int, nome: str, rendimento: float, descricao: str = None, componentes: list = None):
+    """Atualiza a ficha e, se `componentes` for informado, substitui todos os seus componentes."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        with conn:
+            conn.execute(
+                "UPDATE fichas_tecnicas SET nome = ?, rendimento = ?, descricao = ? WHERE id = ?",
+                (nome, rendimento, descricao, recipe_id),
+            )
+            if componentes is not None:
+                conn.execute("DELETE FROM ficha_tecnica_itens WHERE id_ficha_tecnica = ?", (recipe_id,))
+                conn.executemany(
+                    "INSERT INTO ficha_tecnica_itens (id_ficha_tecnica, id_item, quantidade) VALUES (?, ?, ?)",
+                    [(recipe_id, item_id, quantidade) for item_id, quantidade in componentes],
+                )
+        logger.info(f"QUERIES: Ficha técnica ID {recipe_id} atualizada com sucesso.")
+    _notify_recipe_change(recipe_id)
+
+
+def delete_recipe(recipe_id: int):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("DELETE FROM fichas_tecnicas WHERE id = ?", (recipe_id,))
+        conn.commit()
+        logger.info(f"QUERIES: Ficha técnica ID {recipe_id} excluída com sucesso.")
+    _notify_recipe_change(recipe_id)
+
+
+def set_item_recipe(item_id: int, recipe_id: int = None):
+    """Marca um item como preparado pela ficha `recipe_id` (None desfaz o vínculo)."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("UPDATE itens SET id_ficha_tecnica = ? WHERE id = ?", (recipe_id, item_id))
+        conn.commit()
+        logger.info(f"QUERIES: Item ID {item_id} vinculado à ficha técnica ID {recipe_id}.")
+    _notify_item_change(item_id)
+
+
+def get_recipe_graph() -> tuple:
+    """
+    Carrega tudo o que a expansão de fichas precisa, em três consultas:
+    ({id_ficha: (nome, rendimento)}, {id_ficha: [(id_item, quantidade)]},
+     {id_item: (nome, custo_unitario, id_ficha_tecnica)}).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {}, {}, {}
+        recipes = {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT id, nome, rendimento FROM fichas_tecnicas"
+        )}
+        components = {}
+        for recipe_id, item_id, quantidade in conn.execute(
+            "SELECT id_ficha_tecnica, id_item, quantidade FROM ficha_tecnica_itens ORDER BY id_ficha_tecnica, id"
+        ):
+            components.setdefault(recipe_id, []).append((item_id, quantidade))
+        items = {row[0]: (row[1], row[2], row[3]) for row in conn.execute(
+            "SELECT id, nome, custo_unitario, id_ficha_tecnica FROM itens"
+        )}
+        return recipes, components, items
+
+
+# =================================================================================
+# QUERIES DO CARDÁPIO
+# =================================================================================
+
+
+def find_or_create_menu_category(nome: str, ordem: int = 0) -> int:
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        row = conn.execute("SELECT id FROM cardapio_categorias WHERE nome = ?", (nome,)).fetchone()
+        if row:
+            return row["id"]
+        cursor = conn.execute("INSERT INTO cardapio_categorias (nome, ordem) VALUES (?, ?)", (nome, ordem))
+        conn.commit()
+    _notify_menu_change(None)
+    return cursor.lastrowid
+
+
+def add_menu_item(id_cardapio_categoria: int, nome_venda: str, preco_venda: float, id_item_estoque: int = None,
+                  id_ficha_tecnica: int = None, descricao: str = None) -> int:
+    """
+    Insere um item de cardápio. Ele baixa do estoque o próprio item
+    (id_item_estoque, ex.: uma long neck) ou os itens da ficha técnica.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
         cursor = conn.execute(
-            "SELECT id, nome, sigla FROM unidades_medida ORDER BY nome"
+            """
+            INSERT INTO cardapio_itens
+                (id_cardapio_categoria, id_item_estoque, id_ficha_tecnica, nome_venda, descricao, preco_venda)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (id_cardapio_categoria, id_item_estoque, id_ficha_tecnica, nome_venda, descricao, preco_venda),
         )
-        return [dict(row) for row in cursor.fetchall()]
-    finally:
-        if conn:
-            conn.close()
+        conn.commit()
+        logger.info(f"QUERIES: Item de cardápio '{nome_venda}' adicionado com sucesso.")
+    _notify_menu_change(cursor.lastrowid)
+    return cursor.lastrowid
 
 
-def add_item(nome: str, id_categoria: int, id_unidade_medida: int):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
+def update_menu_item(menu_item_id: int, id_cardapio_categoria: int, nome_venda: str, preco_venda: float,
+                     id_item_estoque: int = None, id_ficha_tecnica: int = None, descricao: str = None):
+    with db_connection() as conn:
+        if conn is None:
+            return
         conn.execute(
-            "INSERT INTO itens (nome, id_categoria, id_unidade_medida) VALUES (?, ?, ?)",
-            (nome, id_categoria, id_unidade_medida),
+            """
+            UPDATE cardapio_itens SET id_cardapio_categoria = ?, id_item_estoque = ?, id_ficha_tecnica = ?,
+                nome_venda = ?, descricao = ?, preco_venda = ?
+            WHERE id = ?
+            """,
+            (id_cardapio_categoria, id_item_estoque, id_ficha_tecnica, nome_venda, descricao, preco_venda,
+             menu_item_id),
         )
         conn.commit()
-        logger.info(f"QUERIES: Item '{nome}' adicionado com sucesso.")
-    except conn.IntegrityError:
-        logger.warning(f"QUERIES: Item com nome '{nome}' já existe.")
-    finally:
-        if conn:
-            conn.close()
-
-
-def update_item(item_id: int, nome: str, id_categoria: int, id_unidade_medida: int):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
-        conn.execute(
-            "UPDATE itens SET nome = ?, id_categoria = ?, id_unidade_medida = ? WHERE id = ?",
-            (nome, id_categoria, id_unidade_medida, item_id),
+        logger.info(f"QUERIES: Item de cardápio ID {menu_item_id} atualizado com sucesso.")
+    _notify_menu_change(menu_item_id)
+
+
+def delete_menu_item(menu_item_id: int):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("DELETE FROM cardapio_itens WHERE id = ?", (menu_item_id,))
+        conn.commit()
+        logger.info(f"QUERIES: Item de cardápio ID {menu_item_id} excluído com sucesso.")
+    _notify_menu_change(menu_item_id)
+
+
+def get_menu_items() -> list:
+    """Itens do cardápio com a categoria, na ordem de exibição."""
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        cursor = conn.execute(
+            """
+            SELECT ci.id, ci.nome_venda, ci.descricao, ci.preco_venda, ci.disponivel,
+                   ci.id_item_estoque, ci.id_ficha_tecnica,
+                   ci.id_cardapio_categoria, cc.nome AS categoria, cc.ordem AS categoria_ordem
+            FROM cardapio_itens ci
+            LEFT JOIN cardapio_categorias cc ON cc.id = ci.id_cardapio_categoria
+            ORDER BY cc.ordem, cc.nome, ci.nome_venda
+            """
         )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def set_menu_item_enabled(menu_item_id: int, disponivel: bool):
+    """Liga/desliga manualmente um item do cardápio (cardapio_itens.disponivel)."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("UPDATE cardapio_itens SET disponivel = ? WHERE id = ?", (int(disponivel), menu_item_id))
         conn.commit()
-        logger.info(f"QUERIES: Item ID {item_id} atualizado com sucesso.")
-    finally:
-        if conn:
-            conn.close()
+    _notify_menu_change(menu_item_id)
 
 
-def delete_item(item_id: int):
-    conn = get_db_connection()
-    if conn is None:
-        return
-    try:
-        conn.execute("DELETE FROM itens WHERE id = ?", (item_id,))
+def get_menu_item_sources() -> dict:
+    """Origem do estoque de cada item do cardápio: {id: (id_item_estoque, id_ficha_tecnica)}."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        return {row[0]: (row[1], row[2]) for row in conn.execute(
+            "SELECT id, id_item_estoque, id_ficha_tecnica FROM cardapio_itens"
+        )}
+
+
+# =================================================================================
+# QUERIES DE PEDIDOS (DELIVERY)
+# =================================================================================
+
+
+def save_orders(orders: list) -> dict:
+    """
+    Grava um lote de pedidos e seus itens em UMA transação.
+
+    :param orders: Dicionários com codigo, cliente_nome, cliente_telefone,
+                   endereco, observacoes, total, recebido_em e itens, uma lista
+                   de tuplas (id_cardapio_item, nome_venda, quantidade, preco_unitario, observacao).
+    :return: {codigo: id_pedido} de todo o lote (None em caso de falha). Um
+             código já gravado (reenvio) devolve o id existente, sem duplicar.
+    :raises sqlite3.IntegrityError: Algum pedido viola uma restrição (ex.: item
+             de cardápio que acabou de ser apagado); nada do lote é gravado.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        ids = {}
+        item_rows = []
+        try:
+            with conn:
+                for order in orders:
+                    cursor = conn.execute(
+                        """
+                        INSERT OR IGNORE INTO pedidos
+                            (codigo, cliente_nome, cliente_telefone, endereco, observacoes, total, recebido_em)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (order["codigo"], order["cliente_nome"], order.get("cliente_telefone"),
+                         order.get("endereco"), order.get("observacoes"), order["total"], order["recebido_em"]),
+                    )
+                    if cursor.rowcount == 0:
+                        ids[order["codigo"]] = conn.execute(
+                            "SELECT id FROM pedidos WHERE codigo = ?", (order["codigo"],)
+                        ).fetchone()[0]
+                        continue
+                    ids[order["codigo"]] = cursor.lastrowid
+                    item_rows.extend((cursor.lastrowid, *item) for item in order["itens"])
+                conn.executemany(
+                    """
+                    INSERT INTO pedido_itens
+                        (id_pedido, id_cardapio_item, nome_venda, quantidade, preco_unitario, observacao)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    item_rows,
+                )
+        except conn.IntegrityError:
+            # Erro do conteúdo de um pedido, não do banco: quem chama decide o que recusar.
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao gravar lote de {len(orders)} pedido(s): {e}", exc_info=True)
+            return None
+        return ids
+
+
+def get_orders(status: str = None, limit: int = 50) -> list:
+    """Pedidos mais recentes (opcionalmente de um status), cada um com a lista `itens`."""
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        orders = [dict(row) for row in conn.execute(
+            """
+            SELECT id, codigo, cliente_nome, cliente_telefone, endereco, observacoes, total, status, recebido_em
+            FROM pedidos WHERE (:status IS NULL OR status = :status)
+            ORDER BY recebido_em DESC, id DESC LIMIT :limit
+            """,
+            {"status": status, "limit": limit},
+        )]
+        if not orders:
+            return []
+        by_id = {order["id"]: order for order in orders}
+        for order in orders:
+            order["itens"] = []
+        placeholders = ", ".join("?" * len(by_id))
+        for row in conn.execute(
+            f"""
+            SELECT id_pedido, id_cardapio_item, nome_venda, quantidade, preco_unitario, observacao
+            FROM pedido_itens WHERE id_pedido IN ({placeholders}) ORDER BY id
+            """,
+            list(by_id),
+        ):
+            by_id[row["id_pedido"]]["itens"].append(dict(row))
+        return orders
+
+
+def update_order_status(order_id: int, status: str):
+    with db_connection() as conn:
+        if conn is None:
+            return
+        conn.execute("UPDATE pedidos SET status = ? WHERE id = ?", (status, order_id))
         conn.commit()
-        logger.info(f"QUERIES: Item ID {item_id} excluído com sucesso.")
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+        logger.info(f"QUERIES: Pedido ID {order_id} passou para '{status}'.")
+
+
+# =================================================================================
+# QUERIES DE CÓDIGO DE BARRAS
+# =================================================================================
+
+
+def get_item_by_barcode(codigo_barras: str):
+    """Busca um item ativo pelo código de barras (usa idx_itens_codigo_barras)."""
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT id, nome, codigo_barras FROM itens WHERE codigo_barras = ? AND ativo = 1",
+            (codigo_barras,),
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def get_barcode_index() -> list:
+    """Retorna (codigo_barras, id, nome) de todos os itens ativos que têm código de barras."""
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        cursor = conn.execute(
+            "SELECT codigo_barras, id, nome FROM itens WHERE codigo_barras IS NOT NULL AND ativo = 1"
+        )
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+# =================================================================================
+# QUERIES DO LIVRO DE MOVIMENTAÇÕES E SALDOS DE ESTOQUE
+# =================================================================================
+
+
+def _write_stock_movements(conn, movements: list, deltas_by_local: dict, deltas_by_item: dict):
+    """Grava movimentações e saldos na transação aberta em `conn` (ver apply_stock_movements)."""
+    conn.executemany(
+        """
+        INSERT INTO movimentacoes_estoque
+            (id_item, id_local_estoque, id_usuario, tipo_movimentacao, quantidade, observacao)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        movements,
+    )
+    _write_balance_deltas(conn, deltas_by_local, deltas_by_item)
+
+
+def _write_balance_deltas(conn, deltas_by_local: dict, deltas_by_item: dict):
+    """Soma variações aos saldos materializados (saldos_estoque e itens.quantidade_estoque)."""
+    conn.executemany(
+        """
+        INSERT INTO saldos_estoque (id_item, id_local_estoque, quantidade) VALUES (?, ?, ?)
+        ON CONFLICT (id_item, id_local_estoque) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            atualizado_em = datetime('now', 'localtime')
+        """,
+        [(item_id, local_id, delta) for (item_id, local_id), delta in deltas_by_local.items()],
+    )
+    conn.executemany(
+        "UPDATE itens SET quantidade_estoque = quantidade_estoque + ? WHERE id = ?",
+        [(delta, item_id) for item_id, delta in deltas_by_item.items()],
+    )
+
+
+def apply_stock_movements(movements: list, deltas_by_local: dict, deltas_by_item: dict) -> bool:
+    """
+    Grava movimentações no livro e atualiza os saldos materializados em UMA
+    transação: ou tudo é aplicado, ou nada muda.
+
+    :param movements: Tuplas (id_item, id_local_estoque, id_usuario, tipo, quantidade_com_sinal, observacao).
+    :param deltas_by_local: {(id_item, id_local_estoque): variação} já agregada.
+    :param deltas_by_item: {id_item: variação} já agregada (itens.quantidade_estoque).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return False
+        with conn:
+            _write_stock_movements(conn, movements, deltas_by_local, deltas_by_item)
+    _notify_stock_change(deltas_by_local)
+    return True
+
+
+def get_stock_balance(id_item: int, id_local_estoque: int) -> float:
+    """Saldo atual de um item em um local (leitura pela chave primária, O(1))."""
+    with db_connection() as conn:
+        if conn is None:
+            return 0.0
+        row = conn.execute(
+            "SELECT quantidade FROM saldos_estoque WHERE id_item = ? AND id_local_estoque = ?",
+            (id_item, id_local_estoque),
+        ).fetchone()
+        return row["quantidade"] if row else 0.0
+
+
+def get_stock_balances_by_local(id_local_estoque: int) -> dict:
+    """Saldos de todos os itens de um local: {id_item: quantidade}."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        cursor = conn.execute(
+            "SELECT id_item, quantidade FROM saldos_estoque WHERE id_local_estoque = ?",
+            (id_local_estoque,),
+        )
+        return {row["id_item"]: row["quantidade"] for row in cursor.fetchall()}
+
+
+def get_ledger_totals() -> tuple:
+    """
+    Recalcula os saldos somando o livro inteiro.
+    Retorna ({(id_item, id_local): soma}, {id_item: soma}).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {}, {}
+        by_local = {
+            (row[0], row[1]): row[2]
+            for row in conn.execute(
+                """
+                SELECT id_item, id_local_estoque, SUM(quantidade) FROM movimentacoes_estoque
+                WHERE id_local_estoque IS NOT NULL
+                GROUP BY id_item, id_local_estoque
+                """
+            )
+        }
+        by_item = {
+            row[0]: row[1]
+            for row in conn.execute(
+                "SELECT id_item, SUM(quantidade) FROM movimentacoes_estoque GROUP BY id_item"
+            )
+        }
+        return by_local, by_item
+
+
+def get_materialized_balances() -> tuple:
+    """Lê os saldos materializados: ({(id_item, id_local): saldo}, {id_item: quantidade_estoque})."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}, {}
+        by_local = {
+            (row[0], row[1]): row[2]
+            for row in conn.execute("SELECT id_item, id_local_estoque, quantidade FROM saldos_estoque")
+        }
+        by_item = {
+            row[0]: row[1] for row in conn.execute("SELECT id, quantidade_estoque FROM itens")
+        }
+        return by_local, by_item
+
+
+def replace_materialized_balances(by_local: dict, by_item: dict):
+    """Substitui todos os saldos materializados pelos valores informados (uma transação)."""
+    with db_connection() as conn:
+        if conn is None:
+            return
+        with conn:
+            conn.execute("DELETE FROM saldos_estoque")
+            conn.executemany(
+                "INSERT INTO saldos_estoque (id_item, id_local_estoque, quantidade) VALUES (?, ?, ?)",
+                [(item_id, local_id, qty) for (item_id, local_id), qty in by_local.items()],
+            )
+            conn.execute("UPDATE itens SET quantidade_estoque = 0")
+            conn.executemany(
+                "UPDATE itens SET quantidade_estoque = ? WHERE id = ?",
+                [(qty, item_id) for item_id, qty in by_item.items()],
+            )
+    _notify_stock_change(None)
+
+
+# =================================================================================
+# QUERIES DE FOTOGRAFIAS (SNAPSHOTS) DE SALDO
+# =================================================================================
+
+
+def create_stock_snapshot(id_local_estoque: int, data_snapshot: str = None, id_contagem: int = None) -> int:
+    """
+    Fotografa os saldos materializados de um local. A leitura do último id do
+    livro e a cópia dos saldos acontecem na mesma transação de escrita, então
+    a fotografia é exatamente a soma das movimentações até esse id.
+    Retorna o id da fotografia.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        with conn:
+            # BEGIN IMMEDIATE: nenhuma outra escrita entra entre a leitura e a cópia.
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM movimentacoes_estoque WHERE id_local_estoque = ?",
+                (id_local_estoque,),
+            ).fetchone()[0]
+            cursor = conn.execute(
+                """
+                INSERT INTO snapshots_estoque (id_local_estoque, data_snapshot, id_ultima_movimentacao, id_contagem)
+                VALUES (?, COALESCE(?, datetime('now', 'localtime')), ?, ?)
+                """,
+                (id_local_estoque, data_snapshot, last_id, id_contagem),
+            )
+            snapshot_id = cursor.lastrowid
+            conn.execute(
+                """
+                INSERT INTO snapshot_saldos (id_snapshot, id_item, quantidade)
+                SELECT ?, id_item, quantidade FROM saldos_estoque
+                WHERE id_local_estoque = ? AND quantidade != 0
+                """,
+                (snapshot_id, id_local_estoque),
+            )
+        return snapshot_id
+
+
+def has_snapshot_since(id_local_estoque: int, desde: str) -> bool:
+    with db_connection() as conn:
+        if conn is None:
+            return True
+        row = conn.execute(
+            "SELECT 1 FROM snapshots_estoque WHERE id_local_estoque = ? AND data_snapshot >= ? LIMIT 1",
+            (id_local_estoque, desde),
+        ).fetchone()
+        return row is not None
+
+
+def get_all_stock_location_ids() -> list:
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        return [row[0] for row in conn.execute("SELECT id FROM locais_estoque ORDER BY id")]
+
+
+def get_balances_as_of(id_local_estoque: int, as_of: str, id_item: int = None) -> dict:
+    """
+    Saldos de um local no instante `as_of` ('AAAA-MM-DD HH:MM:SS'): parte da
+    fotografia mais recente até esse instante e soma apenas as movimentações
+    posteriores a ela (em vez de somar o livro desde o início).
+
+    :param id_item: Se informado, calcula só o saldo desse item.
+    :return: {id_item: quantidade}
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        snapshot = conn.execute(
+            """
+            SELECT id, id_ultima_movimentacao FROM snapshots_estoque
+            WHERE id_local_estoque = ? AND data_snapshot <= ?
+            ORDER BY data_snapshot DESC, id DESC LIMIT 1
+            """,
+            (id_local_estoque, as_of),
+        ).fetchone()
+        snapshot_id, last_id = (snapshot[0], snapshot[1]) if snapshot else (None, 0)
+        item_filter = "" if id_item is None else " AND id_item = :item"
+        params = {"local": id_local_estoque, "as_of": as_of, "snap": snapshot_id, "last": last_id, "item": id_item}
+
+        balances = {}
+        if snapshot_id is not None:
+            for row in conn.execute(
+                "SELECT id_item, quantidade FROM snapshot_saldos WHERE id_snapshot = :snap" + item_filter,
+                params,
+            ):
+                balances[row[0]] = row[1]
+        # Delta: só as movimentações posteriores à fotografia (id > last_id).
+        # Para um item, o índice (id_local_estoque, id_item) + rowid já dá a faixa;
+        # para o local inteiro, o "+" desliga esse índice e força a faixa de id
+        # na chave primária (senão o SQLite varreria todo o histórico do local).
+        local_filter = "id_local_estoque = :local" if id_item is not None else "+id_local_estoque = :local"
+        for row in conn.execute(
+            "SELECT id_item, SUM(quantidade) FROM movimentacoes_estoque "
+            "WHERE " + local_filter + " AND id > :last AND data_movimentacao <= :as_of"
+            + item_filter + " GROUP BY id_item",
+            params,
+        ):
+            balances[row[0]] = balances.get(row[0], 0.0) + row[1]
+        return balances
+
+
+# =================================================================================
+# QUERIES DE CONTAGEM DE ESTOQUE
+# =================================================================================
+
+
+def save_stock_count(id_local_estoque: int, id_usuario: int, observacoes: str, count_rows: list,
+                     adjustments: list = None, data_contagem: str = None, adjust_to_counted: bool = False) -> int:
+    """
+    Grava uma contagem inteira em UMA transação: o cabeçalho em contagens,
+    todas as linhas de contagem_itens com um único executemany e, se houver,
+    os ajustes de estoque resultantes.
+
+    :param count_rows: Tuplas (id_item, quantidade_contada, quantidade_sistema).
+    :param adjustments: Tuplas (id_item, variacao) a lançar no livro como 'ajuste'.
+    :param adjust_to_counted: Se True (no lugar de `adjustments`), o ajuste de cada
+                              item é contado - saldo atual, lido na mesma transação:
+                              vendas e movimentações feitas durante a contagem já
+                              estão no saldo e não são descontadas de novo.
+    :return: O id da contagem criada (None em caso de falha).
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        with conn:
+            cursor = conn.execute(
+                """
+                INSERT INTO contagens (id_local_estoque, id_usuario, data_contagem, observacoes)
+                VALUES (?, ?, COALESCE(?, datetime('now', 'localtime')), ?)
+                """,
+                (id_local_estoque, id_usuario, data_contagem, observacoes),
+            )
+            count_id = cursor.lastrowid
+            conn.executemany(
+                """
+                INSERT INTO contagem_itens (id_contagem, id_item, quantidade_contada, quantidade_sistema)
+                VALUES (?, ?, ?, ?)
+                """,
+                [(count_id, item_id, counted, system) for item_id, counted, system in count_rows],
+            )
+            if adjust_to_counted:
+                current = dict(conn.execute(
+                    """
+                    SELECT id_item, quantidade FROM saldos_estoque
+                    WHERE id_local_estoque = ? AND id_item IN (SELECT value FROM json_each(?))
+                    """,
+                    (id_local_estoque, json.dumps([row[0] for row in count_rows])),
+                ).fetchall())
+                adjustments = [(item_id, counted - current.get(item_id, 0.0)) for item_id, counted, _system in count_rows
+                               if counted != current.get(item_id, 0.0)]
+            if adjustments:
+                note = f"Contagem #{count_id}"
+                _write_stock_movements(
+                    conn,
+                    [(item_id, id_local_estoque, id_usuario, "ajuste", delta, note) for item_id, delta in adjustments],
+                    {(item_id, id_local_estoque): delta for item_id, delta in adjustments},
+                    dict(adjustments),
+                )
+    if adjustments:
+        _notify_stock_change({(item_id, id_local_estoque): delta for item_id, delta in adjustments})
+    return count_id
+
+
+# Ramos (um por local) por consulta em get_count_variance_columns.
+VARIANCE_BRANCHES_PER_QUERY = 200
+
+
+def get_count_variance_columns(id_local_estoque: int = None, desde: str = None, ate: str = None) -> dict:
+    """
+    Busca, em uma consulta por grupo de locais, as contagens agregadas por local e item,
+    já com os nomes de item/categoria/local e o custo unitário, e as devolve
+    em colunas ({nome_coluna: tupla}) para o cálculo vetorizado do relatório.
+
+    A passada linha a linha sobre contagem_itens (que pode ter milhões de
+    linhas) é feita pelo SQLite; o Python recebe uma linha por item/local.
+    """
+    columns = ("id_item", "item", "id_categoria", "categoria", "id_local_estoque", "local",
+               "contada", "sistema", "perda", "custo", "contagens")
+    empty = {name: () for name in columns}
+    count_filter = """
+        (:local IS NULL OR id_local_estoque = :local)
+        AND (:desde IS NULL OR data_contagem >= :desde)
+        AND (:ate IS NULL OR data_contagem <= :ate)
+    """
+    params = {"local": id_local_estoque, "desde": desde, "ate": ate}
+    with db_connection() as conn:
+        if conn is None:
+            return empty
+        local_ids = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT id_local_estoque FROM contagens WHERE {count_filter}", params
+        )]
+        if not local_ids:
+            return empty
+        # Um ramo por local: cada um percorre o índice de cobertura já ordenado
+        # por id_item e agrega em fluxo, sem ordenar o milhão de linhas em uma
+        # B-tree temporária (o que um GROUP BY local, item exigiria). Os ramos
+        # vão em grupos de VARIANCE_BRANCHES_PER_QUERY, abaixo do limite de
+        # SELECTs compostos do SQLite (500); locais em ordem, então juntar os
+        # grupos mantém a ordem por local e nome.
+        local_ids.sort()
+        rows = []
+        for start in range(0, len(local_ids), VARIANCE_BRANCHES_PER_QUERY):
+            chunk_params = {"desde": desde, "ate": ate}
+            branches = []
+            for n, local_id in enumerate(local_ids[start:start + VARIANCE_BRANCHES_PER_QUERY]):
+                chunk_params[f"l{n}"] = local_id
+                branches.append(f"""
+                    SELECT :l{n} AS id_local_estoque, ci.id_item,
+                           SUM(ci.quantidade_contada) AS contada,
+                           SUM(ci.quantidade_sistema) AS sistema,
+                           SUM(MAX(ci.quantidade_sistema - ci.quantidade_contada, 0)) AS perda,
+                           COUNT(*) AS contagens
+                    FROM contagem_itens ci INDEXED BY idx_contagem_itens_item_quantidades
+                    WHERE ci.id_contagem IN (
+                        SELECT id FROM contagens WHERE id_local_estoque = :l{n}
+                        AND (:desde IS NULL OR data_contagem >= :desde)
+                        AND (:ate IS NULL OR data_contagem <= :ate)
+                    )
+                    GROUP BY ci.id_item
+                """)
+            rows += conn.execute(
+                f"""
+                SELECT a.id_item, i.nome, i.id_categoria, COALESCE(cat.nome, 'Sem categoria'),
+                       a.id_local_estoque, l.nome, a.contada, a.sistema, a.perda,
+                       COALESCE(i.custo_unitario, 0), a.contagens
+                FROM ({" UNION ALL ".join(branches)}) a
+                JOIN itens i ON i.id = a.id_item
+                JOIN locais_estoque l ON l.id = a.id_local_estoque
+                LEFT JOIN categorias cat ON cat.id = i.id_categoria
+                ORDER BY a.id_local_estoque, i.nome
+                """,
+                chunk_params,
+            ).fetchall()
+        if not rows:
+            return empty
+        return dict(zip(columns, zip(*rows)))
+
+
+# =================================================================================
+# QUERIES DA FILA DE ENVIO (CAPTURA DE MUDANÇAS PARA A NUVEM)
+# =================================================================================
+
+
+def get_outbox_changes(after_version: int = 0, limit: int = 500) -> list:
+    """Próximas mudanças da fila: tuplas (versao, tabela, id_linha, operacao, registrado_em)."""
+    with db_connection() as conn:
+        if conn is None:
+            return []
+        cursor = conn.execute(
+            """
+            SELECT versao, tabela, id_linha, operacao, registrado_em FROM sync_outbox
+            WHERE versao > ? ORDER BY versao LIMIT ?
+            """,
+            (after_version, limit),
+        )
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def count_outbox_changes(after_version: int = 0) -> int:
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+        return conn.execute("SELECT COUNT(*) FROM sync_outbox WHERE versao > ?", (after_version,)).fetchone()[0]
+
+
+def compact_outbox(after_version: int = 0) -> int:
+    """
+    Junta as várias entradas pendentes (versao > after_version) de uma mesma
+    linha em uma só, na versão da última, com a operação resultante:
+
+        I ... U      -> I     (a nuvem ainda não conhece a linha)
+        I ... D      -> nada  (a linha nasceu e morreu sem sair do aparelho)
+        U/D ... D    -> D
+        U/D ... U/I  -> U
+
+    Entradas até after_version (já enviadas) nunca são tocadas.
+    Retorna quantas entradas foram removidas.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+        with conn:
+            # BEGIN IMMEDIATE: nenhuma mudança nova entra na fila durante a compactação.
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE IF EXISTS temp.outbox_compactar")
+            # Só as linhas com mais de uma entrada pendente; a passada é um
+            # intervalo da chave primária (versao > ?).
+            conn.execute(
+                """
+                CREATE TEMP TABLE outbox_compactar AS
+                SELECT g.tabela, g.id_linha, g.ultima, f.operacao AS primeira_op, l.operacao AS ultima_op
+                FROM (
+                    SELECT tabela, id_linha, MIN(versao) AS primeira, MAX(versao) AS ultima
+                    FROM sync_outbox WHERE versao > ?
+                    GROUP BY tabela, id_linha HAVING COUNT(*) > 1
+                ) g
+                JOIN sync_outbox f ON f.versao = g.primeira
+                JOIN sync_outbox l ON l.versao = g.ultima
+                """,
+                (after_version,),
+            )
+            conn.execute("CREATE INDEX temp.idx_outbox_compactar ON outbox_compactar (tabela, id_linha)")
+            removed = conn.execute(
+                """
+                DELETE FROM sync_outbox
+                WHERE versao > ?
+                  AND EXISTS (SELECT 1 FROM outbox_compactar c
+                              WHERE c.tabela = sync_outbox.tabela AND c.id_linha = sync_outbox.id_linha
+                                AND sync_outbox.versao < c.ultima)
+                """,
+                (after_version,),
+            ).rowcount
+            removed += conn.execute(
+                """
+                DELETE FROM sync_outbox WHERE versao IN (
+                    SELECT ultima FROM outbox_compactar WHERE primeira_op = 'I' AND ultima_op = 'D'
+                )
+                """
+            ).rowcount
+            conn.execute(
+                """
+                UPDATE sync_outbox SET operacao = (
+                    SELECT CASE WHEN c.primeira_op = 'I' THEN 'I' WHEN c.ultima_op = 'D' THEN 'D' ELSE 'U' END
+                    FROM outbox_compactar c WHERE c.ultima = sync_outbox.versao
+                )
+                WHERE versao IN (SELECT ultima FROM outbox_compactar)
+                """
+            )
+            conn.execute("DROP TABLE temp.outbox_compactar")
+        return removed
+
+
+def prune_outbox(up_to_version: int) -> int:
+    """Apaga da fila as entradas já confirmadas pela nuvem (versao <= up_to_version)."""
+    with db_connection() as conn:
+        if conn is None:
+            return 0
+        with conn:
+            return conn.execute("DELETE FROM sync_outbox WHERE versao <= ?", (up_to_version,)).rowcount
+
+
+# Colunas que não viajam na sincronização: são derivadas e recalculadas em cada aparelho.
+SYNC_EXCLUDED_COLUMNS = {"itens": {"quantidade_estoque"}}
+
+
+def get_rows_for_sync(tabela: str, ids: list) -> tuple:
+    """
+    Conteúdo atual das linhas de uma tabela sincronizada: (colunas, linhas).
+    `id` é sempre a primeira coluna. Linhas que não existem mais não aparecem.
+    """
+    if tabela not in CHANGE_CAPTURE_TABLES:
+        raise ValueError(f"Tabela não sincronizada: {tabela}")
+    with db_connection() as conn:
+        if conn is None:
+            return (), []
+        excluded = SYNC_EXCLUDED_COLUMNS.get(tabela, set())
+        columns = [row["name"] for row in conn.execute(f"PRAGMA table_info({tabela})")
+                   if row["name"] != "id" and row["name"] not in excluded]
+        columns.insert(0, "id")
+        cursor = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {tabela} WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id",
+            (json.dumps(ids),),
+        )
+        return tuple(columns), [tuple(row) for row in cursor.fetchall()]
+
+
+# Ids AUTOINCREMENT colidem entre aparelhos (a categoria 1 de um não é a de
+# outro). Na sincronização, uma linha é identificada por (aparelho que a criou,
+# id lá): o lote leva os ids do remetente e a identidade das linhas que ele
+# recebeu de outros aparelhos (get_sync_keys); quem recebe traduz tudo para
+# ids locais pelo mapa sync_ids antes da junção.
+
+def get_sync_references(tabela: str) -> dict:
+    """Colunas da tabela que apontam para outra tabela sincronizada: {coluna: tabela_pai}."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        return _sync_references(conn, tabela)
+
+
+def _sync_references(conn, tabela: str) -> dict:
+    return {fk["from"]: fk["table"] for fk in conn.execute(f"PRAGMA foreign_key_list({tabela})")
+            if fk["table"] in CHANGE_CAPTURE_TABLES}
+
+
+def get_sync_keys(tabela: str, ids: list) -> dict:
+    """
+    Identidade global das linhas que vieram de outros aparelhos:
+    {id_local: (origem, id_origem)}. Linhas criadas aqui não aparecem.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        cursor = conn.execute(
+            """
+            SELECT id_local, origem, id_origem FROM sync_ids
+            WHERE tabela = ? AND apelido = 0 AND id_local IN (SELECT value FROM json_each(?))
+            """,
+            (tabela, json.dumps(ids)),
+        )
+        return {id_local: (origem, id_origem) for id_local, origem, id_origem in cursor}
+
+
+def get_row_versions(tabela: str, ids: list) -> dict:
+    """Versões (HLC) das linhas: {id_linha: {coluna: (hlc, origem)}}; coluna '' é a da linha."""
+    with db_connection() as conn:
+        if conn is None:
+            return {}
+        return _read_row_versions(conn, tabela, ids)
+
+
+def _read_row_versions(conn, tabela: str, ids: list) -> dict:
+    versions = {}
+    cursor = conn.execute(
+        """
+        SELECT id_linha, coluna, hlc, origem FROM sync_versoes
+        WHERE tabela = ? AND id_linha IN (SELECT value FROM json_each(?))
+        """,
+        (tabela, json.dumps(ids)),
+    )
+    for id_linha, coluna, hlc, origem in cursor:
+        versions.setdefault(id_linha, {})[coluna] = (hlc, origem)
+    return versions
+
+
+def _read_merge_state(conn, by_table: dict) -> dict:
+    """Linhas e versões locais das linhas citadas no lote (tabelas que não são livro)."""
+    state = {}
+    for tabela, entry in by_table.items():
+        if tabela in LEDGER_TABLES:
+            continue
+        columns = list(entry.get("colunas") or ("id",))
+        ids = [row[0] for row in entry.get("linhas") or []] + list(entry.get("apagadas") or [])
+        if not ids:
+            continue
+        rows = conn.execute(
+            f"SELECT {', '.join(columns)} FROM {tabela} WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(ids),),
+        )
+        state[tabela] = {"linhas": {row[0]: tuple(row) for row in rows},
+                         "versoes": _read_row_versions(conn, tabela, ids)}
+    return state
+
+
+def apply_remote_changes(tables: list, merge=None, origin: str = None, device_id: str = None,
+                         keys: dict = None) -> dict:
+    """
+    Aplica mudanças vindas de outro aparelho em UMA transação, sem
+    registrá-las de volta na fila de envio (captura pausada só nesta transação).
+
+    :param tables: Dicionários {"tabela", "colunas", "linhas", "apagadas"}; linhas
+                   são gravadas por id (insere ou atualiza) e `apagadas` é uma lista de ids.
+                   Nas tabelas de livro (LEDGER_TABLES) só entram linhas novas: uma
+                   linha existente nunca é alterada nem apagada por um lote.
+    :param merge: Opcional. Função pura merge(tables, state) -> (tables, versions, hlc),
+                  chamada dentro da transação com o estado local das linhas do lote
+                  ({tabela: {"linhas": {id: tupla}, "versoes": {id: {coluna: (hlc, origem)}}}}).
+                  Devolve o que de fato gravar, as versões (tabela, id, coluna, hlc,
+                  origem) a registrar e o maior HLC recebido, que adianta o relógio local.
+    :param origin: Id do aparelho de origem do lote. Com ele, os ids do lote são
+                   traduzidos para ids locais antes da junção (ver
+                   _translate_remote_ids); sem ele, as linhas entram pelo próprio id.
+    :param device_id: Id deste aparelho (identidades dele são ids locais).
+    :param keys: Identidade das linhas que o remetente recebeu de outros aparelhos:
+                 {tabela: [[id_no_remetente, origem, id_origem], ...]} (campo "ids" do lote).
+    :return: Contadores {"gravadas", "apagadas", "movimentacoes_novas"} (None em caso
+             de falha). Movimentações novas atualizam os saldos na mesma transação.
+    """
+    by_table = {entry["tabela"]: entry for entry in tables}
+    unknown = set(by_table) - set(CHANGE_CAPTURE_TABLES)
+    if unknown:
+        raise ValueError(f"Tabela(s) não sincronizada(s): {', '.join(sorted(unknown))}")
+    stats = {"gravadas": 0, "apagadas": 0, "movimentacoes_novas": 0}
+    deltas_by_local, deltas_by_item = {}, {}
+    touched = {"itens": set(), "fichas": set(), "cardapio": set()}
+
+    with db_connection() as conn:
+        if conn is None:
+            return None
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # Pais e filhos podem chegar em qualquer ordem dentro do lote.
+                conn.execute("PRAGMA defer_foreign_keys = ON")
+                conn.execute("INSERT OR REPLACE INTO app_metadados (chave, valor) VALUES (?, '1')", (CAPTURE_PAUSED_KEY,))
+                if origin is not None:
+                    by_table = _translate_remote_ids(conn, by_table, origin, device_id, keys)
+                versions, remote_hlc = [], 0
+                if merge is not None:
+                    merged, versions, remote_hlc = merge(list(by_table.values()), _read_merge_state(conn, by_table))
+                    by_table = {entry["tabela"]: entry for entry in merged}
+                order = [tabela for tabela in CHANGE_CAPTURE_TABLES if tabela in by_table]
+                # Gravações dos pais para os filhos; exclusões no sentido inverso.
+                for tabela in order:
+                    entry = by_table[tabela]
+                    columns, rows = list(entry.get("colunas") or ()), entry.get("linhas") or []
+                    if not rows:
+                        continue
+                    if tabela in LEDGER_TABLES:
+                        rows = _insert_ledger_rows(conn, tabela, columns, rows)
+                        if not rows:
+                            continue
+                    if tabela == "movimentacoes_estoque":
+                        position = {name: n for n, name in enumerate(columns)}
+                        for row in rows:
+                            key = (row[position["id_item"]], row[position["id_local_estoque"]])
+                            deltas_by_local[key] = deltas_by_local.get(key, 0.0) + row[position["quantidade"]]
+                            deltas_by_item[key[0]] = deltas_by_item.get(key[0], 0.0) + row[position["quantidade"]]
+                        stats["movimentacoes_novas"] += len(rows)
+                    if tabela not in LEDGER_TABLES:
+                        assignments = ", ".join(f"{name} = excluded.{name}" for name in columns[1:]) or "id = id"
+                        conn.executemany(
+                            f"""
+                            INSERT INTO {tabela} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                            ON CONFLICT (id) DO UPDATE SET {assignments}
+                            """,
+                            rows,
+                        )
+                    stats["gravadas"] += len(rows)
+                    _collect_touched(tabela, columns, rows, touched)
+                for tabela in reversed(order):
+                    deleted = by_table[tabela].get("apagadas") or []
+                    if not deleted or tabela in LEDGER_TABLES:
+                        continue
+                    if tabela == "ficha_tecnica_itens":
+                        touched["fichas"].update(row[0] for row in conn.execute(
+                            "SELECT id_ficha_tecnica FROM ficha_tecnica_itens WHERE id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(deleted),),
+                        ))
+                    stats["apagadas"] += conn.execute(
+                        f"DELETE FROM {tabela} WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(deleted),)
+                    ).rowcount
+                    # Lápide: sobra só a versão da linha.
+                    conn.execute(
+                        "DELETE FROM sync_versoes WHERE tabela = ? AND coluna != '' AND id_linha IN (SELECT value FROM json_each(?))",
+                        (tabela, json.dumps(deleted)),
+                    )
+                    _collect_touched(tabela, ["id"], [(row_id,) for row_id in deleted], touched)
+                if versions:
+                    conn.executemany(
+                        """
+                        INSERT INTO sync_versoes (tabela, id_linha, coluna, hlc, origem) VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (tabela, id_linha, coluna) DO UPDATE SET hlc = excluded.hlc, origem = excluded.origem
+                        """,
+                        versions,
+                    )
+                if remote_hlc:
+                    # Recebimento do relógio híbrido: fica à frente de tudo o que já viu.
+                    conn.execute("UPDATE sync_relogio SET hlc = MAX(hlc, ?) + 1 WHERE id = 1", (remote_hlc,))
+                if deltas_by_local:
+                    _write_balance_deltas(conn, deltas_by_local, deltas_by_item)
+                conn.execute("DELETE FROM app_metadados WHERE chave = ?", (CAPTURE_PAUSED_KEY,))
+        except Exception as e:
+            logger.error(f"Erro ao aplicar mudanças recebidas da nuvem: {e}", exc_info=True)
+            return None
+
+    for tabela in _REFERENCE_QUERIES:
+        if tabela in by_table and (by_table[tabela].get("linhas") or by_table[tabela].get("apagadas")):
+            _invalidate_reference(tabela)
+    for item_id in touched["itens"]:
+        _notify_item_change(item_id)
+    for recipe_id in touched["fichas"]:
+        _notify_recipe_change(recipe_id)
+    for menu_item_id in touched["cardapio"]:
+        _notify_menu_change(menu_item_id)
+    if deltas_by_local:
+        _notify_stock_change(deltas_by_local)
+    return stats
+
+
+def _insert_ledger_rows(conn, tabela: str, columns: list, rows: list) -> list:
+    """
+    Acrescenta ao livro as linhas recebidas que ainda não existem aqui e retorna
+    as inseridas. Com os ids já traduzidos (_translate_remote_ids), as linhas
+    conhecidas nem chegam aqui e as novas trazem o id local reservado.
+    """
+    existing = {row[0] for row in conn.execute(
+        f"SELECT id FROM {tabela} WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps([row[0] for row in rows]),))}
+    rows = [row for row in rows if row[0] not in existing]
+    conn.executemany(
+        f"INSERT INTO {tabela} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+    return rows
+
+
+def _translate_remote_ids(conn, by_table: dict, origin: str, device_id: str, keys: dict) -> dict:
+    """
+    Reescreve as tabelas de um lote recebido com ids locais (dentro da
+    transação de apply_remote_changes).
+
+    Cada id do lote (da linha, de uma exclusão ou de uma referência a outra
+    tabela sincronizada) é a identidade (origem, id_origem) dada em `keys` ou,
+    se não estiver lá, (origin, id): a linha nasceu no remetente. Identidade
+    deste aparelho já é o id local; as demais são procuradas em sync_ids.
+    Um cadastro desconhecido é ligado à linha local com a mesma chave natural
+    (UNIQUE, ex.: categorias.nome), se houver, ou ganha um id novo; uma linha
+    de livro já conhecida sai do lote e uma nova ganha um id novo. Referência
+    a uma linha que ainda não chegou levanta ValueError (o lote fica para depois).
+    """
+    identities = {tabela: {entry[0]: (entry[1], entry[2]) for entry in entries}
+                  for tabela, entries in (keys or {}).items()}
+    known, mapping, last_ids = {}, [], {}
+
+    def identity(tabela, remote_id):
+        return identities.get(tabela, {}).get(remote_id, (origin, remote_id))
+
+    def local_id(tabela, remote_id):
+        origem, id_origem = identity(tabela, remote_id)
+        if origem == device_id:
+            return id_origem
+        key = (tabela, origem, id_origem)
+        if key not in known:
+            row = conn.execute(
+                "SELECT id_local FROM sync_ids WHERE tabela = ? AND origem = ? AND id_origem = ?", key).fetchone()
+            known[key] = row[0] if row else None
+        return known[key]
+
+    def remember(tabela, remote_id, new_id, alias=0):
+        origem, id_origem = identity(tabela, remote_id)
+        known[(tabela, origem, id_origem)] = new_id
+        mapping.append((tabela, origem, id_origem, new_id, alias))
+        return new_id
+
+    def allocate(tabela, remote_id):
+        if tabela not in last_ids:
+            last_ids[tabela] = conn.execute(
+                f"""
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                           COALESCE((SELECT MAX(id) FROM {tabela}), 0))
+                """,
+                (tabela,),
+            ).fetchone()[0]
+        last_ids[tabela] += 1
+        return remember(tabela, remote_id, last_ids[tabela])
+
+    def natural_match(tabela, columns, references, row):
+        for key_columns in _natural_keys(conn, tabela):
+            if not set(key_columns) <= set(columns):
+                continue
+            values = []
+            for coluna in key_columns:
+                value = row[columns.index(coluna)]
+                if value is not None and coluna in references:
+                    value = local_id(references[coluna], value)
+                values.append(value)
+            if None in values:
+                continue
+            found = conn.execute(
+                f"SELECT id FROM {tabela} WHERE {' AND '.join(f'{coluna} = ?' for coluna in key_columns)}",
+                values,
+            ).fetchone()
+            if found:
+                return found[0]
+        return None
+
+    order = [tabela for tabela in CHANGE_CAPTURE_TABLES if tabela in by_table]
+    references = {tabela: _sync_references(conn, tabela) for tabela in order}
+    translated = {}
+    # 1) Ids das linhas e das exclusões, dos pais para os filhos.
+    for tabela in order:
+        entry = dict(by_table[tabela])
+        columns = list(entry.get("colunas") or ("id",))
+        rows = []
+        for row in entry.get("linhas") or []:
+            row_id = local_id(tabela, row[0])
+            if tabela in LEDGER_TABLES:
+                if row_id is not None:
+                    continue  # já está no livro
+                row_id = allocate(tabela, row[0])
+            elif row_id is None:
+                match = natural_match(tabela, columns, references[tabela], row)
+                row_id = remember(tabela, row[0], match, 1) if match is not None else allocate(tabela, row[0])
+            rows.append([row_id, *row[1:]])
+        entry["linhas"] = rows
+        if tabela not in LEDGER_TABLES:
+            # Exclusão de linha nunca vista: o id reservado guarda a lápide, e a
+            # linha não volta se a criação chegar depois.
+            entry["apagadas"] = [local_id(tabela, row_id) or allocate(tabela, row_id)
+                                 for row_id in entry.get("apagadas") or []]
+        translated[tabela] = entry
+    # 2) Referências (já com todos os ids do lote resolvidos).
+    for tabela in order:
+        columns = list(translated[tabela].get("colunas") or ("id",))
+        for coluna, parent in references[tabela].items():
+            if coluna not in columns:
+                continue
+            position = columns.index(coluna)
+            for row in translated[tabela]["linhas"]:
+                if row[position] is None:
+                    continue
+                target = local_id(parent, row[position])
+                if target is None:
+                    raise ValueError(f"{tabela}.{coluna} aponta para {parent} {identity(parent, row[position])}, "
+                                     f"que ainda não chegou a este aparelho.")
+                row[position] = target
+
+    if mapping:
+        conn.executemany(
+            "INSERT INTO sync_ids (tabela, origem, id_origem, id_local, apelido) VALUES (?, ?, ?, ?, ?)", mapping)
+    for tabela, last_id in last_ids.items():
+        # Ids reservados (inclusive de lápides) nunca são reusados por inserções locais.
+        if not conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (last_id, tabela)).rowcount:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (tabela, last_id))
+    return translated
+
+
+def _natural_keys(conn, tabela: str) -> list:
+    """Colunas de cada restrição UNIQUE da tabela, fora a chave primária."""
+    keys = []
+    for index in conn.execute(f"PRAGMA index_list({tabela})"):
+        if index["unique"] and index["origin"] != "pk" and not index["partial"]:
+            key_columns = [row["name"] for row in conn.execute(f"PRAGMA index_info({index['name']})")]
+            if None not in key_columns:
+                keys.append(key_columns)
+    return keys
+
+
+def _collect_touched(tabela: str, columns: list, rows: list, touched: dict):
+    """Ids a avisar aos caches em memória depois de aplicar mudanças remotas."""
+    if tabela == "itens":
+        touched["itens"].update(row[0] for row in rows)
+    elif tabela == "fichas_tecnicas":
+        touched["fichas"].update(row[0] for row in rows)
+    elif tabela == "ficha_tecnica_itens" and "id_ficha_tecnica" in columns:
+        position = columns.index("id_ficha_tecnica")
+        touched["fichas"].update(row[position] for row in rows)
+    elif tabela == "cardapio_itens":
+        touched["cardapio"].update(row[0] for row in rows)
@@ -109,39 +109,54 @@ INITIAL_ITEMS = [
 # FUNÇÃO PRINCIPAL DE POVOAMENTO
 # =================================================================================
 
-def seed_database():
+def _normalize_catalog(categories: list, units: list, items: list) -> tuple:
+    """
+    Prepara o catálogo para a carga em lote, completando categorias e unidades
+    citadas pelos itens mas ausentes das listas (catálogos externos costumam
+    trazer apenas os itens). Tudo em O(n) com dicionários.
+    """
+    category_names = dict.fromkeys(categories)
+    unit_siglas = {unit["nome"]: unit.get("sigla") for unit in units}
+    item_rows = []
+    for item in items:
+        category_names.setdefault(item["categoria"], None)
+        unit_siglas.setdefault(item["unidade"], item.get("sigla"))
+        item_rows.append((item["nome"], item["categoria"], item["unidade"]))
+    return list(category_names), list(unit_siglas.items()), item_rows
+
+
+def seed_database(categories: list = None, units: list = None, items: list = None):
     """
     Executa o processo de povoamento do banco de dados com os dados iniciais.
     A função é idempotente: pode ser executada várias vezes sem duplicar dados.
+
+    Por padrão usa INITIAL_CATEGORIES/UNITS/ITEMS, mas aceita um catálogo
+    externo (ex.: milhares de SKUs de um distribuidor) no mesmo formato.
+    Uma única consulta decide se há algo a inserir; se houver, tudo é
+    gravado em uma só transação.
     """
     logger.info("Iniciando o processo de povoamento (seeding) do banco de dados...")
-    
+
     try:
-        # 1. Insere as categorias e armazena seus IDs em um dicionário.
-        category_ids = {name: queries.find_or_create_category(name) for name in INITIAL_CATEGORIES}
-        logger.info("Categorias iniciais verificadas/inseridas.")
-
-        # 2. Insere as unidades de medida e armazena seus IDs.
-        unit_ids = {unit["nome"]: queries.find_or_create_unit(unit["nome"], unit["sigla"]) for unit in INITIAL_UNITS}
-        logger.info("Unidades de medida iniciais verificadas/inseridas.")
-
-        # 3. Itera sobre os itens iniciais e os insere no banco de dados.
-        for item in INITIAL_ITEMS:
-            # Busca os IDs correspondentes nos dicionários que criamos.
-            cat_id = category_ids.get(item["categoria"])
-            unit_id = unit_ids.get(item["unidade"])
-            
-            # Insere o item apenas se a categoria e a unidade foram encontradas.
-            if cat_id and unit_id:
-                queries.create_item_if_not_exists(
-                    nome=item["nome"],
-                    id_categoria=cat_id,
-                    id_unidade_medida=unit_id
-                )
-            else:
-                logger.warning(f"Não foi possível inserir o item '{item['nome']}' pois sua categoria ou unidade não foi encontrada.")
-        
-        logger.info("Povoamento do banco de dados concluído com sucesso.")
+        category_names, unit_rows, item_rows = _normalize_catalog(
+            INITIAL_CATEGORIES if categories is None else categories,
+            INITIAL_UNITS if units is None else units,
+            INITIAL_ITEMS if items is None else items,
+        )
+
+        # 1. Verifica com uma só consulta se falta alguma linha do catálogo.
+        missing = queries.count_missing_seed_rows(
+            category_names,
+            [nome for nome, _ in unit_rows],
+            [nome for nome, _, _ in item_rows],
+        )
+        if missing == 0:
+            logger.info("Catálogo inicial já presente. Povoamento não é necessário.")
+            return
+
+        # 2. Carrega categorias, unidades e itens em uma única transação.
+        inserted = queries.bulk_seed(category_names, unit_rows, item_rows)
+        logger.info(f"Povoamento do banco de dados concluído com sucesso ({inserted} itens inseridos).")
 
     except Exception as e:
         logger.error(f"Ocorreu um erro durante o povoamento do banco de dados: {e}", exc_info=True)
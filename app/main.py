@@ -4,7 +4,12 @@
 import flet as ft
 import logging
 import re  # Importa o módulo de expressões regulares
-from app.services import auth_service
+from app.services import startup_service
+from app.services import stock_ledger_service
+from app.services import order_intake_service
+from app.services import backup_service
+from app.services import menu_export_service
+from app.services.barcode_service import barcode_cache
 from app.views.login_view import create_login_view
 from app.views.onboarding_view import create_onboarding_view
 from app.views.register_view import create_register_view
@@ -16,9 +21,8 @@ from app.views.itens_crud_view import ItensCRUDView
 from app.views.item_form_view import ItemFormView  # Nova view de formulário
 
 # --- FIM DAS NOVAS IMPORTAÇÕES ---
-from app.database.seeder import seed_database
 from app.database import queries
-from app.database.database import initialize_database
+from app.database.database import start_checkpoint_scheduler
 from app.styles.style import AppThemes
 
 logging.basicConfig(
@@ -36,16 +40,24 @@ class DoseCertaApp:
         self.current_user = None
         self.setup_page()
         self.setup_routes()
-        initialize_database()
-        auth_service.create_default_user()
-        seed_database()
+        startup_service.bootstrap_database()
+        start_checkpoint_scheduler()
+        stock_ledger_service.take_daily_snapshots_in_background()
+        backup_service.take_daily_backup_in_background()
+        # Pedidos do delivery (opcional: DOSE_CERTA_PEDIDOS=1), em thread própria.
+        order_intake_service.start_in_background()
         self.page.go("/")
 
     # ... (outros métodos como on_login_success, etc. permanecem os mesmos) ...
 
     def on_login_success(self, user: dict):
         self.current_user = user
+        # Aquece o cache de códigos de barras para as contagens com leitor.
+        barcode_cache.warm_in_background()
         if queries.has_establishment(user["id"]):
+            # Mantém o cardápio digital (pasta cardapio_digital) atualizado a cada escrita no cardápio.
+            establishment = queries.get_establishment_by_user_id(user["id"])
+            menu_export_service.start_auto_export(establishment["nome"] if establishment else None)
             self.page.go("/dashboard")
         else:
             self.page.go("/onboarding")
@@ -117,20 +129,26 @@ class DoseCertaApp:
 
             # Rota para a LISTA de itens
             elif self.page.route == "/cadastros/item":
-                # Só limpa se a view anterior não for um formulário de item
-                if not isinstance(current_view, ItemFormView):
+                list_view = self.page.views[0] if self.page.views else None
+                if isinstance(list_view, ItensCRUDView) and isinstance(
+                    current_view, (ItemFormView, ItensCRUDView)
+                ):
+                    # Voltando do formulário: reaproveita a lista já carregada,
+                    # que foi atualizada de forma incremental pelo callback.
+                    del self.page.views[1:]
+                else:
                     self.page.views.clear()
-                list_view = ItensCRUDView(self.page, self.logout)
-                self.page.views.append(list_view)
-                list_view.load_and_update_table()
+                    list_view = ItensCRUDView(self.page, self.logout)
+                    self.page.views.append(list_view)
+                    list_view.load_and_update_table()
 
             # Rota para o formulário de NOVO item
             elif self.page.route == "/cadastros/item/novo":
-                def on_save_callback(message):
+                def on_save_callback(message, change=None):
                     if self.page.views:
                         list_view = self.page.views[0]
                         if isinstance(list_view, ItensCRUDView):
-                            list_view.load_and_update_table(message)
+                            list_view.apply_item_change(change, message)
                 self.page.views.append(
                     ItemFormView(self.page, self.logout, on_save_callback)
                 )
@@ -138,11 +156,11 @@ class DoseCertaApp:
             # Rota para o formulário de EDIÇÃO de item
             elif edit_match:
                 item_id = int(edit_match.group(1))
-                def on_save_callback(message):
+                def on_save_callback(message, change=None):
                     if self.page.views:
                         list_view = self.page.views[0]
                         if isinstance(list_view, ItensCRUDView):
-                            list_view.load_and_update_table(message)
+                            list_view.apply_item_change(change, message)
                 self.page.views.append(
                     ItemFormView(
                         self.page, self.logout, on_save_callback, item_id=item_id
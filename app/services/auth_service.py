@@ -3,20 +3,36 @@
 # Local: app/services/auth_service.py
 # =================================================================================
 
+import asyncio
 import bcrypt
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from app.database import queries
 
 logger = logging.getLogger(__name__)
 
+# Credenciais do usuário padrão criado na primeira execução.
+DEFAULT_USER_EMAIL = "admin@dosedata.com"
+DEFAULT_USER_PASSWORD = "admin"
+
+# Fator de custo do bcrypt (2^N iterações). Configurável pela variável de
+# ambiente DOSE_CERTA_BCRYPT_ROUNDS; hashes gravados com outro custo são
+# refeitos automaticamente no próximo login bem-sucedido.
+BCRYPT_ROUNDS = int(os.environ.get("DOSE_CERTA_BCRYPT_ROUNDS", "12"))
+
+# Pool de threads dedicado ao bcrypt. O bcrypt libera o GIL durante o cálculo,
+# então a thread de eventos do Flet continua livre para desenhar a interface.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="bcrypt")
+
 # =================================================================================
 # FUNÇÕES DO SERVIÇO
 # =================================================================================
 
-def _hash_password(password: str) -> str:
-    """Gera um hash seguro para uma senha usando bcrypt."""
+def _hash_password(password: str, rounds: int = None) -> str:
+    """Gera um hash seguro para uma senha usando bcrypt com o custo configurado."""
     password_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed_bytes = bcrypt.hashpw(password_bytes, salt)
     return hashed_bytes.decode('utf-8')
 
@@ -30,11 +46,25 @@ def _verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.error(f"Erro ao verificar a senha. O hash pode estar malformado: {e}")
         return False
 
+def _get_hash_rounds(hashed_password: str) -> int:
+    """Extrai o fator de custo de um hash bcrypt ("$2b$12$..." -> 12)."""
+    try:
+        return int(hashed_password.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def _rehash_if_needed(user_id: int, plain_password: str, hashed_password: str):
+    """Refaz o hash da senha se ele foi gerado com um custo diferente do configurado."""
+    if _get_hash_rounds(hashed_password) == BCRYPT_ROUNDS:
+        return
+    logger.info(f"Atualizando o hash da senha do usuário ID {user_id} para o custo {BCRYPT_ROUNDS}.")
+    queries.update_user_password_hash(user_id, _hash_password(plain_password))
+
 def create_default_user():
     """Cria um usuário padrão para fins de teste, se nenhum usuário existir."""
     logger.info("Verificando a necessidade de criar um usuário padrão.")
-    default_email = "admin@dosedata.com"
-    default_password = "admin"
+    default_email = DEFAULT_USER_EMAIL
+    default_password = DEFAULT_USER_PASSWORD
     
     user = queries.get_user_by_email(default_email)
     if user is None:
@@ -65,6 +95,7 @@ def authenticate_user(email: str, password: str) -> dict:
     
     if _verify_password(password, stored_hash):
         logger.info(f"Usuário '{email}' autenticado com sucesso.")
+        _rehash_if_needed(user_data['id'], password, stored_hash)
         return dict(user_data)
     else:
         logger.warning(f"Tentativa de login falhou: senha incorreta para o e-mail '{email}'.")
@@ -98,4 +129,26 @@ def register_user(name: str, email: str, password: str) -> tuple[bool, str]:
     except Exception as e:
         message = "Ocorreu um erro inesperado durante o cadastro."
         logger.error(f"{message} Erro: {e}", exc_info=True)
-        return False, message
\ No newline at end of file
+        return False, message
+
+# =================================================================================
+# API ASSÍNCRONA (bcrypt fora da thread da interface)
+# =================================================================================
+
+def submit(func, *args, callback=None, **kwargs):
+    """
+    Executa `func` no pool do bcrypt e retorna um Future.
+    Se `callback` for informado, ele é chamado com o resultado ao terminar.
+    """
+    future = _executor.submit(func, *args, **kwargs)
+    if callback:
+        future.add_done_callback(lambda f: callback(f.result()))
+    return future
+
+async def authenticate_user_async(email: str, password: str) -> dict:
+    """Versão aguardável de authenticate_user para manipuladores async do Flet."""
+    return await asyncio.wrap_future(submit(authenticate_user, email, password))
+
+async def register_user_async(name: str, email: str, password: str) -> tuple[bool, str]:
+    """Versão aguardável de register_user para manipuladores async do Flet."""
+    return await asyncio.wrap_future(submit(register_user, name, email, password))
@@ -0,0 +1,374 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE CÓPIAS DE SEGURANÇA (backup_service.py)
+# Local: app/services/backup_service.py
+# =================================================================================
+# Uma cópia de segurança é um arquivo .db.gz (o banco inteiro, comprimido) mais
+# um manifesto .json com o SHA-256 e o tamanho do banco descomprimido:
+#   backups/dose_certa-20250101-093000.db.gz
+#   backups/dose_certa-20250101-093000.json
+# A cópia usa a API de backup do SQLite em passos de poucas páginas, com uma
+# pausa curta entre eles, em uma thread própria: a interface e as gravações
+# continuam durante a cópia. A restauração confere o checksum e a integridade
+# do banco ANTES de trocar o arquivo, e a troca é um único os.replace.
+
+import datetime
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from app.database import database
+from app.database.migrations import LATEST_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Pasta das cópias. Pode ser alterada pela variável de ambiente DOSE_CERTA_BACKUP_DIR.
+# Os bancos por estabelecimento (database.use_establishment) usam uma subpasta cada.
+BACKUP_DIR = os.environ.get("DOSE_CERTA_BACKUP_DIR", os.path.join(os.getcwd(), "backups"))
+BACKUP_PREFIX = "dose_certa-"
+BACKUP_SUFFIX = ".db.gz"
+MANIFEST_SUFFIX = ".json"
+# Cópias mantidas na pasta (as mais antigas são apagadas).
+KEEP_BACKUPS = 7
+# Intervalo mínimo (h) entre as cópias automáticas da abertura do app.
+DAILY_INTERVAL_HOURS = 24
+
+# Páginas copiadas por passo (256 x 4 KB = 1 MB) e pausa entre os passos.
+PAGES_PER_STEP = 256
+STEP_PAUSE = 0.002
+# Sem WAL, cada gravação de outra conexão reinicia a cópia; depois de tantos
+# reinícios ela é feita de uma vez (segurando a leitura até o fim).
+MAX_RESTARTS = 3
+# Nível do gzip: 3 comprime quase como o 6 na metade do tempo.
+COMPRESSION_LEVEL = 3
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    """Cópia de segurança inválida, corrompida ou que não pôde ser gravada/restaurada."""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+# =================================================================================
+# CÓPIA DO BANCO
+# =================================================================================
+
+def _default_directory() -> str:
+    establishment = database.get_current_establishment()
+    if establishment is None:
+        return BACKUP_DIR
+    return os.path.join(BACKUP_DIR, f"estabelecimento_{establishment:06d}")
+
+
+def _copy_database(source_path: str, target_path: str, progress=None) -> dict:
+    """
+    Copia o banco `source_path` para `target_path` (arquivo novo) em passos.
+
+    Em WAL, a conexão de origem abre uma transação de leitura antes da cópia:
+    todos os passos leem a mesma fotografia do banco e as gravações das outras
+    conexões (que vão para o -wal) não reiniciam a cópia nem ficam bloqueadas.
+    """
+    stats = {"passos": 0, "reinicios": 0, "paginas": 0}
+    source = sqlite3.connect(source_path, check_same_thread=False)
+    try:
+        wal = source.execute("PRAGMA journal_mode;").fetchone()[0].lower() == "wal"
+        stats["modo"] = "wal" if wal else "passos"
+        if wal:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        last_remaining = None
+
+        def on_step(status, remaining, total):
+            nonlocal last_remaining
+            stats["passos"] += 1
+            stats["paginas"] = total
+            if last_remaining is not None and remaining > last_remaining:
+                stats["reinicios"] += 1
+                if stats["reinicios"] > MAX_RESTARTS:
+                    raise _TooManyRestarts()
+            last_remaining = remaining
+            if progress is not None and total:
+                progress((total - remaining) / total)
+            time.sleep(STEP_PAUSE)
+
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=PAGES_PER_STEP, progress=on_step)
+            except _TooManyRestarts:
+                logger.info("Cópia reiniciada por gravações concorrentes; copiando em um único passo.")
+                stats["modo"] = "passo único"
+                source.backup(target, pages=-1)
+            stats["versao_esquema"] = target.execute("PRAGMA user_version;").fetchone()[0]
+        finally:
+            target.close()
+    finally:
+        if source.in_transaction:
+            source.rollback()
+        source.close()
+    return stats
+
+
+def _compress(raw_path: str, out_path: str) -> tuple:
+    """Comprime `raw_path` em `out_path` (gzip). Retorna (sha256 do original, bytes originais)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(raw_path, "rb") as raw, gzip.open(out_path, "wb", compresslevel=COMPRESSION_LEVEL) as out:
+        while chunk := raw.read(CHUNK_SIZE):
+            digest.update(chunk)
+            out.write(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _remove_quietly(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def create_backup(directory: str = None, progress=None) -> dict:
+    """
+    Cria uma cópia de segurança do banco atual e retorna o seu manifesto.
+
+    :param directory: Pasta de destino (padrão: BACKUP_DIR ou a subpasta do estabelecimento atual).
+    :param progress: Opcional. Chamado com a fração (0 a 1) das páginas já copiadas.
+    """
+    directory = directory or _default_directory()
+    os.makedirs(directory, exist_ok=True)
+    name = BACKUP_PREFIX + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    base, n = name, 1
+    while os.path.exists(os.path.join(directory, name + BACKUP_SUFFIX)):
+        n += 1
+        name = f"{base}-{n}"
+    archive_path = os.path.join(directory, name + BACKUP_SUFFIX)
+    manifest_path = os.path.join(directory, name + MANIFEST_SUFFIX)
+    raw_path = os.path.join(directory, name + ".db.parcial")
+    partial_path = archive_path + ".parcial"
+
+    t0 = time.perf_counter()
+    try:
+        stats = _copy_database(database.current_database_path(), raw_path, progress)
+        sha256, size = _compress(raw_path, partial_path)
+        os.replace(partial_path, archive_path)
+        manifest = {
+            "arquivo": os.path.basename(archive_path),
+            "criado_em": datetime.datetime.now().isoformat(timespec="seconds"),
+            "sha256": sha256,
+            "bytes": size,
+            "bytes_comprimidos": os.path.getsize(archive_path),
+            "versao_esquema": stats["versao_esquema"],
+            "paginas": stats["paginas"],
+            "modo": stats["modo"],
+            "segundos": round(time.perf_counter() - t0, 3),
+        }
+        with open(manifest_path + ".parcial", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + ".parcial", manifest_path)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Erro ao criar a cópia de segurança: {e}", exc_info=True)
+        _remove_quietly(partial_path, manifest_path + ".parcial", archive_path)
+        raise BackupError(f"Não foi possível criar a cópia de segurança: {e}") from e
+    finally:
+        _remove_quietly(raw_path)
+
+    logger.info(f"Cópia de segurança '{manifest['arquivo']}' criada: {manifest['bytes']} bytes "
+                f"({manifest['bytes_comprimidos']} comprimidos) em {manifest['segundos']:.1f} s.")
+    prune_backups(directory)
+    return manifest
+
+
+def list_backups(directory: str = None) -> list:
+    """Manifestos das cópias da pasta, da mais recente para a mais antiga."""
+    manifests = []
+    for path in glob.glob(os.path.join(directory or _default_directory(), BACKUP_PREFIX + "*" + MANIFEST_SUFFIX)):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"Manifesto ilegível ignorado: {path}")
+            continue
+        manifest["caminho"] = os.path.join(os.path.dirname(path), manifest["arquivo"])
+        manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m["arquivo"][:-len(BACKUP_SUFFIX)], reverse=True)
+
+
+def prune_backups(directory: str = None, keep: int = KEEP_BACKUPS) -> int:
+    """Apaga as cópias além das `keep` mais recentes. Retorna quantas foram apagadas."""
+    old = list_backups(directory)[keep:]
+    for manifest in old:
+        _remove_quietly(manifest["caminho"], manifest["caminho"][:-len(BACKUP_SUFFIX)] + MANIFEST_SUFFIX)
+    return len(old)
+
+
+def take_daily_backup():
+    """Cria uma cópia se a mais recente tiver mais de DAILY_INTERVAL_HOURS (ou se não houver nenhuma)."""
+    backups = list_backups()
+    if backups:
+        age = datetime.datetime.now() - datetime.datetime.fromisoformat(backups[0]["criado_em"])
+        if age < datetime.timedelta(hours=DAILY_INTERVAL_HOURS):
+            return None
+    try:
+        return create_backup()
+    except BackupError as e:
+        logger.warning(f"Cópia de segurança diária adiada: {e}")
+        return None
+
+def take_daily_backup_in_background():
+    """Executa take_daily_backup em uma thread, sem atrasar a abertura do app."""
+    threading.Thread(target=take_daily_backup, name="backup", daemon=True).start()
+
+# =================================================================================
+# VERIFICAÇÃO E RESTAURAÇÃO
+# =================================================================================
+
+def _read_manifest(archive_path: str) -> dict:
+    manifest_path = archive_path[:-len(BACKUP_SUFFIX)] + MANIFEST_SUFFIX
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise BackupError(f"Manifesto da cópia ausente ou ilegível: {manifest_path}") from e
+
+
+def _decompress(archive_path: str, manifest: dict, out_path: str = None):
+    """Descomprime (em `out_path`, se informado) conferindo tamanho e SHA-256 com o manifesto."""
+    digest = hashlib.sha256()
+    size = 0
+    out = open(out_path, "wb") if out_path else None
+    try:
+        with gzip.open(archive_path, "rb") as archive:
+            while chunk := archive.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                if out is not None:
+                    out.write(chunk)
+        if out is not None:
+            out.flush()
+            os.fsync(out.fileno())
+    except (OSError, EOFError, zlib.error) as e:
+        raise BackupError(f"Arquivo da cópia corrompido: {e}") from e
+    finally:
+        if out is not None:
+            out.close()
+    if size != manifest["bytes"] or digest.hexdigest() != manifest["sha256"]:
+        raise BackupError("O conteúdo da cópia não confere com o checksum do manifesto.")
+
+
+def verify_backup(archive_path: str) -> dict:
+    """Confere o checksum de uma cópia sem restaurá-la. Retorna o manifesto (BackupError se inválida)."""
+    manifest = _read_manifest(archive_path)
+    _decompress(archive_path, manifest)
+    return manifest
+
+
+def _check_database_file(path: str) -> int:
+    """Confere a integridade de um arquivo de banco; retorna a versão do esquema."""
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check;").fetchall()
+        if [tuple(row) for row in result] != [("ok",)]:
+            raise BackupError(f"O banco da cópia não passou na verificação de integridade: {result[:5]}")
+        version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"O arquivo da cópia não é um banco válido: {e}") from e
+    finally:
+        conn.close()
+    if version > LATEST_VERSION:
+        raise BackupError(f"A cópia é de uma versão mais nova do aplicativo (esquema {version}).")
+    return version
+
+
+def restore_backup(archive_path: str, target_path: str = None) -> dict:
+    """
+    Restaura uma cópia sobre o banco `target_path` (padrão: o banco atual).
+
+    O conteúdo é descomprimido ao lado do banco e conferido (SHA-256 e
+    PRAGMA integrity_check) antes da troca; se algo falhar, o banco atual fica
+    como está. O banco substituído é mantido como <banco>.anterior.
+
+    Restaurar o banco em uso fecha o pool e o reabre no arquivo novo (aplicando
+    as migrações, se a cópia for de um esquema antigo). Threads que estiverem
+    com uma conexão emprestada continuam no arquivo antigo, e os caches em
+    memória não são recarregados: o aplicativo deve ser reiniciado em seguida.
+    """
+    manifest = _read_manifest(archive_path)
+    live_path = database.current_database_path()
+    establishment = database.get_current_establishment()
+    target_path = target_path or live_path
+    is_live = os.path.abspath(target_path) == os.path.abspath(live_path)
+    restoring_path = target_path + ".restaurando"
+    try:
+        _decompress(archive_path, manifest, restoring_path)
+        _check_database_file(restoring_path)
+    except BackupError:
+        _remove_quietly(restoring_path)
+        raise
+
+    reopen_main = is_live and establishment is None
+    scheduler_running = reopen_main and database.is_checkpoint_scheduler_running()
+    if reopen_main:
+        database.stop_checkpoint_scheduler()
+        database.close_pool()
+    elif is_live:
+        # O pool do estabelecimento é reaberto (e migrado) no próximo uso.
+        database.close_tenant_pools(establishment)
+    try:
+        if os.path.exists(target_path):
+            # Leva o -wal para dentro do arquivo antigo antes de separá-lo dele.
+            conn = sqlite3.connect(target_path)
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            finally:
+                conn.close()
+            previous_path = target_path + ".anterior"
+            _remove_quietly(previous_path)
+            try:
+                os.link(target_path, previous_path)
+            except OSError as e:
+                logger.warning(f"Não foi possível guardar o banco anterior em '{previous_path}': {e}")
+        os.replace(restoring_path, target_path)
+        _remove_quietly(target_path + "-wal", target_path + "-shm")
+    except (sqlite3.Error, OSError) as e:
+        _remove_quietly(restoring_path)
+        raise BackupError(f"Não foi possível substituir o banco: {e}") from e
+    finally:
+        if reopen_main:
+            database.set_database_path(database.DB_PATH)
+            database.initialize_database()
+            if scheduler_running:
+                database.start_checkpoint_scheduler()
+
+    logger.info(f"Cópia '{manifest['arquivo']}' restaurada em '{target_path}'.")
+    return manifest
+
+
+# Linha de comando:
+#   python -m app.services.backup_service                      (cria uma cópia)
+#   python -m app.services.backup_service --list               (lista as cópias)
+#   python -m app.services.backup_service --verify ARQUIVO     (confere o checksum)
+#   python -m app.services.backup_service --restore ARQUIVO    (restaura sobre o banco atual)
+if __name__ == '__main__':
+    import sys
+    try:
+        if "--list" in sys.argv:
+            for item in list_backups():
+                print(f"{item['arquivo']}  {item['criado_em']}  {item['bytes']:>12} bytes  esquema {item['versao_esquema']}")
+        elif "--verify" in sys.argv:
+            print(f"OK: {verify_backup(sys.argv[sys.argv.index('--verify') + 1])['sha256']}")
+        elif "--restore" in sys.argv:
+            print(f"Restaurada: {restore_backup(sys.argv[sys.argv.index('--restore') + 1])['arquivo']}")
+        else:
+            print(f"Criada: {create_backup()['arquivo']}")
+    except BackupError as e:
+        print(f"ERRO: {e}")
+        sys.exit(1)
@@ -0,0 +1,194 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE CÓDIGO DE BARRAS (barcode_service.py)
+# Local: app/services/barcode_service.py
+# =================================================================================
+
+import contextvars
+import logging
+import threading
+import time
+from app.database import database, queries
+
+logger = logging.getLogger(__name__)
+
+# Intervalo máximo (s) entre teclas para que a sequência seja considerada
+# digitada por um leitor (keyboard wedge) e não por uma pessoa.
+MAX_KEY_INTERVAL = 0.05
+# Tamanho mínimo de um código válido (EAN-8 é o menor formato comum).
+MIN_BARCODE_LENGTH = 8
+# Quantidade de leituras acumuladas antes de gravar o lote.
+DEFAULT_BATCH_SIZE = 50
+# Tempo máximo (s) que uma leitura pode esperar no lote antes de ser gravada.
+DEFAULT_FLUSH_INTERVAL = 2.0
+
+# =================================================================================
+# CACHE EM MEMÓRIA: CÓDIGO DE BARRAS -> ITEM
+# =================================================================================
+
+class BarcodeCache:
+    """
+    Dicionário código de barras -> item, aquecido no login e invalidado a
+    cada escrita em itens. Leituras que não estão no cache caem no índice
+    idx_itens_codigo_barras do banco e passam a ser guardadas.
+    """
+
+    def __init__(self):
+        self._by_code = {}
+        self._code_by_item = {}
+        self._lock = threading.Lock()
+        self.is_warm = False
+
+    def warm(self):
+        """Carrega todos os códigos de barras com uma única consulta."""
+        rows = queries.get_barcode_index()
+        with self._lock:
+            self._by_code = {code: {"id": item_id, "nome": nome} for code, item_id, nome in rows}
+            self._code_by_item = {item_id: code for code, item_id, _ in rows}
+            self.is_warm = True
+        logger.info(f"Cache de códigos de barras aquecido com {len(rows)} itens.")
+
+    def warm_in_background(self):
+        """Aquece o cache em uma thread, sem atrasar a navegação pós-login."""
+        # A thread lê o mesmo banco (estabelecimento) de quem a iniciou.
+        threading.Thread(target=contextvars.copy_context().run, args=(self.warm,),
+                         name="barcode-warm", daemon=True).start()
+
+    def lookup(self, code: str):
+        """Resolve um código de barras para {"id", "nome"} (None se desconhecido)."""
+        with self._lock:
+            item = self._by_code.get(code)
+        if item is not None:
+            return item
+        row = queries.get_item_by_barcode(code)
+        if row is None:
+            return None
+        item = {"id": row["id"], "nome": row["nome"]}
+        with self._lock:
+            self._by_code[code] = item
+            self._code_by_item[row["id"]] = code
+        return item
+
+    def invalidate_item(self, item_id: int):
+        """Remove do cache a entrada de um item alterado ou excluído."""
+        with self._lock:
+            code = self._code_by_item.pop(item_id, None)
+            if code is not None:
+                self._by_code.pop(code, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_code.clear()
+            self._code_by_item.clear()
+            self.is_warm = False
+
+
+# Cache usado pelo aplicativo (um por arquivo de banco), invalidado
+# automaticamente pelas escritas em itens feitas em queries.py.
+barcode_cache = database.DatabaseScoped(BarcodeCache)
+queries.add_item_change_listener(barcode_cache.listener("invalidate_item"))
+
+# =================================================================================
+# LEITOR "KEYBOARD WEDGE" E AGRUPAMENTO DE LEITURAS
+# =================================================================================
+
+class KeyboardWedgeScanner:
+    """
+    Reconhece leituras de leitores USB/Bluetooth que se comportam como teclado:
+    os dígitos chegam em rajada (poucos ms entre teclas) e terminam com Enter.
+    Teclas digitadas devagar por uma pessoa são ignoradas.
+
+    Pode ser ligado direto ao Flet: page.on_keyboard_event = scanner.handle_keyboard_event
+    """
+
+    def __init__(self, on_scan, max_key_interval: float = MAX_KEY_INTERVAL,
+                 min_length: int = MIN_BARCODE_LENGTH):
+        """:param on_scan: Função chamada com o código lido (str)."""
+        self.on_scan = on_scan
+        self.max_key_interval = max_key_interval
+        self.min_length = min_length
+        self._buffer = []
+        self._last_key_at = 0.0
+
+    def feed(self, key: str, timestamp: float = None):
+        """Processa uma tecla. Retorna o código lido quando a tecla for o Enter final."""
+        now = time.monotonic() if timestamp is None else timestamp
+        if self._buffer and now - self._last_key_at > self.max_key_interval:
+            # Pausa longa: era digitação humana, descarta o que havia.
+            self._buffer.clear()
+        self._last_key_at = now
+
+        if key in ("Enter", "Numpad Enter"):
+            code = "".join(self._buffer)
+            self._buffer.clear()
+            if len(code) >= self.min_length:
+                self.on_scan(code)
+                return code
+            return None
+        if len(key) == 1 and key.isalnum():
+            self._buffer.append(key)
+        return None
+
+    def handle_keyboard_event(self, e):
+        """Adaptador para ft.KeyboardEvent."""
+        self.feed(e.key)
+
+
+class ScanBatcher:
+    """
+    Acumula leituras em memória como incrementos por item e entrega o lote
+    a `on_flush({id_item: quantidade})` quando chega a `batch_size` leituras
+    ou quando a leitura mais antiga do lote completa `flush_interval`
+    segundos, em vez de gravar uma linha por bipe. O prazo é vigiado por um
+    timer, então a última leitura de uma rajada também é entregue; nesse caso
+    `on_flush` roda na thread do timer.
+    """
+
+    def __init__(self, on_flush, cache: BarcodeCache = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.on_flush = on_flush
+        self.cache = cache or barcode_cache
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.unknown_codes = []
+        self._pending = {}
+        self._pending_scans = 0
+        self._first_pending_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def add_scan(self, code: str, quantity: float = 1) -> dict:
+        """Registra uma leitura. Retorna o item resolvido (None se o código for desconhecido)."""
+        item = self.cache.lookup(code)
+        if item is None:
+            logger.warning(f"Código de barras não cadastrado: {code}")
+            self.unknown_codes.append(code)
+            return None
+        with self._lock:
+            self._pending[item["id"]] = self._pending.get(item["id"], 0) + quantity
+            self._pending_scans += 1
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+                # A gravação do timer vai para o mesmo banco (estabelecimento) das leituras.
+                self._timer = threading.Timer(self.flush_interval, contextvars.copy_context().run, args=(self.flush,))
+                self._timer.daemon = True
+                self._timer.start()
+            should_flush = (
+                self._pending_scans >= self.batch_size
+                or time.monotonic() - self._first_pending_at >= self.flush_interval
+            )
+        if should_flush:
+            self.flush()
+        return item
+
+    def flush(self) -> dict:
+        """Entrega imediatamente o lote pendente (ex.: ao encerrar a contagem)."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._pending_scans = 0
+            self._first_pending_at = None
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if batch:
+            self.on_flush(batch)
+        return batch
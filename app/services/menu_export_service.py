@@ -0,0 +1,316 @@
+# =================================================================================
+# MÓDULO DE EXPORTAÇÃO DO CARDÁPIO DIGITAL (menu_export_service.py)
+# Local: app/services/menu_export_service.py
+# =================================================================================
+
+import glob
+import gzip
+import hashlib
+import html
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from app.database import database, queries
+
+# Brotli é opcional: sem ele, só as versões .gz são geradas.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Pasta (ao lado do arquivo do banco) onde o cardápio estático é gravado.
+EXPORT_DIR_NAME = "cardapio_digital"
+# Quantas versões antigas manter (clientes com a página antiga em cache).
+KEEP_PREVIOUS_VERSIONS = 2
+# Tamanho do hash de conteúdo usado nos nomes de arquivo.
+HASH_LENGTH = 12
+# Exportação automática: espera este tempo (s) depois da última escrita no
+# cardápio, para que uma sequência de edições gere uma única versão.
+AUTO_EXPORT_DELAY = 2.0
+# O aplicativo mantém o cardápio digital atualizado, a menos que DOSE_CERTA_CARDAPIO_DIGITAL=0.
+AUTO_EXPORT_ENABLED = os.environ.get("DOSE_CERTA_CARDAPIO_DIGITAL", "1") == "1"
+
+
+def get_export_dir() -> str:
+    """Pasta do cardápio do banco atual (cada estabelecimento em uma subpasta)."""
+    export_dir = os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), EXPORT_DIR_NAME)
+    establishment = database.get_current_establishment()
+    if establishment is None:
+        return export_dir
+    return os.path.join(export_dir, f"estabelecimento_{establishment:06d}")
+
+# =================================================================================
+# RENDERIZAÇÃO
+# =================================================================================
+
+def build_menu_payload(nome_estabelecimento: str = None, availability: dict = None) -> dict:
+    """
+    Monta o cardápio a partir de uma única consulta, agrupado por categoria.
+
+    :param availability: {id_cardapio_item: disponivel} (ex.: MenuAvailability.snapshot());
+                         se omitido, vale só a marcação manual cardapio_itens.disponivel.
+    Não inclui data/hora: o mesmo cardápio gera sempre os mesmos bytes (e o mesmo hash).
+    """
+    categories = []
+    by_category = {}
+    for row in queries.get_menu_items():
+        available = bool(row["disponivel"])
+        if availability is not None:
+            available = available and availability.get(row["id"], False)
+        key = row["id_cardapio_categoria"]
+        if key not in by_category:
+            by_category[key] = {"nome": row["categoria"] or "Outros", "itens": []}
+            categories.append(by_category[key])
+        by_category[key]["itens"].append({
+            "id": row["id"],
+            "nome": row["nome_venda"],
+            "descricao": row["descricao"] or "",
+            "preco": round(row["preco_venda"], 2),
+            "disponivel": available,
+        })
+    return {"estabelecimento": nome_estabelecimento or "", "categorias": categories}
+
+def render_json(payload: dict) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+def _price(value: float) -> str:
+    return "R$ " + f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def render_html(payload: dict) -> bytes:
+    """Página única, sem scripts nem arquivos externos (abre rápido pelo link do WhatsApp)."""
+    title = html.escape(payload["estabelecimento"] or "Cardápio")
+    parts = [
+        "<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\">",
+        "<meta name=\"viewport\" content=\"width=device-width,initial-scale=1\">",
+        f"<title>{title}</title><style>",
+        "body{font-family:system-ui,sans-serif;margin:0 auto;max-width:40rem;padding:1rem;color:#222}",
+        "h1{font-size:1.5rem}h2{font-size:1.15rem;border-bottom:1px solid #ddd;padding-bottom:.25rem}",
+        "ul{list-style:none;padding:0}li{display:flex;justify-content:space-between;gap:1rem;padding:.4rem 0}",
+        "small{display:block;color:#666}.off{opacity:.45}.off b::after{content:' (esgotado)';font-weight:normal}",
+        f"</style></head><body><h1>{title}</h1>",
+    ]
+    for category in payload["categorias"]:
+        parts.append(f"<h2>{html.escape(category['nome'])}</h2><ul>")
+        for item in category["itens"]:
+            css = "" if item["disponivel"] else " class=\"off\""
+            description = f"<small>{html.escape(item['descricao'])}</small>" if item["descricao"] else ""
+            parts.append(f"<li{css}><span><b>{html.escape(item['nome'])}</b>{description}</span>"
+                         f"<span>{_price(item['preco'])}</span></li>")
+        parts.append("</ul>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+def _redirect_html(target: str) -> bytes:
+    """Página de endereço fixo (para o link compartilhado) que aponta para a versão atual."""
+    target = html.escape(target)
+    return (f"<!DOCTYPE html><html lang=\"pt-BR\"><head><meta charset=\"utf-8\">"
+            f"<meta http-equiv=\"refresh\" content=\"0;url={target}\"></head>"
+            f"<body><a href=\"{target}\">Abrir o cardápio</a></body></html>").encode("utf-8")
+
+# =================================================================================
+# GRAVAÇÃO DOS ARQUIVOS ESTÁTICOS
+# =================================================================================
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _write_bundle(export_dir: str, name: str, extension: str, data: bytes) -> str:
+    """Grava name.<hash>.ext e as versões .gz/.br pré-comprimidas. Retorna o nome do arquivo."""
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    filename = f"{name}.{digest}.{extension}"
+    path = os.path.join(export_dir, filename)
+    # Cada variante é conferida separadamente: o brotli pode ter sido instalado
+    # depois da primeira exportação deste hash, que então só gerou o .gz.
+    if not os.path.exists(path + ".gz"):
+        _write_atomic(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None and not os.path.exists(path + ".br"):
+        _write_atomic(path + ".br", brotli.compress(data, quality=11))
+    # O arquivo sem compressão por último: se ele existe, as variantes comprimidas já foram gravadas.
+    if not os.path.exists(path):
+        _write_atomic(path, data)
+    return filename
+
+def _prune(export_dir: str, name: str, extension: str, keep: set):
+    """Apaga versões antigas, mantendo a atual e as KEEP_PREVIOUS_VERSIONS mais recentes."""
+    versions = sorted(glob.glob(os.path.join(export_dir, f"{name}.*.{extension}")), key=os.path.getmtime, reverse=True)
+    old = [path for path in versions if os.path.basename(path) not in keep][KEEP_PREVIOUS_VERSIONS:]
+    for path in old:
+        for suffix in ("", ".gz", ".br"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+class MenuExporter:
+    """
+    Mantém o cardápio digital estático em `export_dir`:
+
+        cardapio.<hash>.json / .html (+ .gz e .br)  conteúdo imutável: cache longo
+        manifest.json                               nomes da versão atual
+        index.html                                  endereço fixo para compartilhar
+
+    Os arquivos com hash podem ser servidos com "Cache-Control: max-age=31536000,
+    immutable"; manifest.json e index.html, com cache curto (ou no-cache).
+    Só há trabalho quando o cardápio muda: escritas no cardápio marcam o
+    exportador como pendente, e um conteúdo de mesmo hash não é regravado.
+    Com `auto_export_delay`, cada marcação agenda export_if_changed() para
+    depois desse tempo sem novas escritas (em uma thread de timer).
+    O exportador é do banco em que foi criado (principal ou do estabelecimento
+    atual): exporta dele e ignora escritas feitas em outros bancos.
+    """
+
+    def __init__(self, export_dir: str = None, nome_estabelecimento: str = None, availability=None,
+                 auto_export_delay: float = None):
+        """:param availability: MenuAvailability opcional para marcar itens esgotados."""
+        self.export_dir = export_dir
+        self.nome_estabelecimento = nome_estabelecimento
+        self.availability = availability
+        self.auto_export_delay = auto_export_delay
+        self._dirty = True
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_lock = threading.Lock()
+        self._previous_on_change = None
+        self._establishment = database.get_current_establishment()
+        self._database_path = database.current_database_path()
+
+    def attach(self):
+        """Passa a marcar o cardápio como pendente a cada escrita no cardápio (e mudança de disponibilidade)."""
+        queries.add_menu_change_listener(self._on_menu_change)
+        if self.availability is not None:
+            previous = self._previous_on_change = self.availability.on_change
+
+            def on_availability_change(changes, previous=previous):
+                if previous:
+                    previous(changes)
+                self.mark_dirty()
+            self.availability.on_change = on_availability_change
+        return self
+
+    def detach(self):
+        """Desfaz attach() e cancela uma exportação agendada."""
+        queries.remove_menu_change_listener(self._on_menu_change)
+        if self.availability is not None:
+            self.availability.on_change = self._previous_on_change
+        with self._timer_lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+
+    def _on_menu_change(self, changed=None):
+        if database.current_database_path() == self._database_path:
+            self.mark_dirty(changed)
+
+    def mark_dirty(self, _changed=None):
+        self._dirty = True
+        if self.auto_export_delay is None:
+            return
+        with self._timer_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.auto_export_delay, self._auto_export)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _auto_export(self):
+        try:
+            self.export_if_changed()
+        except Exception as e:
+            logger.error(f"Erro ao exportar o cardápio digital: {e}", exc_info=True)
+
+    def _manifest_path(self, export_dir: str) -> str:
+        return os.path.join(export_dir, "manifest.json")
+
+    def _export_dir(self) -> str:
+        with database.use_establishment(self._establishment):
+            return self.export_dir or get_export_dir()
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(self._manifest_path(self._export_dir()), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def export_if_changed(self) -> bool:
+        """
+        Regera os arquivos se o cardápio mudou desde a última exportação.
+        Retorna True se uma nova versão foi publicada.
+        """
+        with self._lock, database.use_establishment(self._establishment):
+            export_dir = self._export_dir()
+            manifest = self.read_manifest()
+            if not self._dirty and manifest:
+                return False
+            self._dirty = False
+            try:
+                return self._export(export_dir, manifest)
+            except Exception:
+                self._dirty = True
+                raise
+
+    def _export(self, export_dir: str, manifest: dict) -> bool:
+        """Gera e grava uma nova versão (uma consulta ao cardápio); se o hash não mudou, só completa variantes ausentes."""
+        availability = self.availability.snapshot() if self.availability is not None else None
+        payload = build_menu_payload(self.nome_estabelecimento, availability)
+        json_bytes = render_json(payload)
+        content_hash = hashlib.sha256(json_bytes).hexdigest()[:HASH_LENGTH]
+        if manifest.get("hash") == content_hash:
+            # Mesmo sem alterações, completa as variantes que faltarem (ex.: .br).
+            os.makedirs(export_dir, exist_ok=True)
+            _write_bundle(export_dir, "cardapio", "json", json_bytes)
+            _write_bundle(export_dir, "cardapio", "html", render_html(payload))
+            logger.info("Cardápio digital sem alterações; nada a exportar.")
+            return False
+
+        os.makedirs(export_dir, exist_ok=True)
+        json_name = _write_bundle(export_dir, "cardapio", "json", json_bytes)
+        html_name = _write_bundle(export_dir, "cardapio", "html", render_html(payload))
+        new_manifest = {
+            "hash": content_hash,
+            "json": json_name,
+            "html": html_name,
+            "gerado_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        index_bytes = _redirect_html(html_name)
+        _write_atomic(os.path.join(export_dir, "index.html.gz"), gzip.compress(index_bytes, 9, mtime=0))
+        _write_atomic(os.path.join(export_dir, "index.html"), index_bytes)
+        _write_atomic(self._manifest_path(export_dir),
+                      json.dumps(new_manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+        _prune(export_dir, "cardapio", "json", {json_name})
+        _prune(export_dir, "cardapio", "html", {html_name})
+        logger.info(f"Cardápio digital exportado: {html_name} / {json_name}.")
+        return True
+
+
+# Exportadores do aplicativo (um por arquivo de banco), criados por start_auto_export().
+_auto_exporters = {}
+_auto_exporter_lock = threading.Lock()
+
+
+def start_auto_export(nome_estabelecimento: str = None) -> MenuExporter:
+    """
+    Passa a manter o cardápio digital do banco atual atualizado a cada escrita
+    no cardápio (AUTO_EXPORT_DELAY depois da última) e agenda uma exportação
+    inicial. Chamadas seguintes só atualizam o nome do estabelecimento.
+    Retorna None se AUTO_EXPORT_ENABLED estiver desligado.
+    """
+    if not AUTO_EXPORT_ENABLED:
+        return None
+    with _auto_exporter_lock:
+        exporter = _auto_exporters.get(database.current_database_path())
+        if exporter is None:
+            exporter = MenuExporter(auto_export_delay=AUTO_EXPORT_DELAY).attach()
+            _auto_exporters[database.current_database_path()] = exporter
+    if nome_estabelecimento is not None and nome_estabelecimento != exporter.nome_estabelecimento:
+        exporter.nome_estabelecimento = nome_estabelecimento
+    exporter.mark_dirty()
+    return exporter
@@ -0,0 +1,266 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DO CARDÁPIO (menu_service.py)
+# Local: app/services/menu_service.py
+# =================================================================================
+
+import logging
+import threading
+from app.database import database, queries
+from app.services.recipe_service import recipe_engine
+
+logger = logging.getLogger(__name__)
+
+# =================================================================================
+# VETORES DE BAIXA PRÉ-COMPILADOS POR ITEM DE CARDÁPIO
+# =================================================================================
+
+class MenuDeductionIndex:
+    """
+    Para cada item do cardápio, o vetor plano ((id_item, quantidade), ...) do
+    que uma unidade vendida baixa do estoque: o próprio id_item_estoque ou os
+    itens base da ficha técnica já expandida (recipe_engine). Se o item tiver
+    os dois, vale a ficha.
+
+    Mantém também o índice reverso item/ficha -> itens do cardápio que
+    dependem dele, usado para invalidar só os vetores afetados por uma escrita
+    (e para saber quais itens do cardápio reavaliar quando um saldo muda).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sources = None
+        self._vectors = {}
+        self._dependencies = {}
+        self._menu_by_item = {}
+        self._menu_by_recipe = {}
+        self._complete = False
+
+    def _load_sources(self) -> dict:
+        if self._sources is None:
+            self._sources = queries.get_menu_item_sources()
+        return self._sources
+
+    def _compile(self, menu_item_id: int) -> tuple:
+        id_item_estoque, id_ficha = self._load_sources()[menu_item_id]
+        if id_ficha is not None:
+            vector = tuple(recipe_engine.explode(id_ficha).items())
+            dep_items, dep_recipes = recipe_engine.dependencies(id_ficha)
+            dep_items = dep_items | {item_id for item_id, _ in vector}
+        elif id_item_estoque is not None:
+            vector = ((id_item_estoque, 1.0),)
+            dep_items, dep_recipes = frozenset({id_item_estoque}), frozenset()
+        else:
+            vector, dep_items, dep_recipes = (), frozenset(), frozenset()
+        self._vectors[menu_item_id] = vector
+        self._dependencies[menu_item_id] = (dep_items, dep_recipes)
+        for item_id in dep_items:
+            self._menu_by_item.setdefault(item_id, set()).add(menu_item_id)
+        for recipe_id in dep_recipes:
+            self._menu_by_recipe.setdefault(recipe_id, set()).add(menu_item_id)
+        return vector
+
+    def vector(self, menu_item_id: int) -> tuple:
+        """
+        Vetor de baixa de uma unidade do item de cardápio.
+        Levanta KeyError se o item não existir no cardápio.
+        """
+        with self._lock:
+            vector = self._vectors.get(menu_item_id)
+            if vector is None:
+                vector = self._compile(menu_item_id)
+            return vector
+
+    def compile_all(self) -> int:
+        """Pré-compila os vetores de todo o cardápio (ex.: ao abrir o caixa). Retorna quantos."""
+        with self._lock:
+            for menu_item_id in self._load_sources():
+                if menu_item_id not in self._vectors:
+                    self._compile(menu_item_id)
+            self._complete = True
+            return len(self._vectors)
+
+    def menu_items_using_item(self, item_id: int) -> set:
+        """Itens do cardápio cuja baixa envolve o item (direto ou via ficha técnica)."""
+        with self._lock:
+            if not self._complete:
+                self.compile_all()
+            return set(self._menu_by_item.get(item_id, ()))
+
+    def all_menu_item_ids(self) -> list:
+        with self._lock:
+            return list(self._load_sources())
+
+    # --- Invalidação --------------------------------------------------------------
+
+    def _forget(self, menu_item_ids):
+        for menu_item_id in list(menu_item_ids):
+            self._complete = False
+            self._vectors.pop(menu_item_id, None)
+            dep_items, dep_recipes = self._dependencies.pop(menu_item_id, ((), ()))
+            for item_id in dep_items:
+                self._menu_by_item.get(item_id, set()).discard(menu_item_id)
+            for recipe_id in dep_recipes:
+                self._menu_by_recipe.get(recipe_id, set()).discard(menu_item_id)
+
+    def invalidate_item(self, item_id: int):
+        with self._lock:
+            self._forget(self._menu_by_item.get(item_id, set()))
+
+    def invalidate_recipe(self, recipe_id: int):
+        with self._lock:
+            self._forget(self._menu_by_recipe.get(recipe_id, set()))
+
+    def invalidate_menu_item(self, menu_item_id: int):
+        with self._lock:
+            self._sources = None
+            self._forget({menu_item_id})
+
+    def clear(self):
+        with self._lock:
+            self._sources = None
+            self._vectors.clear()
+            self._dependencies.clear()
+            self._menu_by_item.clear()
+            self._menu_by_recipe.clear()
+            self._complete = False
+
+
+# Um índice por arquivo de banco. recipe_service registra seus listeners antes
+# (import acima), então quando este índice recompila um vetor a ficha já foi reexpandida.
+menu_index = database.DatabaseScoped(MenuDeductionIndex)
+queries.add_item_change_listener(menu_index.listener("invalidate_item"))
+queries.add_recipe_change_listener(menu_index.listener("invalidate_recipe"))
+queries.add_menu_change_listener(menu_index.listener("invalidate_menu_item"))
+
+# =================================================================================
+# DISPONIBILIDADE DO CARDÁPIO A PARTIR DO ESTOQUE
+# =================================================================================
+
+# Folga para comparar saldos em ponto flutuante.
+_TOLERANCIA = 1e-9
+
+
+class MenuAvailability:
+    """
+    Disponibilidade dos itens do cardápio em um local, derivada dos saldos:
+    um item fica indisponível quando algum item de estoque do seu vetor de
+    baixa tem saldo menor que o necessário para uma unidade. A marcação manual
+    (cardapio_itens.disponivel = 0) continua valendo e nunca é sobrescrita.
+
+    Depois do cálculo inicial, cada alteração de saldo reavalia apenas os
+    itens do cardápio que dependem dos itens alterados (índice reverso de
+    MenuDeductionIndex), com os saldos mantidos em memória pelas variações.
+
+    A instância é do banco em que foi criada (principal ou do estabelecimento
+    atual): lê sempre dele e ignora escritas feitas em outros bancos.
+    """
+
+    def __init__(self, id_local_estoque: int, on_change=None, index: MenuDeductionIndex = None):
+        """:param on_change: Função chamada com {id_cardapio_item: disponivel} a cada mudança."""
+        self.id_local_estoque = id_local_estoque
+        self.on_change = on_change
+        self.index = index or menu_index
+        self._establishment = database.get_current_establishment()
+        self._database_path = database.current_database_path()
+        self._lock = threading.RLock()
+        self._balances = {}
+        self._enabled = {}
+        self._available = {}
+        self._stale = True
+        self.evaluations = 0
+
+    def attach(self):
+        """Passa a acompanhar as escritas feitas em queries.py (saldos, cardápio, fichas e itens)."""
+        queries.add_stock_change_listener(self._on_stock_change)
+        queries.add_menu_change_listener(self._mark_stale)
+        queries.add_recipe_change_listener(self._mark_stale)
+        queries.add_item_change_listener(self._mark_stale)
+        return self
+
+    def detach(self):
+        """Deixa de acompanhar as escritas (ex.: ao fechar a tela); sem isso a instância nunca é liberada."""
+        queries.remove_stock_change_listener(self._on_stock_change)
+        queries.remove_menu_change_listener(self._mark_stale)
+        queries.remove_recipe_change_listener(self._mark_stale)
+        queries.remove_item_change_listener(self._mark_stale)
+
+    def _is_own_database(self) -> bool:
+        return database.current_database_path() == self._database_path
+
+    def _on_stock_change(self, deltas_by_local):
+        if self._is_own_database():
+            self.apply_stock_changes(deltas_by_local)
+
+    def _mark_stale(self, _changed_id=None):
+        # Mudanças de estrutura (cardápio/fichas/itens) são raras: recalcula tudo na próxima leitura.
+        if not self._is_own_database():
+            return
+        with self._lock:
+            self._stale = True
+
+    def _evaluate(self, menu_item_id: int) -> bool:
+        self.evaluations += 1
+        if not self._enabled.get(menu_item_id, False):
+            return False
+        balances = self._balances
+        return all(balances.get(item_id, 0.0) + _TOLERANCIA >= qty for item_id, qty in self.index.vector(menu_item_id))
+
+    def _publish(self, changes: dict):
+        if changes and self.on_change:
+            try:
+                self.on_change(changes)
+            except Exception as e:
+                logger.error(f"Erro ao publicar mudanças de disponibilidade: {e}", exc_info=True)
+
+    def refresh(self) -> dict:
+        """Recalcula todo o cardápio (uma leitura de saldos). Retorna as mudanças."""
+        with self._lock, database.use_establishment(self._establishment):
+            self._balances = queries.get_stock_balances_by_local(self.id_local_estoque)
+            self._enabled = {row["id"]: bool(row["disponivel"]) for row in queries.get_menu_items()}
+            self.index.compile_all()
+            previous = self._available
+            self._available = {menu_item_id: self._evaluate(menu_item_id) for menu_item_id in self._enabled}
+            self._stale = False
+            changes = {menu_item_id: available for menu_item_id, available in self._available.items()
+                       if previous.get(menu_item_id) != available}
+        self._publish(changes)
+        return changes
+
+    def _ensure_fresh(self):
+        if self._stale:
+            self.refresh()
+
+    def apply_stock_changes(self, deltas_by_local) -> dict:
+        """
+        Aplica variações de saldo {(id_item, id_local): variação} e reavalia só os
+        itens do cardápio afetados. None significa "saldos reconstruídos": recalcula tudo.
+        Retorna {id_cardapio_item: disponivel} com o que mudou.
+        """
+        if deltas_by_local is None or self._stale:
+            return self.refresh()
+        with self._lock, database.use_establishment(self._establishment):
+            affected = set()
+            for (item_id, local_id), delta in deltas_by_local.items():
+                if local_id != self.id_local_estoque:
+                    continue
+                self._balances[item_id] = self._balances.get(item_id, 0.0) + delta
+                affected |= self.index.menu_items_using_item(item_id)
+            changes = {}
+            for menu_item_id in affected:
+                available = self._evaluate(menu_item_id)
+                if self._available.get(menu_item_id) != available:
+                    self._available[menu_item_id] = available
+                    changes[menu_item_id] = available
+        self._publish(changes)
+        return changes
+
+    def is_available(self, menu_item_id: int) -> bool:
+        with self._lock:
+            self._ensure_fresh()
+            return self._available.get(menu_item_id, False)
+
+    def snapshot(self) -> dict:
+        """Disponibilidade atual de todo o cardápio: {id_cardapio_item: disponivel}."""
+        with self._lock:
+            self._ensure_fresh()
+            return dict(self._available)
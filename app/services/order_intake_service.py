@@ -0,0 +1,490 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE RECEBIMENTO DE PEDIDOS (order_intake_service.py)
+# Local: app/services/order_intake_service.py
+# Execução avulsa (na raiz do projeto): python -m app.services.order_intake_service
+# =================================================================================
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from app.database import database, queries
+
+logger = logging.getLogger(__name__)
+
+# Endereço do servidor de pedidos (por padrão só aceita conexões da própria máquina;
+# um proxy reverso publica o endereço para o cardápio digital).
+HOST = os.environ.get("DOSE_CERTA_PEDIDOS_HOST", "127.0.0.1")
+PORT = int(os.environ.get("DOSE_CERTA_PEDIDOS_PORT", "8765"))
+# O aplicativo só sobe o servidor junto com a interface se DOSE_CERTA_PEDIDOS=1.
+ENABLED = os.environ.get("DOSE_CERTA_PEDIDOS", "0") == "1"
+
+# Limites de uma requisição/pedido.
+MAX_BODY_BYTES = 64 * 1024
+MAX_HEADER_LINES = 100
+MAX_ITEMS_PER_ORDER = 50
+MAX_QUANTITY = 99
+MAX_TEXT_LENGTH = 500
+# Conexões ociosas (keep-alive) são fechadas depois deste tempo, em segundos.
+IDLE_TIMEOUT = 15.0
+
+# Fila entre o recebimento e a gravação. Cheia, o servidor responde 503 em vez
+# de acumular memória sem limite.
+QUEUE_SIZE = 5000
+# Máximo de pedidos por transação.
+BATCH_SIZE = 200
+# Tempo máximo (s) em que o cardápio em memória é usado sem ser relido. Escritas
+# feitas neste processo invalidam na hora; o prazo cobre o servidor rodando em
+# outro processo (python -m ...), que não recebe esses avisos.
+MENU_TTL = 30.0
+
+
+class OrderValidationError(ValueError):
+    """Pedido recusado; a mensagem é devolvida ao cliente. `status` é o código HTTP."""
+
+    def __init__(self, message: str, status: int = 422):
+        super().__init__(message)
+        self.status = status
+
+# =================================================================================
+# CARDÁPIO EM MEMÓRIA
+# =================================================================================
+
+class MenuSnapshot:
+    """
+    Cópia em memória do que pode ser pedido: {id_cardapio_item: (nome_venda, preco_venda)}.
+    Validar um pedido não acessa o banco; a cópia é relida depois de uma
+    escrita no cardápio (aviso de queries.py) ou ao fim de `ttl` segundos.
+    A cópia é do banco em que foi criada (principal ou do estabelecimento atual).
+    """
+
+    def __init__(self, ttl: float = MENU_TTL, availability=None):
+        """:param availability: MenuAvailability opcional, para recusar itens esgotados no estoque."""
+        self.ttl = ttl
+        self.availability = availability
+        self._lock = threading.Lock()
+        self._items = {}
+        self._loaded_at = None
+        self._establishment = database.get_current_establishment()
+        self._database_path = database.current_database_path()
+
+    def attach(self):
+        queries.add_menu_change_listener(self._on_menu_change)
+        return self
+
+    def detach(self):
+        queries.remove_menu_change_listener(self._on_menu_change)
+
+    def _on_menu_change(self, changed_id=None):
+        if database.current_database_path() == self._database_path:
+            self.invalidate(changed_id)
+
+    def invalidate(self, _changed_id=None):
+        self._loaded_at = None
+
+    def items(self) -> dict:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return self._items
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                # Marca o horário antes de ler: uma invalidação durante a leitura não se perde.
+                self._loaded_at = time.monotonic()
+                availability = self.availability.snapshot() if self.availability is not None else None
+                with database.use_establishment(self._establishment):
+                    rows = queries.get_menu_items()
+                self._items = {
+                    row["id"]: (row["nome_venda"], round(row["preco_venda"], 2))
+                    for row in rows
+                    if row["disponivel"] and (availability is None or availability.get(row["id"], False))
+                }
+            return self._items
+
+    def as_payload(self) -> dict:
+        return {"itens": [{"id": menu_item_id, "nome": nome, "preco": preco}
+                          for menu_item_id, (nome, preco) in self.items().items()]}
+
+# =================================================================================
+# VALIDAÇÃO
+# =================================================================================
+
+def _text(value, field: str, required: bool = False) -> str:
+    if value is None or value == "":
+        if required:
+            raise OrderValidationError(f"Campo obrigatório: {field}.")
+        return None
+    if not isinstance(value, str):
+        raise OrderValidationError(f"Campo inválido: {field}.")
+    value = value.strip()
+    if required and not value:
+        raise OrderValidationError(f"Campo obrigatório: {field}.")
+    return value[:MAX_TEXT_LENGTH] or None
+
+def validate_order(payload, menu: dict) -> dict:
+    """
+    Confere um pedido recebido contra o cardápio em memória e o devolve no
+    formato de queries.save_orders. Os preços são sempre os do cardápio; se o
+    cliente informar um `total` diferente (cardápio desatualizado na tela dele),
+    o pedido é recusado com 409 para que ele recarregue o cardápio.
+
+    Formato esperado:
+        {"codigo": "opcional, para reenvio idempotente",
+         "cliente": {"nome": "...", "telefone": "..."}, "endereco": "...", "observacoes": "...",
+         "itens": [{"id": 12, "quantidade": 2, "observacao": "sem gelo"}], "total": 59.8}
+    """
+    if not isinstance(payload, dict):
+        raise OrderValidationError("O pedido deve ser um objeto JSON.", 400)
+    cliente = payload.get("cliente")
+    if not isinstance(cliente, dict):
+        raise OrderValidationError("Campo obrigatório: cliente.")
+    itens = payload.get("itens")
+    if not isinstance(itens, list) or not itens:
+        raise OrderValidationError("O pedido não tem itens.")
+    if len(itens) > MAX_ITEMS_PER_ORDER:
+        raise OrderValidationError(f"O pedido tem mais de {MAX_ITEMS_PER_ORDER} itens.")
+
+    codigo = _text(payload.get("codigo"), "codigo")
+    if codigo is not None and len(codigo) > 64:
+        raise OrderValidationError("Campo inválido: codigo.")
+
+    rows = []
+    total = 0.0
+    for entry in itens:
+        if not isinstance(entry, dict):
+            raise OrderValidationError("Item do pedido inválido.")
+        menu_item_id = entry.get("id")
+        quantidade = entry.get("quantidade", 1)
+        if not isinstance(menu_item_id, int) or isinstance(menu_item_id, bool):
+            raise OrderValidationError("Item do pedido sem id.")
+        if not isinstance(quantidade, int) or isinstance(quantidade, bool) or not 1 <= quantidade <= MAX_QUANTITY:
+            raise OrderValidationError(f"Quantidade inválida para o item {menu_item_id}.")
+        if menu_item_id not in menu:
+            raise OrderValidationError(f"Item {menu_item_id} não existe ou está indisponível.", 409)
+        nome, preco = menu[menu_item_id]
+        rows.append((menu_item_id, nome, quantidade, preco, _text(entry.get("observacao"), "observacao")))
+        total += preco * quantidade
+    total = round(total, 2)
+
+    informed = payload.get("total")
+    if informed is not None:
+        if not isinstance(informed, (int, float)) or isinstance(informed, bool):
+            raise OrderValidationError("Campo inválido: total.")
+        if abs(informed - total) > 0.005:
+            raise OrderValidationError(f"O cardápio mudou: o total atual do pedido é {total:.2f}.", 409)
+
+    return {
+        "codigo": codigo or uuid.uuid4().hex,
+        "cliente_nome": _text(cliente.get("nome"), "cliente.nome", required=True),
+        "cliente_telefone": _text(cliente.get("telefone"), "cliente.telefone"),
+        "endereco": _text(payload.get("endereco"), "endereco"),
+        "observacoes": _text(payload.get("observacoes"), "observacoes"),
+        "total": total,
+        "recebido_em": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "itens": rows,
+    }
+
+# =================================================================================
+# SERVIDOR HTTP (asyncio, sem dependências externas)
+# =================================================================================
+
+_REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+            422: "Unprocessable Entity", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _response(status: int, payload=None, keep_alive: bool = True, extra_headers: dict = None) -> bytes:
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json; charset=utf-8",
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        "Cache-Control": "no-store",
+        # O cardápio digital é servido de outro endereço (arquivos estáticos).
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+        "Access-Control-Allow-Headers": "Content-Type",
+    }
+    headers.update(extra_headers or {})
+    head = f"HTTP/1.1 {status} {_REASONS.get(status, 'OK')}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+class OrderIntakeServer:
+    """
+    Recebe pedidos do cardápio digital por HTTP e os grava em lote.
+
+        GET  /cardapio   itens que podem ser pedidos, com preço
+        POST /pedidos    recebe um pedido (JSON); 201 {"id", "codigo", "total"}
+        GET  /saude      tamanho da fila e contadores
+
+    Cada pedido é validado contra o MenuSnapshot (sem acessar o banco) e vai
+    para uma fila. Uma única tarefa de gravação esvazia a fila em lotes de até
+    `batch_size` pedidos por transação (queries.save_orders, em uma thread para
+    não parar o laço de eventos); a resposta só sai quando o lote do pedido foi
+    gravado. Sob carga, os pedidos que chegam durante uma gravação formam o
+    lote seguinte, então o número de transações cresce bem menos que o de pedidos.
+
+    O servidor roda em seu próprio laço de eventos: em uma thread do aplicativo
+    (start_in_thread) ou em um processo separado (python -m ...), nunca no laço do Flet.
+    Os pedidos vão para o banco em que o servidor foi criado (principal ou do
+    estabelecimento atual).
+    """
+
+    def __init__(self, host: str = HOST, port: int = PORT, menu: MenuSnapshot = None,
+                 batch_size: int = BATCH_SIZE, queue_size: int = QUEUE_SIZE, on_orders=None):
+        """:param on_orders: Função chamada (na thread de gravação) com os pedidos de cada lote gravado."""
+        self.host = host
+        self.port = port
+        self.menu = menu or MenuSnapshot().attach()
+        self._establishment = database.get_current_establishment()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_orders = on_orders
+        self._server = None
+        self._queue = None
+        self._writer_task = None
+        self._loop = None
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.persisted = 0
+        self.batches = 0
+
+    # --- Ciclo de vida ------------------------------------------------------------
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Com port=0 o sistema escolhe uma porta livre.
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Servidor de pedidos ouvindo em http://{self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        """Para de aceitar conexões e grava o que já estava na fila."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._writer_task is not None:
+            await self._queue.join()
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        logger.info(f"Servidor de pedidos parado ({self.persisted} pedido(s) gravado(s) em {self.batches} lote(s)).")
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def start_in_thread(self):
+        """Sobe o servidor em uma thread com laço de eventos próprio; retorna quando ele já está ouvindo."""
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except Exception as e:
+                errors.append(e)
+                ready.set()
+                loop.close()
+                return
+            ready.set()
+            try:
+                loop.run_forever()
+            finally:
+                loop.run_until_complete(self.stop())
+                loop.close()
+
+        self._thread = threading.Thread(target=run, name="pedidos", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    def stop_thread(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # --- Gravação em lote ---------------------------------------------------------
+
+    async def _writer_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            orders = [order for order, _ in batch]
+            try:
+                ids = await loop.run_in_executor(None, self._persist, orders)
+            except Exception as e:
+                logger.error(f"Erro ao gravar lote de pedidos: {e}", exc_info=True)
+                ids = None
+            for order, future in batch:
+                if not future.done():
+                    result = ids.get(order["codigo"]) if ids else None
+                    if isinstance(result, OrderValidationError):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+                self._queue.task_done()
+
+    def _persist(self, orders: list) -> dict:
+        """
+        Grava um lote. Retorna {codigo: id}, com um OrderValidationError no lugar
+        do id dos pedidos recusados pelo banco (None se o lote todo falhou).
+        """
+        try:
+            with database.use_establishment(self._establishment):
+                ids = queries.save_orders(orders)
+        except sqlite3.IntegrityError as e:
+            if len(orders) > 1:
+                # Um pedido ruim não pode derrubar os outros do lote: grava um a um.
+                logger.warning(f"Lote de {len(orders)} pedidos recusado ({e}); gravando um a um.")
+                ids = {}
+                for order in orders:
+                    ids.update(self._persist([order]))
+                return ids
+            # Em geral, um item apagado do cardápio depois da última leitura da cópia em memória.
+            logger.warning(f"Pedido {orders[0]['codigo']} recusado pelo banco: {e}")
+            self.menu.invalidate()
+            return {orders[0]["codigo"]: OrderValidationError(
+                "O cardápio mudou: algum item do pedido não está mais disponível.", 409
+            )}
+        if ids is None:
+            return None
+        self.batches += 1
+        self.persisted += len(orders)
+        if self.on_orders:
+            try:
+                self.on_orders(orders)
+            except Exception as e:
+                logger.error(f"Erro ao publicar pedidos recebidos: {e}", exc_info=True)
+        return ids
+
+    async def submit(self, order: dict) -> int:
+        """Enfileira um pedido já validado e espera a gravação. Retorna o id (None se a gravação falhou)."""
+        future = self._loop.create_future()
+        self._queue.put_nowait((order, future))
+        return await future
+
+    # --- HTTP ---------------------------------------------------------------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    writer.write(_response(413, {"erro": "Pedido grande demais."}, keep_alive=False))
+                    await writer.drain()
+                    break
+                body = await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT) if length else b""
+
+                status, payload, extra = await self._dispatch(method, path.split("?", 1)[0], body)
+                writer.write(_response(status, payload, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError:
+            # Linha de requisição ou Content-Length malformados.
+            writer.write(_response(400, {"erro": "Requisição HTTP inválida."}, keep_alive=False))
+        except Exception as e:
+            logger.error(f"Erro inesperado em uma conexão do servidor de pedidos: {e}", exc_info=True)
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple:
+        if method == "OPTIONS":
+            return 204, None, None
+        if path == "/pedidos":
+            if method != "POST":
+                return 405, {"erro": "Use POST."}, None
+            return await self._receive_order(body)
+        if path == "/cardapio":
+            if method != "GET":
+                return 405, {"erro": "Use GET."}, None
+            return 200, self.menu.as_payload(), None
+        if path == "/saude":
+            return 200, {"fila": self._queue.qsize(), "aceitos": self.accepted, "recusados": self.rejected,
+                         "gravados": self.persisted, "lotes": self.batches}, None
+        return 404, {"erro": "Endereço não encontrado."}, None
+
+    async def _receive_order(self, body: bytes) -> tuple:
+        try:
+            payload = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.rejected += 1
+            return 400, {"erro": "JSON inválido."}, None
+        try:
+            order = validate_order(payload, self.menu.items())
+        except OrderValidationError as e:
+            self.rejected += 1
+            return e.status, {"erro": str(e)}, None
+        try:
+            order_id = await self.submit(order)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return 503, {"erro": "Muitos pedidos no momento; tente de novo."}, {"Retry-After": "2"}
+        except OrderValidationError as e:
+            self.rejected += 1
+            return e.status, {"erro": str(e)}, None
+        if order_id is None:
+            return 503, {"erro": "Não foi possível gravar o pedido; tente de novo."}, {"Retry-After": "2"}
+        self.accepted += 1
+        return 201, {"id": order_id, "codigo": order["codigo"], "total": order["total"]}, None
+
+
+def start_in_background() -> OrderIntakeServer:
+    """Sobe o servidor de pedidos junto com o aplicativo, se DOSE_CERTA_PEDIDOS=1."""
+    if not ENABLED:
+        return None
+    try:
+        return OrderIntakeServer().start_in_thread()
+    except OSError as e:
+        logger.error(f"Não foi possível abrir o servidor de pedidos na porta {PORT}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    from app.database import database
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    database.initialize_database()
+    try:
+        asyncio.run(OrderIntakeServer().serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,173 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE FICHAS TÉCNICAS (recipe_service.py)
+# Local: app/services/recipe_service.py
+# =================================================================================
+
+import logging
+import threading
+from app.database import database, queries
+
+logger = logging.getLogger(__name__)
+
+
+class RecipeCycleError(ValueError):
+    """Uma ficha técnica depende (direta ou indiretamente) de si mesma."""
+
+# =================================================================================
+# MOTOR DE EXPANSÃO DE FICHAS TÉCNICAS
+# =================================================================================
+
+class RecipeEngine:
+    """
+    Expande fichas técnicas em quantidades de itens base e calcula o custo.
+
+    Um componente que é um item preparado (itens.id_ficha_tecnica preenchido,
+    ex.: "Xarope da casa") é expandido na ficha que o produz, em qualquer
+    profundidade. As quantidades são divididas pelo rendimento de cada ficha.
+
+    Cada ficha expandida fica memorizada junto com o conjunto de itens e fichas
+    de que depende; uma escrita em um item ou ficha (avisada por queries.py)
+    descarta só as fichas que dependem dele.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._graph = None
+        self._exploded = {}
+        self._costs = {}
+        self._dependencies = {}
+        self._dependents_by_item = {}
+        self._dependents_by_recipe = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load_graph(self):
+        if self._graph is None:
+            self._graph = queries.get_recipe_graph()
+        return self._graph
+
+    # --- Expansão -----------------------------------------------------------------
+
+    def _explode(self, recipe_id: int, visiting: list) -> dict:
+        cached = self._exploded.get(recipe_id)
+        if cached is not None:
+            return cached
+        recipes, components, items = self._load_graph()
+        if recipe_id in visiting:
+            path = visiting[visiting.index(recipe_id):] + [recipe_id]
+            names = " -> ".join(recipes.get(r, (f"#{r}",))[0] for r in path)
+            raise RecipeCycleError(f"Ficha técnica circular: {names}")
+        if recipe_id not in recipes:
+            raise KeyError(f"Ficha técnica ID {recipe_id} não encontrada.")
+        rendimento = recipes[recipe_id][1] or 1
+        if rendimento <= 0:
+            raise ValueError(f"Rendimento inválido na ficha '{recipes[recipe_id][0]}': {rendimento}")
+
+        self.misses += 1
+        visiting.append(recipe_id)
+        result = {}
+        dep_items, dep_recipes = set(), {recipe_id}
+        for item_id, quantidade in components.get(recipe_id, []):
+            per_unit = quantidade / rendimento
+            dep_items.add(item_id)
+            sub_recipe = items[item_id][2] if item_id in items else None
+            if sub_recipe is None:
+                result[item_id] = result.get(item_id, 0.0) + per_unit
+                continue
+            for base_id, base_qty in self._explode(sub_recipe, visiting).items():
+                result[base_id] = result.get(base_id, 0.0) + per_unit * base_qty
+            sub_items, sub_recipes = self._dependencies[sub_recipe]
+            dep_items |= sub_items
+            dep_recipes |= sub_recipes
+        visiting.pop()
+
+        self._exploded[recipe_id] = result
+        self._dependencies[recipe_id] = (dep_items, dep_recipes)
+        for item_id in dep_items:
+            self._dependents_by_item.setdefault(item_id, set()).add(recipe_id)
+        for dep_id in dep_recipes:
+            self._dependents_by_recipe.setdefault(dep_id, set()).add(recipe_id)
+        return result
+
+    def explode(self, recipe_id: int, porcoes: float = 1) -> dict:
+        """
+        Quantidade de cada item base consumida por `porcoes` unidades do
+        rendimento da ficha: {id_item: quantidade}.
+        Levanta RecipeCycleError se a ficha depender de si mesma.
+        """
+        with self._lock:
+            if recipe_id in self._exploded:
+                self.hits += 1
+            exploded = self._explode(recipe_id, [])
+        return {item_id: qty * porcoes for item_id, qty in exploded.items()}
+
+    def unit_cost(self, recipe_id: int) -> float:
+        """Custo de uma unidade do rendimento, somando itens.custo_unitario dos itens base."""
+        with self._lock:
+            cost = self._costs.get(recipe_id)
+            if cost is not None:
+                self.hits += 1
+                return cost
+            exploded = self._explode(recipe_id, [])
+            items = self._load_graph()[2]
+            cost = sum(qty * (items[item_id][1] or 0.0) for item_id, qty in exploded.items() if item_id in items)
+            self._costs[recipe_id] = cost
+            return cost
+
+    def missing_costs(self, recipe_id: int) -> list:
+        """Itens base da ficha sem custo_unitario (o custo da ficha fica subestimado)."""
+        with self._lock:
+            exploded = self._explode(recipe_id, [])
+            items = self._load_graph()[2]
+            return [item_id for item_id in exploded if items.get(item_id, (None, None))[1] is None]
+
+    def dependencies(self, recipe_id: int) -> tuple:
+        """(itens, fichas) de que a expansão da ficha depende, em qualquer nível."""
+        with self._lock:
+            self._explode(recipe_id, [])
+            dep_items, dep_recipes = self._dependencies[recipe_id]
+            return frozenset(dep_items), frozenset(dep_recipes)
+
+    def price_menu(self, recipe_ids: list) -> dict:
+        """Custo unitário de várias fichas (ex.: todo o cardápio): {id_ficha: custo}."""
+        return {recipe_id: self.unit_cost(recipe_id) for recipe_id in recipe_ids}
+
+    # --- Invalidação --------------------------------------------------------------
+
+    def _forget(self, recipe_ids):
+        for recipe_id in list(recipe_ids):
+            self._exploded.pop(recipe_id, None)
+            self._costs.pop(recipe_id, None)
+            dep_items, dep_recipes = self._dependencies.pop(recipe_id, ((), ()))
+            for item_id in dep_items:
+                self._dependents_by_item.get(item_id, set()).discard(recipe_id)
+            for dep_id in dep_recipes:
+                self._dependents_by_recipe.get(dep_id, set()).discard(recipe_id)
+
+    def invalidate_item(self, item_id: int):
+        """Descarta as fichas que usam o item (direto ou via sub-receita)."""
+        with self._lock:
+            self._graph = None
+            self._forget(self._dependents_by_item.pop(item_id, set()))
+
+    def invalidate_recipe(self, recipe_id: int):
+        """Descarta a ficha e todas as que a usam como sub-receita."""
+        with self._lock:
+            self._graph = None
+            self._forget(self._dependents_by_recipe.pop(recipe_id, set()) | {recipe_id})
+
+    def clear(self):
+        with self._lock:
+            self._graph = None
+            self._exploded.clear()
+            self._costs.clear()
+            self._dependencies.clear()
+            self._dependents_by_item.clear()
+            self._dependents_by_recipe.clear()
+
+
+# Motor usado pelo aplicativo (um por arquivo de banco), invalidado
+# automaticamente pelas escritas em itens e fichas técnicas feitas em queries.py.
+recipe_engine = database.DatabaseScoped(RecipeEngine)
+queries.add_item_change_listener(recipe_engine.listener("invalidate_item"))
+queries.add_recipe_change_listener(recipe_engine.listener("invalidate_recipe"))
@@ -0,0 +1,63 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE VENDAS (sales_service.py)
+# Local: app/services/sales_service.py
+# =================================================================================
+
+import logging
+from app.database import queries
+from app.services.menu_service import menu_index
+from app.services.stock_ledger_service import TIPO_VENDA
+
+logger = logging.getLogger(__name__)
+
+# =================================================================================
+# BAIXA DE ESTOQUE POR VENDAS
+# =================================================================================
+
+def aggregate_deductions(sales) -> dict:
+    """
+    Soma o que um lote de vendas baixa de cada item: {id_item: quantidade}.
+
+    :param sales: {id_cardapio_item: quantidade_vendida} ou lista de tuplas
+                  (id_cardapio_item, quantidade_vendida); repetições são somadas.
+    """
+    sold = {}
+    for menu_item_id, quantidade in (sales.items() if isinstance(sales, dict) else sales):
+        if quantidade <= 0:
+            raise ValueError(f"Quantidade vendida inválida para o item de cardápio {menu_item_id}: {quantidade}")
+        sold[menu_item_id] = sold.get(menu_item_id, 0) + quantidade
+
+    totals = {}
+    for menu_item_id, quantidade in sold.items():
+        try:
+            vector = menu_index.vector(menu_item_id)
+        except KeyError:
+            raise ValueError(f"Item de cardápio inexistente: {menu_item_id}") from None
+        if not vector:
+            logger.warning(f"Item de cardápio {menu_item_id} sem item de estoque nem ficha técnica; nada a baixar.")
+        for item_id, per_unit in vector:
+            totals[item_id] = totals.get(item_id, 0.0) + per_unit * quantidade
+    return totals
+
+def record_sales(sales, id_local_estoque: int, id_usuario: int, observacao: str = None) -> bool:
+    """
+    Baixa do estoque um lote de vendas do cardápio em UMA transação.
+
+    Cada item do cardápio já tem seu vetor de baixa pré-compilado
+    (menu_service), então o lote vira uma soma por item de estoque e o banco
+    recebe uma única linha de livro e uma única atualização de saldo por item,
+    não importa quantas vendas ou ingredientes o lote tenha.
+    """
+    totals = aggregate_deductions(sales)
+    if not totals:
+        return True
+    note = observacao or "Venda do cardápio"
+    rows = [(item_id, id_local_estoque, id_usuario, TIPO_VENDA, -qty, note) for item_id, qty in totals.items()]
+    ok = queries.apply_stock_movements(
+        rows,
+        {(item_id, id_local_estoque): -qty for item_id, qty in totals.items()},
+        {item_id: -qty for item_id, qty in totals.items()},
+    )
+    if ok:
+        logger.info(f"Vendas baixadas do estoque: {len(rows)} item(ns) de estoque no local {id_local_estoque}.")
+    return ok
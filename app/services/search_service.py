@@ -0,0 +1,72 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE BUSCA (search_service.py)
+# Local: app/services/search_service.py
+# =================================================================================
+
+import contextvars
+import logging
+import threading
+from app.database import queries
+
+logger = logging.getLogger(__name__)
+
+# Tempo (s) sem digitação antes de a busca ser disparada.
+DEFAULT_DEBOUNCE_SECONDS = 0.25
+
+# =================================================================================
+# BUSCA COM DEBOUNCE
+# =================================================================================
+
+class DebouncedItemSearch:
+    """
+    Busca de itens "digite-e-encontre" com debounce.
+
+    Cada chamada a submit() reinicia um temporizador; a consulta só é feita
+    quando o usuário para de digitar por `delay` segundos. Resultados de
+    buscas antigas que terminarem depois de uma mais nova são descartados.
+    """
+
+    def __init__(self, on_results, delay: float = DEFAULT_DEBOUNCE_SECONDS, limit: int = 50):
+        """
+        :param on_results: Função chamada com (texto, resultados) ao fim de cada busca.
+        :param delay: Intervalo de debounce em segundos.
+        :param limit: Quantidade máxima de resultados.
+        """
+        self.on_results = on_results
+        self.delay = delay
+        self.limit = limit
+        self._timer = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def submit(self, text: str):
+        """Agenda a busca de `text`, cancelando a que ainda estiver pendente."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            if self._timer:
+                self._timer.cancel()
+            # A busca roda no mesmo banco (estabelecimento) de quem a pediu.
+            self._timer = threading.Timer(self.delay, contextvars.copy_context().run,
+                                          args=(self._run, text, generation))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        """Cancela a busca pendente, se houver."""
+        with self._lock:
+            self._generation += 1
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _run(self, text: str, generation: int):
+        try:
+            results = queries.search_items(text, self.limit) if text.strip() else []
+        except Exception as e:
+            logger.error(f"Erro na busca de itens por '{text}': {e}", exc_info=True)
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # Uma busca mais nova já foi pedida.
+        self.on_results(text, results)
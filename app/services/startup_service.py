@@ -0,0 +1,83 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE INICIALIZAÇÃO (startup_service.py)
+# Local: app/services/startup_service.py
+# =================================================================================
+
+import hashlib
+import json
+import logging
+from app.database import queries
+from app.database.database import CREATE_TABLES_SQL, initialize_database
+from app.database.migrations import LATEST_VERSION, MIGRATIONS
+from app.database.seeder import INITIAL_CATEGORIES, INITIAL_UNITS, INITIAL_ITEMS, seed_database
+from app.services import auth_service
+
+logger = logging.getLogger(__name__)
+
+# Chave da impressão digital na tabela app_metadados.
+FINGERPRINT_KEY = "fingerprint_esquema_catalogo"
+
+# =================================================================================
+# FUNÇÕES DO SERVIÇO
+# =================================================================================
+
+def compute_fingerprint() -> str:
+    """
+    Calcula a impressão digital (SHA-256) de tudo o que a inicialização garante:
+    esquema base, migrações, catálogo inicial e usuário padrão. Qualquer
+    alteração nesses dados gera um valor diferente e força uma inicialização completa.
+    """
+    payload = {
+        "tables": CREATE_TABLES_SQL,
+        "migrations": MIGRATIONS,
+        "categories": INITIAL_CATEGORIES,
+        "units": INITIAL_UNITS,
+        "items": INITIAL_ITEMS,
+        "default_user": auth_service.DEFAULT_USER_EMAIL,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+def _is_fully_initialized() -> bool:
+    """Confere se todas as migrações, o usuário padrão e o catálogo inicial estão no banco."""
+    version = queries.get_schema_version()
+    if version != LATEST_VERSION:
+        logger.warning(f"Esquema na versão {version}, esperada {LATEST_VERSION}.")
+        return False
+    if queries.get_user_by_email(auth_service.DEFAULT_USER_EMAIL) is None:
+        return False
+    missing = queries.count_missing_seed_rows(
+        INITIAL_CATEGORIES,
+        [unit["nome"] for unit in INITIAL_UNITS],
+        [item["nome"] for item in INITIAL_ITEMS],
+    )
+    return missing == 0
+
+def bootstrap_database() -> bool:
+    """
+    Prepara o banco de dados antes do primeiro page.go("/").
+
+    Partida a quente: se a impressão digital gravada no banco for igual à
+    atual, criação de tabelas, usuário padrão (hash bcrypt) e povoamento são
+    pulados com uma única leitura de metadados.
+    Partida a frio: executa tudo e grava a impressão digital ao final.
+
+    :return: True se foi uma partida a quente (nada precisou ser feito).
+    """
+    fingerprint = compute_fingerprint()
+    if queries.get_metadata(FINGERPRINT_KEY) == fingerprint:
+        logger.info("Partida a quente: esquema e catálogo inalterados. Inicialização do banco pulada.")
+        return True
+
+    logger.info("Partida a frio: inicializando esquema, usuário padrão e catálogo.")
+    initialize_database()
+    auth_service.create_default_user()
+    seed_database()
+
+    # Só grava a impressão digital se tudo foi realmente aplicado; caso
+    # contrário a próxima partida tenta de novo.
+    if _is_fully_initialized():
+        queries.set_metadata(FINGERPRINT_KEY, fingerprint)
+    else:
+        logger.warning("Inicialização incompleta. A impressão digital não foi gravada.")
+    return False
@@ -0,0 +1,222 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE CONTAGEM DE ESTOQUE (stock_count_service.py)
+# Local: app/services/stock_count_service.py
+# =================================================================================
+
+import glob
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from app.database import database, queries
+from app.services import stock_ledger_service
+
+logger = logging.getLogger(__name__)
+
+# Pasta (ao lado do arquivo do banco) onde ficam os diários das contagens em andamento.
+JOURNAL_DIR_NAME = "contagens_pendentes"
+# Força a gravação física de cada entrada do diário (sobrevive a queda de energia).
+JOURNAL_FSYNC = True
+
+
+def get_journal_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), JOURNAL_DIR_NAME)
+
+
+def find_pending_sessions(journal_dir: str = None) -> list:
+    """Diários de contagens que não foram concluídas (ex.: o app fechou no meio)."""
+    return sorted(glob.glob(os.path.join(journal_dir or get_journal_dir(), "*.jsonl")))
+
+# =================================================================================
+# SESSÃO DE CONTAGEM
+# =================================================================================
+
+class CountSession:
+    """
+    Uma contagem em andamento em um local de estoque.
+
+    As quantidades contadas ficam em um rascunho em memória ({id_item: quantidade})
+    e cada alteração é acrescentada a um diário (arquivo .jsonl), de onde a
+    sessão pode ser retomada com CountSession.resume() se o app fechar.
+    A quantidade do sistema é lida uma única vez, no início da sessão.
+    Nada vai para o banco até commit(), que grava tudo em uma transação.
+    """
+
+    def __init__(self, id_local_estoque: int, id_usuario: int, system_quantities: dict,
+                 journal_path: str, started_at: str):
+        self.id_local_estoque = id_local_estoque
+        self.id_usuario = id_usuario
+        self.system_quantities = system_quantities
+        self.journal_path = journal_path
+        self.started_at = started_at
+        self.counted = {}
+        self._journal = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def start(cls, id_local_estoque: int, id_usuario: int, journal_dir: str = None) -> "CountSession":
+        """Abre uma nova contagem, fotografando os saldos do local com uma única consulta."""
+        journal_dir = journal_dir or get_journal_dir()
+        os.makedirs(journal_dir, exist_ok=True)
+        started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        journal_path = os.path.join(
+            journal_dir, f"contagem_local{id_local_estoque}_{datetime.now():%Y%m%d_%H%M%S_%f}.jsonl"
+        )
+        session = cls(id_local_estoque, id_usuario, queries.get_stock_balances_by_local(id_local_estoque),
+                      journal_path, started_at)
+        session._append([{
+            "local": id_local_estoque, "usuario": id_usuario, "inicio": started_at,
+            "sistema": {str(item_id): qty for item_id, qty in session.system_quantities.items()},
+        }])
+        logger.info(f"Contagem iniciada no local {id_local_estoque} ({len(session.system_quantities)} saldos lidos).")
+        return session
+
+    @classmethod
+    def resume(cls, journal_path: str) -> "CountSession":
+        """
+        Reconstrói uma contagem interrompida a partir do seu diário. Uma última
+        linha cortada pela queda é descartada e o arquivo volta ao fim da última
+        linha completa, para que as próximas entradas não sejam gravadas em
+        continuação a ela. Levanta ValueError (e apaga o diário) se nem o
+        cabeçalho chegou a ser gravado por inteiro.
+        """
+        with open(journal_path, "rb") as f:
+            data = f.read()
+        entries, good_end = [], 0
+        while good_end < len(data):
+            line_end = data.find(b"\n", good_end)
+            if line_end < 0:
+                break
+            try:
+                entries.append(json.loads(data[good_end:line_end]))
+            except ValueError:
+                break
+            good_end = line_end + 1
+        if good_end < len(data):
+            # O que veio antes continua válido.
+            logger.warning(f"Entrada incompleta descartada no diário '{journal_path}'.")
+            with open(journal_path, "r+b") as f:
+                f.truncate(good_end)
+                if JOURNAL_FSYNC:
+                    os.fsync(f.fileno())
+        if not entries or "sistema" not in entries[0]:
+            # A queda cortou o próprio cabeçalho: nenhuma quantidade chegou a ser
+            # registrada depois dele, então o diário é apagado sem perda.
+            os.remove(journal_path)
+            raise ValueError(f"Diário '{journal_path}' sem cabeçalho completo (nenhuma contagem registrada); "
+                             f"arquivo descartado.")
+        header = entries[0]
+        session = cls(header["local"], header["usuario"],
+                      {int(item_id): qty for item_id, qty in header["sistema"].items()},
+                      journal_path, header["inicio"])
+        for entry in entries[1:]:
+            session._apply(entry)
+        logger.info(f"Contagem retomada de '{journal_path}' com {len(session.counted)} itens.")
+        return session
+
+    # --- Diário -------------------------------------------------------------------
+
+    def _append(self, entries: list):
+        if self._journal is None:
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._journal.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+        self._journal.flush()
+        if JOURNAL_FSYNC:
+            os.fsync(self._journal.fileno())
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _apply(self, entry: dict):
+        """Aplica uma entrada do diário ao rascunho em memória."""
+        item_id, op = entry["i"], entry["op"]
+        if op == "set":
+            self.counted[item_id] = entry["q"]
+        elif op == "add":
+            self.counted[item_id] = self.counted.get(item_id, 0) + entry["q"]
+        elif op == "del":
+            self.counted.pop(item_id, None)
+
+    def _record(self, entries: list):
+        with self._lock:
+            self._append(entries)
+            for entry in entries:
+                self._apply(entry)
+
+    # --- Operações de contagem ----------------------------------------------------
+
+    def set_count(self, id_item: int, quantidade: float):
+        """Define a quantidade contada de um item (digitação)."""
+        if quantidade < 0:
+            raise ValueError("A quantidade contada não pode ser negativa.")
+        self._record([{"i": id_item, "op": "set", "q": quantidade}])
+
+    def add_count(self, id_item: int, quantidade: float = 1):
+        """Soma à quantidade contada de um item (ex.: uma leitura de código de barras)."""
+        self._record([{"i": id_item, "op": "add", "q": quantidade}])
+
+    def add_counts(self, increments: dict):
+        """
+        Soma várias quantidades de uma vez, com uma única gravação no diário.
+        Pode ser usado direto como on_flush de barcode_service.ScanBatcher.
+        """
+        if increments:
+            self._record([{"i": item_id, "op": "add", "q": qty} for item_id, qty in increments.items()])
+
+    def remove_item(self, id_item: int):
+        """Tira um item da contagem (volta a "não contado")."""
+        self._record([{"i": id_item, "op": "del"}])
+
+    def system_quantity(self, id_item: int) -> float:
+        """Saldo do sistema no início da contagem."""
+        return self.system_quantities.get(id_item, 0.0)
+
+    def variance(self, id_item: int) -> float:
+        """Diferença contada - sistema de um item já contado."""
+        return self.counted.get(id_item, 0.0) - self.system_quantity(id_item)
+
+    # --- Conclusão ----------------------------------------------------------------
+
+    def commit(self, observacoes: str = None, apply_adjustments: bool = True) -> int:
+        """
+        Grava a contagem em uma única transação e apaga o diário.
+
+        :param apply_adjustments: Se True, lança no livro um 'ajuste' por item
+                                  com diferença, levando o saldo ao valor contado.
+                                  A diferença é calculada sobre o saldo no momento
+                                  da gravação (não o do início), para que vendas
+                                  feitas durante a contagem não contem duas vezes;
+                                  contagem_itens guarda o saldo do início.
+        :return: O id da contagem (None se a gravação falhar; o diário é mantido).
+        """
+        with self._lock:
+            count_rows = [(item_id, qty, self.system_quantity(item_id)) for item_id, qty in self.counted.items()]
+            count_id = queries.save_stock_count(self.id_local_estoque, self.id_usuario, observacoes,
+                                                count_rows, adjust_to_counted=apply_adjustments)
+            if count_id is None:
+                logger.error(f"Falha ao gravar a contagem; diário mantido em '{self.journal_path}'.")
+                return None
+            self._close_journal()
+            self._remove_journal()
+        logger.info(f"Contagem {count_id} gravada: {len(count_rows)} itens"
+                    f"{', saldos ajustados ao contado' if apply_adjustments else ''}.")
+        # Fronteira de contagem: fotografa os saldos para as consultas históricas.
+        stock_ledger_service.take_snapshot(self.id_local_estoque, id_contagem=count_id)
+        return count_id
+
+    def discard(self):
+        """Abandona a contagem sem gravar nada."""
+        with self._lock:
+            self._close_journal()
+            self._remove_journal()
+            self.counted.clear()
+        logger.info(f"Contagem do local {self.id_local_estoque} descartada.")
+
+    def _remove_journal(self):
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
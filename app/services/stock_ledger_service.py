@@ -0,0 +1,191 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DO LIVRO DE ESTOQUE (stock_ledger_service.py)
+# Local: app/services/stock_ledger_service.py
+# =================================================================================
+
+import contextvars
+import logging
+import threading
+from datetime import date, datetime
+from app.database import queries
+
+logger = logging.getLogger(__name__)
+
+# Tipos de movimentação gravados em movimentacoes_estoque.tipo_movimentacao.
+TIPO_COMPRA = "compra"      # entrada
+TIPO_VENDA = "venda"        # saída
+TIPO_PERDA = "perda"        # saída
+TIPO_AJUSTE = "ajuste"      # variação com sinal (ex.: diferença de contagem)
+
+# Sinal aplicado à quantidade informada por tipo (ajustes já vêm com sinal).
+_SINAIS = {TIPO_COMPRA: 1, TIPO_VENDA: -1, TIPO_PERDA: -1, TIPO_AJUSTE: 1}
+
+# Tolerância para comparar saldos em ponto flutuante.
+_TOLERANCIA = 1e-6
+
+# =================================================================================
+# FUNÇÕES DO SERVIÇO
+# =================================================================================
+
+def record_movements(movements: list, id_usuario: int) -> bool:
+    """
+    Registra um lote de movimentações de forma atômica.
+
+    :param movements: Lista de dicionários com id_item, id_local_estoque,
+                      tipo (TIPO_*), quantidade e, opcionalmente, observacao.
+    :param id_usuario: Usuário responsável pelas movimentações.
+    :return: True se o lote foi gravado.
+
+    O livro (movimentacoes_estoque) só recebe inserções; os saldos por
+    item/local (saldos_estoque) e por item (itens.quantidade_estoque) são
+    atualizados na mesma transação, com as variações já agregadas.
+    """
+    rows = []
+    deltas_by_local = {}
+    deltas_by_item = {}
+    for movement in movements:
+        tipo = movement["tipo"]
+        if tipo not in _SINAIS:
+            raise ValueError(f"Tipo de movimentação inválido: {tipo}")
+        quantidade = float(movement["quantidade"])
+        if tipo != TIPO_AJUSTE and quantidade <= 0:
+            raise ValueError(f"A quantidade de uma {tipo} deve ser positiva.")
+        delta = _SINAIS[tipo] * quantidade
+        item_id = movement["id_item"]
+        local_id = movement["id_local_estoque"]
+
+        rows.append((item_id, local_id, id_usuario, tipo, delta, movement.get("observacao")))
+        deltas_by_local[(item_id, local_id)] = deltas_by_local.get((item_id, local_id), 0.0) + delta
+        deltas_by_item[item_id] = deltas_by_item.get(item_id, 0.0) + delta
+
+    if not rows:
+        return True
+    ok = queries.apply_stock_movements(rows, deltas_by_local, deltas_by_item)
+    if ok:
+        logger.info(f"{len(rows)} movimentação(ões) registrada(s) no livro de estoque.")
+    return ok
+
+def register_purchase(id_item: int, id_local_estoque: int, quantidade: float, id_usuario: int, observacao: str = None) -> bool:
+    """Entrada de estoque (compra)."""
+    return record_movements([{"id_item": id_item, "id_local_estoque": id_local_estoque, "tipo": TIPO_COMPRA,
+                              "quantidade": quantidade, "observacao": observacao}], id_usuario)
+
+def register_sale(id_item: int, id_local_estoque: int, quantidade: float, id_usuario: int, observacao: str = None) -> bool:
+    """Saída de estoque por venda."""
+    return record_movements([{"id_item": id_item, "id_local_estoque": id_local_estoque, "tipo": TIPO_VENDA,
+                              "quantidade": quantidade, "observacao": observacao}], id_usuario)
+
+def register_loss(id_item: int, id_local_estoque: int, quantidade: float, id_usuario: int, observacao: str = None) -> bool:
+    """Saída de estoque por perda (quebra, vencimento, etc.)."""
+    return record_movements([{"id_item": id_item, "id_local_estoque": id_local_estoque, "tipo": TIPO_PERDA,
+                              "quantidade": quantidade, "observacao": observacao}], id_usuario)
+
+def register_adjustment(id_item: int, id_local_estoque: int, variacao: float, id_usuario: int, observacao: str = None) -> bool:
+    """Ajuste manual com sinal (positivo soma, negativo subtrai)."""
+    return record_movements([{"id_item": id_item, "id_local_estoque": id_local_estoque, "tipo": TIPO_AJUSTE,
+                              "quantidade": variacao, "observacao": observacao}], id_usuario)
+
+def get_balance(id_item: int, id_local_estoque: int) -> float:
+    """Saldo atual de um item em um local, lido da tabela materializada (O(1))."""
+    return queries.get_stock_balance(id_item, id_local_estoque)
+
+def _diff(expected: dict, materialized: dict) -> dict:
+    """Chaves cujo valor materializado difere do valor esperado: {chave: (esperado, materializado)}."""
+    differences = {}
+    for key in expected.keys() | materialized.keys():
+        exp = expected.get(key, 0.0) or 0.0
+        mat = materialized.get(key, 0.0) or 0.0
+        if abs(exp - mat) > _TOLERANCIA:
+            differences[key] = (exp, mat)
+    return differences
+
+def rebuild_balances(apply: bool = False) -> dict:
+    """
+    Recalcula todos os saldos a partir do livro e os compara com os materializados.
+
+    :param apply: Se True, substitui os saldos materializados pelos recalculados.
+    :return: {"locais": {(id_item, id_local): (livro, materializado)},
+              "itens": {id_item: (livro, materializado)}} com as divergências encontradas.
+    """
+    ledger_by_local, ledger_by_item = queries.get_ledger_totals()
+    current_by_local, current_by_item = queries.get_materialized_balances()
+    differences = {
+        "locais": _diff(ledger_by_local, current_by_local),
+        "itens": _diff(ledger_by_item, current_by_item),
+    }
+    total = len(differences["locais"]) + len(differences["itens"])
+    if total:
+        logger.warning(f"{total} saldo(s) materializado(s) divergente(s) do livro de movimentações.")
+    else:
+        logger.info("Saldos materializados conferem com o livro de movimentações.")
+    if apply and total:
+        queries.replace_materialized_balances(ledger_by_local, ledger_by_item)
+        logger.info("Saldos materializados reconstruídos a partir do livro.")
+    return differences
+
+# =================================================================================
+# FOTOGRAFIAS (SNAPSHOTS) DE SALDO E CONSULTAS HISTÓRICAS
+# =================================================================================
+
+def _as_timestamp(value) -> str:
+    """
+    Normaliza o instante da consulta para o formato gravado no banco.
+    Uma data (sem hora) significa o fim daquele dia ("fechamento do dia 3").
+    """
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return f"{value.isoformat()} 23:59:59"
+    if len(value) == 10:
+        return f"{value} 23:59:59"
+    return value
+
+def take_snapshot(id_local_estoque: int, id_contagem: int = None, data_snapshot=None) -> int:
+    """
+    Fotografa os saldos atuais de um local. Chamado automaticamente ao
+    concluir uma contagem e uma vez por dia (take_daily_snapshots).
+    Retorna o id da fotografia (None em caso de falha).
+    """
+    stamp = _as_timestamp(data_snapshot) if data_snapshot is not None else None
+    snapshot_id = queries.create_stock_snapshot(id_local_estoque, stamp, id_contagem)
+    if snapshot_id is not None:
+        logger.info(f"Fotografia de saldos {snapshot_id} gravada para o local {id_local_estoque}.")
+    return snapshot_id
+
+def take_daily_snapshots() -> int:
+    """Fotografa cada local que ainda não tem fotografia de hoje. Retorna quantas foram gravadas."""
+    today = date.today().isoformat()
+    taken = 0
+    for local_id in queries.get_all_stock_location_ids():
+        if not queries.has_snapshot_since(local_id, today):
+            if take_snapshot(local_id) is not None:
+                taken += 1
+    return taken
+
+def take_daily_snapshots_in_background():
+    """Executa take_daily_snapshots em uma thread, sem atrasar a abertura do app (no banco atual)."""
+    threading.Thread(target=contextvars.copy_context().run, args=(take_daily_snapshots,),
+                     name="stock-snapshots", daemon=True).start()
+
+def get_balance_as_of(id_item: int, id_local_estoque: int, as_of) -> float:
+    """Saldo de um item em um local em uma data/instante passado."""
+    balances = queries.get_balances_as_of(id_local_estoque, _as_timestamp(as_of), id_item)
+    return balances.get(id_item, 0.0)
+
+def get_balances_as_of(id_local_estoque: int, as_of) -> dict:
+    """Saldos de todos os itens de um local em uma data/instante passado: {id_item: quantidade}."""
+    return queries.get_balances_as_of(id_local_estoque, _as_timestamp(as_of))
+
+
+# Permite verificar/reconstruir os saldos pela linha de comando:
+#   python -m app.services.stock_ledger_service            (apenas verifica)
+#   python -m app.services.stock_ledger_service --rebuild  (reconstrói)
+if __name__ == '__main__':
+    import sys
+    from app.database.database import initialize_database
+    initialize_database()
+    result = rebuild_balances(apply="--rebuild" in sys.argv)
+    for group, rows in result.items():
+        for key, (expected, materialized) in sorted(rows.items()):
+            print(f"{group} {key}: livro={expected:g} materializado={materialized:g}")
+    sys.exit(1 if any(result.values()) and "--rebuild" not in sys.argv else 0)
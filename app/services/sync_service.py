@@ -0,0 +1,632 @@
+# =================================================================================
+# MÓDULO DE SERVIÇO DE SINCRONIZAÇÃO COM A NUVEM (sync_service.py)
+# Local: app/services/sync_service.py
+# =================================================================================
+
+import base64
+import glob
+import json
+import logging
+import os
+import random
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urllib_error, parse as urllib_parse, request as urllib_request
+from app.database import database, queries
+from app.database.migrations import FIELD_MERGE_TABLES, LEDGER_TABLES
+
+# msgpack é opcional: sem ele, os lotes vão em JSON compacto (também comprimido).
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Chaves de app_metadados: última versão da fila já confirmada pela nuvem,
+# identificação deste aparelho e posição (marca d'água) da leitura da nuvem.
+SENT_VERSION_KEY = "sync_versao_enviada"
+DEVICE_ID_KEY = "sync_id_aparelho"
+REMOTE_CURSOR_KEY = "sync_cursor_remoto"
+# Lotes recebidos que não puderam ser aplicados ficam em app_metadados sob
+# QUARANTINE_KEY_PREFIX + sequência (com o conteúdo), para não travar a leitura
+# dos seguintes. Cada sincronização tenta aplicá-los de novo, até
+# QUARANTINE_MAX_ATTEMPTS vezes; depois disso só retry_quarantined(force=True).
+QUARANTINE_KEY_PREFIX = "sync_quarentena:"
+QUARANTINE_MAX_ATTEMPTS = 10
+
+# Mudanças por lote enviado e lotes por leitura da nuvem (limita memória e o
+# tamanho de cada requisição em Wi-Fi/4G instáveis).
+BATCH_SIZE = 500
+PULL_LIMIT = 20
+# Intervalo (s) entre sincronizações automáticas.
+SYNC_INTERVAL = 60.0
+# Tentativas por envio/leitura e espera exponencial entre elas (s).
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Nível do zlib: 6 é o ponto em que mais compressão quase não reduz o tamanho.
+COMPRESSION_LEVEL = 6
+
+
+class SyncError(Exception):
+    """Falha permanente da sincronização (lote inválido, recusado pela nuvem, etc.)."""
+
+
+class SyncTransportError(SyncError):
+    """Falha temporária (rede, servidor ocupado): a operação é repetida com espera."""
+
+# =================================================================================
+# FILA DE ENVIO (CAPTURA DE MUDANÇAS)
+# =================================================================================
+# Os triggers da migração 9 registram em sync_outbox (tabela, id_linha,
+# operacao, versao, registrado_em) cada escrita nas tabelas sincronizadas. O
+# envio lê só as entradas com versao acima da última confirmada e busca o
+# conteúdo atual de cada linha no momento do envio.
+
+def get_sent_version() -> int:
+    return int(queries.get_metadata(SENT_VERSION_KEY) or 0)
+
+def pending_count() -> int:
+    return queries.count_outbox_changes(get_sent_version())
+
+def pending_changes(limit: int = 500) -> list:
+    """Próximas mudanças a enviar: tuplas (versao, tabela, id_linha, operacao, registrado_em)."""
+    return queries.get_outbox_changes(get_sent_version(), limit)
+
+def compact_pending() -> int:
+    """
+    Junta as várias mudanças pendentes de uma mesma linha em uma só antes do
+    envio (ex.: um item editado 20 vezes desde a última sincronização vira uma
+    única entrada). Retorna quantas entradas foram removidas da fila.
+    """
+    removed = queries.compact_outbox(get_sent_version())
+    if removed:
+        logger.info(f"Fila de sincronização compactada: {removed} entrada(s) redundante(s) removida(s).")
+    return removed
+
+def mark_sent(version: int):
+    """Registra que a nuvem confirmou tudo até `version` e apaga essas entradas da fila."""
+    queries.set_metadata(SENT_VERSION_KEY, str(version))
+    queries.prune_outbox(version)
+
+def get_device_id() -> str:
+    """Identificação deste aparelho, criada na primeira sincronização."""
+    device_id = queries.get_metadata(DEVICE_ID_KEY)
+    if not device_id:
+        device_id = uuid.uuid4().hex
+        queries.set_metadata(DEVICE_ID_KEY, device_id)
+    return device_id
+
+def _quarantine_key(seq: int) -> str:
+    return f"{QUARANTINE_KEY_PREFIX}{seq:012d}"
+
+def _quarantine(seq: int, data: bytes, error: str):
+    logger.error(f"Lote {seq} recebido da nuvem não pôde ser aplicado e foi posto em quarentena: {error}")
+    queries.set_metadata(_quarantine_key(seq), json.dumps({
+        "seq": seq, "erro": error, "tentativas": 1, "em": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "lote": base64.b64encode(data).decode("ascii"),
+    }))
+
+def list_quarantined() -> list:
+    """Lotes em quarentena (sem o conteúdo), para exibição: [{"seq", "erro", "tentativas", "em"}]."""
+    entries = []
+    for value in queries.get_metadata_by_prefix(QUARANTINE_KEY_PREFIX).values():
+        entry = json.loads(value)
+        entry.pop("lote", None)
+        entries.append(entry)
+    return entries
+
+# =================================================================================
+# LOTES: MONTAGEM E SERIALIZAÇÃO
+# =================================================================================
+# Um lote agrupa as linhas por tabela, com os nomes das colunas uma única vez:
+#   {"origem": id_aparelho, "de": versao, "ate": versao, "mudancas": n,
+#    "tabelas": [{"tabela", "colunas", "linhas": [[id, ...]], "apagadas": [id, ...],
+#                 "versoes": [{coluna: [hlc, aparelho]}, ...], "versoes_apagadas": [[hlc, aparelho]]}],
+#    "ids": {tabela: [[id, origem, id_origem], ...]}}
+# `versoes` acompanha `linhas` e `versoes_apagadas` acompanha `apagadas` (mesma
+# posição); as duas faltam nas tabelas de livro.
+# Os ids são os do remetente. Uma linha (ou referência) que ele recebeu de
+# outro aparelho aparece em `ids` com a identidade de quem a criou; as demais
+# nasceram nele. Quem recebe traduz para os próprios ids (queries.get_sync_keys
+# e apply_remote_changes), então linhas criadas sem conexão em aparelhos
+# diferentes nunca se confundem por terem o mesmo id.
+# Em bytes: 1 byte de formato (M = msgpack, J = JSON) + o corpo comprimido com zlib.
+
+_FORMAT_MSGPACK = b"M"
+_FORMAT_JSON = b"J"
+
+
+def encode_batch(batch: dict) -> bytes:
+    if msgpack is not None:
+        return _FORMAT_MSGPACK + zlib.compress(msgpack.packb(batch, use_bin_type=True), COMPRESSION_LEVEL)
+    body = json.dumps(batch, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _FORMAT_JSON + zlib.compress(body, COMPRESSION_LEVEL)
+
+def decode_batch(data: bytes) -> dict:
+    marker, body = data[:1], zlib.decompress(data[1:])
+    if marker == _FORMAT_JSON:
+        return json.loads(body)
+    if marker == _FORMAT_MSGPACK:
+        if msgpack is None:
+            raise SyncError("Lote recebido em msgpack, mas o pacote msgpack não está instalado.")
+        return msgpack.unpackb(body, raw=False)
+    raise SyncError("Formato de lote desconhecido.")
+
+def build_outgoing_batch(limit: int = BATCH_SIZE) -> dict:
+    """
+    Monta o próximo lote com até `limit` mudanças da fila (None se não houver).
+    O conteúdo das linhas é lido agora, então várias mudanças de uma linha
+    viajam como uma só; uma linha apagada depois da mudança simplesmente não
+    vai (a exclusão vem em um lote seguinte).
+    """
+    changes = pending_changes(limit)
+    if not changes:
+        return None
+    last_op = {}
+    for _versao, tabela, id_linha, operacao, _registrado_em in changes:
+        last_op[(tabela, id_linha)] = operacao
+    by_table = {}
+    for (tabela, id_linha), operacao in last_op.items():
+        upserts, deletes = by_table.setdefault(tabela, ([], []))
+        (deletes if operacao == "D" else upserts).append(id_linha)
+
+    device_id = get_device_id()
+    tables, referenced = [], {}
+    for tabela, (upserts, deletes) in by_table.items():
+        columns, rows = queries.get_rows_for_sync(tabela, upserts) if upserts else ((), [])
+        entry = {"tabela": tabela, "colunas": list(columns), "linhas": [list(row) for row in rows],
+                 "apagadas": deletes}
+        referenced.setdefault(tabela, set()).update([row[0] for row in rows] + deletes)
+        for coluna, parent in queries.get_sync_references(tabela).items():
+            if coluna in columns:
+                position = columns.index(coluna)
+                referenced.setdefault(parent, set()).update(row[position] for row in rows if row[position] is not None)
+        if tabela not in LEDGER_TABLES:
+            versions = queries.get_row_versions(tabela, [row[0] for row in rows] + deletes)
+            entry["versoes"] = [
+                {coluna: [hlc, origem or device_id] for coluna, (hlc, origem) in versions.get(row[0], {}).items()}
+                for row in rows
+            ]
+            entry["versoes_apagadas"] = [
+                [hlc, origem or device_id]
+                for hlc, origem in (versions.get(row_id, {}).get("", (0, None)) for row_id in deletes)
+            ]
+        tables.append(entry)
+    # Linhas citadas que vieram de outros aparelhos viajam com a identidade de origem.
+    ids = {}
+    for tabela, local_ids in referenced.items():
+        keys = queries.get_sync_keys(tabela, sorted(local_ids))
+        if keys:
+            ids[tabela] = [[id_local, origem, id_origem] for id_local, (origem, id_origem) in sorted(keys.items())]
+    return {"origem": device_id, "de": changes[0][0], "ate": changes[-1][0],
+            "mudancas": len(changes), "tabelas": tables, "ids": ids}
+
+# =================================================================================
+# JUNÇÃO DE MUDANÇAS CONCORRENTES
+# =================================================================================
+# Cada escrita local recebe uma versão do relógio lógico híbrido (HLC) da
+# migração 10: um inteiro que segue o relógio de parede em ms (* 65536) e nunca
+# volta, nem quando o relógio do aparelho atrasa. Versões são comparadas como
+# (hlc, aparelho), então dois aparelhos sempre escolhem o mesmo vencedor.
+#   - Antes da junção, os ids do lote viram ids locais (mapa sync_ids). Um
+#     cadastro novo com a mesma chave natural de uma linha daqui (ex.: a
+#     categoria "Vinhos" criada nos dois aparelhos) é a mesma linha.
+#   - Livro (LEDGER_TABLES): união das linhas. Cada linha recebida entra uma
+#     única vez, com id local; a ordem dos lotes não importa.
+#   - Cadastros (FIELD_MERGE_TABLES): vence a versão mais nova de cada campo,
+#     então edições de campos diferentes feitas em aparelhos diferentes somam.
+#   - Demais tabelas: vence a versão mais nova da linha inteira.
+#   - Exclusões vencem: uma linha apagada não volta por uma edição feita em outro aparelho.
+
+def merge_remote_tables(tables: list, state: dict, local_node: str, remote_node: str) -> tuple:
+    """
+    Decide, sem acessar o banco, o que de um lote recebido deve ser gravado.
+
+    :param tables: Tabelas do lote (formato de build_outgoing_batch).
+    :param state: Linhas e versões locais das linhas do lote (ver queries.apply_remote_changes).
+    :param local_node: Id deste aparelho (dono das versões locais sem origem).
+    :param remote_node: Id do aparelho que enviou o lote.
+    :return: (tabelas a gravar, versões (tabela, id, coluna, hlc, origem) a registrar,
+              maior HLC recebido).
+    """
+    merged_tables, versions, max_hlc = [], [], 0
+    for entry in tables:
+        tabela = entry["tabela"]
+        if tabela in LEDGER_TABLES:
+            merged_tables.append(entry)
+            continue
+        local = state.get(tabela, {})
+        local_rows, local_versions = local.get("linhas", {}), local.get("versoes", {})
+        columns = entry.get("colunas") or ["id"]
+        field_merge = tabela in FIELD_MERGE_TABLES
+        rows = entry.get("linhas") or []
+        remote_versions = entry.get("versoes") or [{}] * len(rows)
+        kept_rows = []
+        for row, remote in zip(rows, remote_versions):
+            row_id = row[0]
+            # Versões como tuplas (hlc, aparelho); sem versão = (0, aparelho).
+            remote = {coluna: tuple(version) for coluna, version in remote.items()}
+            for hlc, _node in remote.values():
+                max_hlc = max(max_hlc, hlc)
+            local_row = local_rows.get(row_id)
+            mine = {coluna: (hlc, origem or local_node) for coluna, (hlc, origem) in local_versions.get(row_id, {}).items()}
+            if local_row is None:
+                if "" in mine:
+                    continue  # apagada aqui: a exclusão vence
+                kept_rows.append(row)
+                versions.extend((tabela, row_id, coluna, hlc, node) for coluna, (hlc, node) in remote.items())
+                continue
+            remote_row_version = remote.get("", (0, remote_node))
+            local_row_version = mine.get("", (0, local_node))
+            if not field_merge:
+                if remote_row_version > local_row_version:
+                    kept_rows.append(row)
+                    versions.append((tabela, row_id, "", *remote_row_version))
+                continue
+            result = list(local_row)
+            for n, coluna in enumerate(columns[1:], 1):
+                theirs = remote.get(coluna, remote_row_version)
+                if theirs > mine.get(coluna, local_row_version):
+                    result[n] = row[n]
+                    versions.append((tabela, row_id, coluna, *theirs))
+            if result != list(local_row):
+                kept_rows.append(result)
+        deleted = entry.get("apagadas") or []
+        deleted_versions = entry.get("versoes_apagadas") or [[0, remote_node]] * len(deleted)
+        for row_id, (hlc, node) in zip(deleted, deleted_versions):
+            max_hlc = max(max_hlc, hlc)
+            versions.append((tabela, row_id, "", hlc, node))
+        merged_tables.append({"tabela": tabela, "colunas": columns, "linhas": kept_rows, "apagadas": deleted})
+    return merged_tables, versions, max_hlc
+
+# =================================================================================
+# TRANSPORTES
+# =================================================================================
+
+class SyncTransport:
+    """
+    Onde os lotes ficam na nuvem. A nuvem guarda os lotes em ordem de chegada,
+    cada um com um número de sequência crescente (a marca d'água da leitura).
+
+        push(id_aparelho, id_lote, dados)        grava um lote (repetir o mesmo id_lote não duplica)
+        pull(cursor, id_aparelho, limite)        [(sequencia, dados)] com sequencia > cursor,
+                                                 sem os lotes do próprio aparelho
+
+    Falhas temporárias devem levantar SyncTransportError.
+    """
+
+    def push(self, device_id: str, batch_id: str, data: bytes):
+        raise NotImplementedError
+
+    def pull(self, cursor: int, device_id: str, limit: int) -> list:
+        raise NotImplementedError
+
+
+class LocalFolderTransport(SyncTransport):
+    """
+    "Nuvem" em uma pasta local (testes, benchmark ou dois aparelhos com uma
+    pasta compartilhada): um arquivo <sequencia>_<id_aparelho>_<id_lote>.lote por lote.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(".lote"):
+                seq, device_id, batch_id = name[:-5].split("_", 2)
+                entries.append((int(seq), device_id, batch_id, name))
+        return sorted(entries)
+
+    def push(self, device_id: str, batch_id: str, data: bytes):
+        with self._lock:
+            if glob.glob(os.path.join(self.folder, f"*_{device_id}_{batch_id}.lote")):
+                return
+            tmp_path = os.path.join(self.folder, f"{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            entries = self._entries()
+            seq = entries[-1][0] + 1 if entries else 1
+            while True:
+                # os.link falha se o nome já existe: outro processo pegou a sequência.
+                try:
+                    os.link(tmp_path, os.path.join(self.folder, f"{seq:012d}_{device_id}_{batch_id}.lote"))
+                    break
+                except FileExistsError:
+                    seq += 1
+            os.remove(tmp_path)
+
+    def pull(self, cursor: int, device_id: str, limit: int) -> list:
+        batches = []
+        for seq, origin, _batch_id, name in self._entries():
+            if seq <= cursor or origin == device_id:
+                continue
+            with open(os.path.join(self.folder, name), "rb") as f:
+                batches.append((seq, f.read()))
+            if len(batches) >= limit:
+                break
+        return batches
+
+
+# Resposta do pull por HTTP: lotes em sequência, cada um precedido de
+# 8 bytes de sequência e 4 bytes de tamanho (big-endian).
+_FRAME_HEADER = struct.Struct(">QI")
+
+
+class HttpTransport(SyncTransport):
+    """
+    Cliente HTTP da nuvem:
+        PUT {url}/lotes/<id_aparelho>/<id_lote>            corpo = lote
+        GET {url}/lotes?desde=<cursor>&origem=<id>&limite=<n>  lotes enquadrados (_FRAME_HEADER)
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30.0, token: str = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.token = token
+
+    def _open(self, req: urllib_request.Request) -> bytes:
+        if self.token:
+            req.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib_request.urlopen(req, timeout=self.timeout) as response:
+                return response.read()
+        except urllib_error.HTTPError as e:
+            if e.code == 429 or e.code >= 500:
+                raise SyncTransportError(f"Nuvem respondeu {e.code}.") from e
+            raise SyncError(f"Nuvem recusou a requisição ({e.code}).") from e
+        except (urllib_error.URLError, OSError) as e:
+            raise SyncTransportError(f"Falha de conexão com a nuvem: {e}") from e
+
+    def push(self, device_id: str, batch_id: str, data: bytes):
+        url = f"{self.base_url}/lotes/{urllib_parse.quote(device_id)}/{urllib_parse.quote(batch_id)}"
+        self._open(urllib_request.Request(url, data=data, method="PUT",
+                                          headers={"Content-Type": "application/octet-stream"}))
+
+    def pull(self, cursor: int, device_id: str, limit: int) -> list:
+        query = urllib_parse.urlencode({"desde": cursor, "origem": device_id, "limite": limit})
+        body = self._open(urllib_request.Request(f"{self.base_url}/lotes?{query}"))
+        batches, offset = [], 0
+        while offset < len(body):
+            seq, size = _FRAME_HEADER.unpack_from(body, offset)
+            offset += _FRAME_HEADER.size
+            batches.append((seq, body[offset:offset + size]))
+            offset += size
+        return batches
+
+
+class MockCloudServer:
+    """
+    Servidor HTTP local que imita a nuvem sobre uma LocalFolderTransport, para
+    testar HttpTransport sem rede. Sobe em uma thread; port=0 escolhe uma porta livre.
+    """
+
+    def __init__(self, folder: str, host: str = "127.0.0.1", port: int = 0):
+        storage = LocalFolderTransport(folder)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_PUT(self):
+                parts = self.path.strip("/").split("/")
+                if len(parts) != 3 or parts[0] != "lotes":
+                    self.send_error(404)
+                    return
+                data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                storage.push(urllib_parse.unquote(parts[1]), urllib_parse.unquote(parts[2]), data)
+                self.send_response(204)
+                self.end_headers()
+
+            def do_GET(self):
+                url = urllib_parse.urlparse(self.path)
+                if url.path != "/lotes":
+                    self.send_error(404)
+                    return
+                params = dict(urllib_parse.parse_qsl(url.query))
+                batches = storage.pull(int(params.get("desde", 0)), params.get("origem", ""),
+                                       int(params.get("limite", PULL_LIMIT)))
+                body = b"".join(_FRAME_HEADER.pack(seq, len(data)) + data for seq, data in batches)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-cloud", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+# =================================================================================
+# SINCRONIZADOR
+# =================================================================================
+
+class SyncWorker:
+    """
+    Envia a fila local e aplica os lotes dos outros aparelhos.
+
+    Envio: compacta a fila, monta lotes de até `batch_size` mudanças e envia um
+    por vez; só depois da confirmação a versão enviada avança (mark_sent). Um
+    lote reenviado após uma falha tem o mesmo id e não é duplicado na nuvem.
+
+    Recebimento: lê da nuvem os lotes com sequência acima da marca d'água
+    (REMOTE_CURSOR_KEY) e aplica cada um em uma transação, sem recapturar,
+    juntando-o às mudanças locais com merge_remote_tables. A marca avança lote
+    a lote; se o aplicativo cair entre aplicar e avançar, o lote é reaplicado
+    sem efeito duplicado (versões iguais não vencem, movimentações já
+    existentes não somam de novo). Um lote que não pode ser aplicado vai para
+    a quarentena (list_quarantined) e a marca avança mesmo assim.
+
+    Falhas temporárias do transporte são repetidas até `max_attempts` vezes,
+    com espera exponencial (com variação aleatória) entre as tentativas.
+
+    O sincronizador é do banco em que foi criado (principal ou do
+    estabelecimento atual), inclusive na thread de start().
+    """
+
+    def __init__(self, transport: SyncTransport, batch_size: int = BATCH_SIZE, pull_limit: int = PULL_LIMIT,
+                 interval: float = SYNC_INTERVAL, max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE):
+        self.transport = transport
+        self.batch_size = batch_size
+        self.pull_limit = pull_limit
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._establishment = database.get_current_establishment()
+        self.retries = 0
+
+    def _retry(self, func, *args):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return func(*args)
+            except SyncTransportError as e:
+                if attempt == self.max_attempts:
+                    raise
+                self.retries += 1
+                delay = min(BACKOFF_MAX, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                logger.warning(f"{e} Nova tentativa ({attempt + 1}/{self.max_attempts}) em {delay:.1f} s.")
+                if self._stop.wait(delay):
+                    raise
+
+    def push(self, stats: dict):
+        device_id = get_device_id()
+        compact_pending()
+        while True:
+            batch = build_outgoing_batch(self.batch_size)
+            if batch is None:
+                return
+            data = encode_batch(batch)
+            self._retry(self.transport.push, device_id, f"{batch['de']}-{batch['ate']}", data)
+            mark_sent(batch["ate"])
+            stats["lotes_enviados"] += 1
+            stats["mudancas_enviadas"] += batch["mudancas"]
+            stats["linhas_enviadas"] += sum(len(t["linhas"]) + len(t["apagadas"]) for t in batch["tabelas"])
+            stats["bytes_enviados"] += len(data)
+
+    @staticmethod
+    def _apply(seq: int, data: bytes, device_id: str) -> dict:
+        """Decodifica e aplica um lote recebido; SyncError se não for possível."""
+        try:
+            batch = decode_batch(data)
+            origin = batch.get("origem", "")
+            result = queries.apply_remote_changes(
+                batch["tabelas"], merge=lambda tables, state: merge_remote_tables(tables, state, device_id, origin),
+                origin=origin or None, device_id=device_id, keys=batch.get("ids"))
+        except SyncError:
+            raise
+        except (zlib.error, ValueError, KeyError, TypeError, AttributeError) as e:
+            # Lote truncado, corrompido ou fora do formato (JSON/msgpack inválido, sem "tabelas", ...).
+            raise SyncError(f"Lote {seq} recebido da nuvem é inválido: {e!r}") from e
+        if result is None:
+            raise SyncError(f"Não foi possível aplicar o lote {seq} recebido da nuvem.")
+        return result
+
+    def pull(self, stats: dict):
+        device_id = get_device_id()
+        cursor = int(queries.get_metadata(REMOTE_CURSOR_KEY) or 0)
+        while True:
+            received = self._retry(self.transport.pull, cursor, device_id, self.pull_limit)
+            if not received:
+                break
+            for seq, data in received:
+                try:
+                    result = self._apply(seq, data, device_id)
+                except SyncError as e:
+                    # Um lote ruim não pode travar os seguintes: fica guardado e a leitura continua.
+                    _quarantine(seq, data, str(e))
+                    stats["lotes_em_quarentena"] += 1
+                    result = None
+                cursor = seq
+                queries.set_metadata(REMOTE_CURSOR_KEY, str(cursor))
+                stats["bytes_recebidos"] += len(data)
+                if result is not None:
+                    stats["lotes_recebidos"] += 1
+                    stats["linhas_recebidas"] += result["gravadas"] + result["apagadas"]
+
+    def retry_quarantined(self, stats: dict = None, force: bool = False) -> int:
+        """
+        Tenta aplicar de novo os lotes em quarentena (ex.: o pai de uma linha
+        chegou depois). Sem `force`, pula os que já falharam
+        QUARANTINE_MAX_ATTEMPTS vezes. Retorna quantos foram aplicados.
+        """
+        device_id = get_device_id()
+        recovered = 0
+        for key, value in queries.get_metadata_by_prefix(QUARANTINE_KEY_PREFIX).items():
+            entry = json.loads(value)
+            if not force and entry["tentativas"] >= QUARANTINE_MAX_ATTEMPTS:
+                continue
+            try:
+                result = self._apply(entry["seq"], base64.b64decode(entry["lote"]), device_id)
+            except SyncError as e:
+                entry["tentativas"] += 1
+                entry["erro"] = str(e)
+                queries.set_metadata(key, json.dumps(entry))
+                continue
+            queries.delete_metadata(key)
+            recovered += 1
+            logger.info(f"Lote {entry['seq']} em quarentena aplicado na tentativa {entry['tentativas'] + 1}.")
+            if stats is not None:
+                stats["lotes_recebidos"] += 1
+                stats["linhas_recebidas"] += result["gravadas"] + result["apagadas"]
+        return recovered
+
+    def sync_once(self) -> dict:
+        """Envia tudo o que está pendente e aplica tudo o que chegou. Retorna os contadores."""
+        stats = {"lotes_enviados": 0, "mudancas_enviadas": 0, "linhas_enviadas": 0, "bytes_enviados": 0,
+                 "lotes_recebidos": 0, "linhas_recebidas": 0, "bytes_recebidos": 0, "lotes_em_quarentena": 0}
+        with self._lock, database.use_establishment(self._establishment):
+            t0 = time.perf_counter()
+            self.push(stats)
+            self.retry_quarantined(stats)
+            self.pull(stats)
+            stats["segundos"] = time.perf_counter() - t0
+        if stats["lotes_enviados"] or stats["lotes_recebidos"]:
+            logger.info(f"Sincronização: {stats['linhas_enviadas']} linha(s) enviada(s) "
+                        f"({stats['bytes_enviados']} bytes), {stats['linhas_recebidas']} recebida(s) "
+                        f"({stats['bytes_recebidos']} bytes) em {stats['segundos']:.2f} s.")
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except SyncError as e:
+                logger.warning(f"Sincronização adiada: {e}")
+            except Exception as e:
+                logger.error(f"Erro inesperado na sincronização: {e}", exc_info=True)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Sincroniza a cada `interval` segundos em uma thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sync", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
@@ -0,0 +1,187 @@
+# =================================================================================
+# MÓDULO DE RELATÓRIO DE DIVERGÊNCIAS DE CONTAGEM (variance_report_service.py)
+# Local: app/services/variance_report_service.py
+# =================================================================================
+
+import csv
+import logging
+from array import array
+from app.database import queries
+
+# NumPy é opcional: sem ele, as somas por grupo usam array('d') da biblioteca padrão.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Colunas de cada linha do relatório, na ordem de exibição: (chave, título).
+REPORT_COLUMNS = [
+    ("nome", "Nome"),
+    ("contagens", "Contagens"),
+    ("sistema", "Sistema"),
+    ("contada", "Contada"),
+    ("variacao", "Variação"),
+    ("variacao_pct", "Variação %"),
+    ("perda", "Perda"),
+    ("perda_pct", "Perda %"),
+    ("valor_variacao", "Valor da variação"),
+    ("valor_perda", "Valor da perda"),
+]
+
+# Agrupamentos do relatório: nome -> (coluna da chave, coluna do nome exibido).
+GROUPINGS = {
+    "itens": ("id_item", "item"),
+    "categorias": ("id_categoria", "categoria"),
+    "locais": ("id_local_estoque", "local"),
+}
+
+# =================================================================================
+# CÁLCULO
+# =================================================================================
+
+def _group_sums(keys: tuple, measures: dict) -> tuple:
+    """
+    Soma cada medida por chave. Retorna (chaves_distintas, {medida: somas}),
+    com as somas alinhadas às chaves. Com NumPy usa bincount; sem ele, um
+    acumulador array('d') por medida.
+    """
+    positions = {}
+    codes = array("l", (positions.setdefault(key, len(positions)) for key in keys))
+    distinct_keys = list(positions)
+    if np is not None:
+        np_codes = np.fromiter(codes, dtype=np.intp, count=len(codes))
+        return distinct_keys, {name: np.bincount(np_codes, weights=values, minlength=len(distinct_keys))
+                               for name, values in measures.items()}
+    sums = {}
+    for name, values in measures.items():
+        totals = array("d", bytes(8 * len(distinct_keys)))
+        for code, value in zip(codes, values):
+            totals[code] += value
+        sums[name] = totals
+    return distinct_keys, sums
+
+def _value_columns(columns: dict) -> dict:
+    """Medidas por item/local já valorizadas ao custo unitário."""
+    if np is not None:
+        contada = np.asarray(columns["contada"], dtype=float)
+        sistema = np.asarray(columns["sistema"], dtype=float)
+        perda = np.asarray(columns["perda"], dtype=float)
+        custo = np.asarray(columns["custo"], dtype=float)
+        return {
+            "contagens": np.asarray(columns["contagens"], dtype=float),
+            "sistema": sistema,
+            "contada": contada,
+            "perda": perda,
+            "valor_variacao": (contada - sistema) * custo,
+            "valor_perda": perda * custo,
+        }
+    custo = columns["custo"]
+    return {
+        "contagens": array("d", columns["contagens"]),
+        "sistema": array("d", columns["sistema"]),
+        "contada": array("d", columns["contada"]),
+        "perda": array("d", columns["perda"]),
+        "valor_variacao": array("d", ((c - s) * k for c, s, k in zip(columns["contada"], columns["sistema"], custo))),
+        "valor_perda": array("d", (p * k for p, k in zip(columns["perda"], custo))),
+    }
+
+def _percent(part: float, total: float) -> float:
+    return round(100.0 * part / total, 2) if total else 0.0
+
+def _build_rows(keys: list, names: dict, sums: dict) -> list:
+    rows = []
+    for i, key in enumerate(keys):
+        sistema = float(sums["sistema"][i])
+        contada = float(sums["contada"][i])
+        perda = float(sums["perda"][i])
+        rows.append({
+            "chave": key,
+            "nome": names[key],
+            "contagens": int(sums["contagens"][i]),
+            "sistema": sistema,
+            "contada": contada,
+            "variacao": contada - sistema,
+            "variacao_pct": _percent(contada - sistema, sistema),
+            "perda": perda,
+            "perda_pct": _percent(perda, sistema),
+            "valor_variacao": round(float(sums["valor_variacao"][i]), 2),
+            "valor_perda": round(float(sums["valor_perda"][i]), 2),
+        })
+    # As maiores perdas (em valor) primeiro.
+    rows.sort(key=lambda row: (-row["valor_perda"], row["nome"]))
+    return rows
+
+def build_variance_report(id_local_estoque: int = None, desde: str = None, ate: str = None) -> dict:
+    """
+    Relatório de divergências (contada x sistema) e de perdas, valorizado a
+    itens.custo_unitario, somando todas as contagens do período.
+
+    :param id_local_estoque: Restringe a um local (None = todos).
+    :param desde/ate: Limites de data_contagem ('AAAA-MM-DD' ou com hora).
+    :return: {"itens": [...], "categorias": [...], "locais": [...]}, cada um
+             uma lista de dicionários com as chaves de REPORT_COLUMNS.
+             A perda é a soma das faltas (sistema - contada > 0) de cada contagem.
+    """
+    columns = queries.get_count_variance_columns(id_local_estoque, desde, ate)
+    if not columns["id_item"]:
+        return {name: [] for name in GROUPINGS}
+    measures = _value_columns(columns)
+
+    report = {}
+    for grouping, (key_column, name_column) in GROUPINGS.items():
+        keys = columns[key_column]
+        names = dict(zip(keys, columns[name_column]))
+        distinct_keys, sums = _group_sums(keys, measures)
+        report[grouping] = _build_rows(distinct_keys, names, sums)
+    logger.info(f"Relatório de divergências gerado com {len(report['itens'])} itens "
+                f"({'NumPy' if np is not None else 'array'}).")
+    return report
+
+# =================================================================================
+# SAÍDA: TABELA (Flet DataTable) E CSV
+# =================================================================================
+
+def _br_number(value: float, decimals: int) -> str:
+    """Número no formato brasileiro (1.234,56)."""
+    return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _format(key: str, value) -> str:
+    if key == "nome" or key == "contagens":
+        return str(value)
+    if key.endswith("_pct"):
+        return f"{_br_number(value, 2)}%"
+    if key.startswith("valor_"):
+        return f"R$ {_br_number(value, 2)}"
+    # Quantidades: até 3 casas (ex.: 0,75 L), sem zeros à direita.
+    text = _br_number(value, 3)
+    return text.rstrip("0").rstrip(",") if "," in text else text
+
+def as_table(rows: list) -> tuple:
+    """
+    Converte as linhas em (títulos, linhas de texto) prontos para um ft.DataTable:
+    ft.DataColumn(ft.Text(t)) para cada título e ft.DataCell(ft.Text(v)) para cada valor.
+    """
+    headers = [title for _, title in REPORT_COLUMNS]
+    return headers, [[_format(key, row[key]) for key, _ in REPORT_COLUMNS] for row in rows]
+
+def _csv_value(key: str, value) -> str:
+    """Valor para o CSV: casas fixas e vírgula decimal, sem separador de milhar nem notação científica."""
+    if key == "nome" or key == "contagens":
+        return str(value)
+    if key.endswith("_pct") or key.startswith("valor_"):
+        text = f"{value:.2f}"
+    else:
+        text = f"{value:.3f}".rstrip("0").rstrip(".")
+    if text.startswith("-") and float(text) == 0:
+        text = text[1:]
+    return text.replace(".", ",")
+
+def write_csv(rows: list, path: str):
+    """Grava as linhas em CSV (separador ';' e vírgula decimal, como o Excel em pt-BR espera)."""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow([title for _, title in REPORT_COLUMNS])
+        for row in rows:
+            writer.writerow([_csv_value(key, row[key]) for key, _ in REPORT_COLUMNS])
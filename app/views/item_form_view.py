@@ -6,6 +6,7 @@ import flet as ft
 import logging
 from app.database import queries
 from app.components.app_bar import create_app_bar
+from app.views.itens_crud_view import CHANGE_INSERT, CHANGE_UPDATE
 
 logger = logging.getLogger("ItemFormView")
 
@@ -41,6 +42,7 @@ class ItemFormView(ft.View):
         self.nome_field = ft.TextField(label="Nome do Item")
         self.categoria_dropdown = ft.Dropdown(label="Categoria")
         self.unidade_dropdown = ft.Dropdown(label="Unidade de Medida")
+        self.codigo_barras_field = ft.TextField(label="Código de Barras (opcional)")
         
         self.controls = [
             ft.Column(
@@ -48,6 +50,7 @@ class ItemFormView(ft.View):
                     self.nome_field,
                     self.categoria_dropdown,
                     self.unidade_dropdown,
+                    self.codigo_barras_field,
                     ft.ElevatedButton(
                         "Salvar",
                         icon=ft.Icons.SAVE,
@@ -84,6 +87,7 @@ class ItemFormView(ft.View):
                     self.nome_field.value = self.item_data['nome']
                     self.categoria_dropdown.value = self.item_data['id_categoria']
                     self.unidade_dropdown.value = self.item_data['id_unidade_medida']
+                    self.codigo_barras_field.value = self.item_data['codigo_barras'] or ""
             
             self.page.update()
         except Exception as e:
@@ -103,20 +107,25 @@ class ItemFormView(ft.View):
                     item_id=self.item_id,
                     nome=self.nome_field.value,
                     id_categoria=int(self.categoria_dropdown.value),
-                    id_unidade_medida=int(self.unidade_dropdown.value)
+                    id_unidade_medida=int(self.unidade_dropdown.value),
+                    codigo_barras=(self.codigo_barras_field.value or "").strip()
                 )
                 message = "Item atualizado com sucesso!"
+                change = (CHANGE_UPDATE, self.item_id)
             else:
-                queries.add_item(
+                new_item_id = queries.add_item(
                     nome=self.nome_field.value,
                     id_categoria=int(self.categoria_dropdown.value),
-                    id_unidade_medida=int(self.unidade_dropdown.value)
+                    id_unidade_medida=int(self.unidade_dropdown.value),
+                    codigo_barras=(self.codigo_barras_field.value or "").strip()
                 )
                 message = "Item adicionado com sucesso!"
+                change = (CHANGE_INSERT, new_item_id) if new_item_id else None
 
-            # Chama o callback para notificar a view de lista que ela precisa de ser atualizada
+            # Chama o callback informando exatamente o que mudou, para que a
+            # view de lista atualize apenas a linha afetada.
             if self.on_save_callback:
-                self.on_save_callback(message)
+                self.on_save_callback(message, change)
             
             # Navega de volta para a tela de lista
             self.page.go("/cadastros/item")
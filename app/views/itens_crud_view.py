@@ -2,13 +2,30 @@
 # MÓDULO DA VIEW CRUD DE ITENS (itens_crud_view.py) - VERSÃO REFATORADA
 # =================================================================================
 
+import bisect
 import flet as ft
 import logging
+import threading
 from app.database import queries
 from app.components.app_bar import create_app_bar
+from app.services.search_service import DebouncedItemSearch
 
 logger = logging.getLogger("ItensCRUDView")
 
+# Itens buscados por página (paginação por chave em nome, id).
+PAGE_SIZE = 50
+# Altura fixa de cada linha; permite ao ListView virtualizar a renderização.
+ROW_HEIGHT = 56
+# Largura da coluna de ações (botões editar/excluir).
+ACTIONS_WIDTH = 100
+# Quantas linhas antes do fim da lista a próxima página começa a ser carregada.
+LOAD_MORE_THRESHOLD_ROWS = 10
+
+# Tipos de alteração reportados pelo formulário e pela exclusão (ver apply_item_change).
+CHANGE_INSERT = "insert"
+CHANGE_UPDATE = "update"
+CHANGE_DELETE = "delete"
+
 class ItensCRUDView(ft.View):
     """
     View responsável por LISTAR os itens e gerenciar a exclusão.
@@ -19,24 +36,62 @@ class ItensCRUDView(ft.View):
         self.on_logout = on_logout
         self.route = "/cadastros/item"
         self.items_data = []
+        # Índices mantidos em paralelo a items_data / items_list.controls:
+        # chaves de ordenação (nome, id) e id -> chave, para localizar uma
+        # linha por busca binária e alterá-la sem reconstruir a lista.
+        self.item_keys = []
+        self.row_index = {}
 
         self.appbar = create_app_bar(page, on_logout)
         self.appbar.title = ft.Text("Cadastro de Itens")
 
-        self.data_table = ft.DataTable(
-            columns=[
-                ft.DataColumn(ft.Text("Item")),
-                ft.DataColumn(ft.Text("Categoria")),
-                ft.DataColumn(ft.Text("Unidade")),
-                ft.DataColumn(ft.Text("Ações"), numeric=True),
-            ],
-            rows=[]
+        # Paginação por chave: cursor (nome, id) do último item carregado.
+        self.page_size = PAGE_SIZE
+        self.cursor = None
+        self.has_more = True
+        # Eventos de scroll chegam em threads diferentes: só uma carga por vez.
+        self._page_lock = threading.Lock()
+
+        # Busca textual: enquanto houver texto, a lista mostra os resultados
+        # ordenados por relevância em vez das páginas ordenadas por nome.
+        self.search_query = ""
+        self.search = DebouncedItemSearch(self.on_search_results)
+        self.search_field = ft.TextField(
+            hint_text="Buscar item, categoria ou unidade",
+            prefix_icon=ft.Icons.SEARCH,
+            dense=True,
+            expand=True,
+            on_change=self.on_search_change,
+        )
+
+        # Cabeçalho fixo no lugar das colunas do antigo DataTable.
+        self.header_row = ft.Container(
+            content=ft.Row(
+                [
+                    ft.Text("Item", weight=ft.FontWeight.BOLD, expand=3),
+                    ft.Text("Categoria", weight=ft.FontWeight.BOLD, expand=2),
+                    ft.Text("Unidade", weight=ft.FontWeight.BOLD, expand=2),
+                    ft.Text("Ações", weight=ft.FontWeight.BOLD, width=ACTIONS_WIDTH, text_align=ft.TextAlign.RIGHT),
+                ]
+            ),
+            padding=ft.padding.symmetric(horizontal=10),
+        )
+
+        # ListView com altura fixa por linha (item_extent): o Flutter só
+        # desenha as linhas visíveis, e novas páginas são pedidas no scroll.
+        self.items_list = ft.ListView(
+            controls=[],
+            expand=True,
+            item_extent=ROW_HEIGHT,
+            on_scroll=self.on_list_scroll,
+            on_scroll_interval=100,
         )
         
         self.controls = [
             ft.Container(
                 content=ft.Row(
                     [
+                        self.search_field,
                         ft.ElevatedButton(
                             "Adicionar Novo Item",
                             icon=ft.Icons.ADD,
@@ -48,7 +103,8 @@ class ItensCRUDView(ft.View):
                 ),
                 padding=ft.padding.symmetric(horizontal=10)
             ),
-            ft.ListView([self.data_table], expand=True)
+            self.header_row,
+            self.items_list,
         ]
 
     def show_snackbar(self, message: str, color: str):
@@ -57,19 +113,16 @@ class ItensCRUDView(ft.View):
         self.page.snack_bar.open = True
         self.page.update()
 
-    def load_and_update_table(self, success_message: str = None):
-        """Carrega os dados do banco e atualiza a tabela na UI. Opcionalmente, exibe uma mensagem de sucesso."""
-        try:
-            self.items_data = queries.get_all_items_with_details()
-            self.data_table.rows.clear()
-            
-            for item in self.items_data:
-                self.data_table.rows.append(
-                    ft.DataRow(cells=[
-                        ft.DataCell(ft.Text(item['nome'])),
-                        ft.DataCell(ft.Text(item['categoria'] or "")),
-                        ft.DataCell(ft.Text(item['unidade'] or "")),
-                        ft.DataCell(ft.Row([
+    def build_item_row(self, item: dict) -> ft.Control:
+        """Cria o controle visual de uma linha da lista de itens."""
+        return ft.Container(
+            content=ft.Row(
+                [
+                    ft.Text(item['nome'], expand=3, no_wrap=True),
+                    ft.Text(item['categoria'] or "", expand=2, no_wrap=True),
+                    ft.Text(item['unidade'] or "", expand=2, no_wrap=True),
+                    ft.Row(
+                        [
                             ft.IconButton(
                                 ft.Icons.EDIT,
                                 # Ação: Navega para a rota de edição com o ID do item.
@@ -82,9 +135,93 @@ class ItensCRUDView(ft.View):
                                 on_click=lambda e, item_id=item['id']: self.open_delete_dialog(item_id),
                                 tooltip="Excluir"
                             ),
-                        ]))
-                    ])
-                )
+                        ],
+                        width=ACTIONS_WIDTH,
+                        alignment=ft.MainAxisAlignment.END,
+                    ),
+                ]
+            ),
+            height=ROW_HEIGHT,
+            padding=ft.padding.symmetric(horizontal=10),
+        )
+
+    def load_next_page(self) -> bool:
+        """Busca a próxima página no banco e adiciona suas linhas à lista. Retorna True se algo foi carregado."""
+        if not self.has_more or not self._page_lock.acquire(blocking=False):
+            return False
+        try:
+            return self._append_next_page()
+        finally:
+            self._page_lock.release()
+
+    def _append_next_page(self) -> bool:
+        """Busca e acrescenta a página seguinte ao cursor (com _page_lock já adquirido)."""
+        page_items = queries.get_items_page(after=self.cursor, limit=self.page_size)
+        self.has_more = len(page_items) == self.page_size
+        if page_items:
+            last = page_items[-1]
+            self.cursor = (last['nome'], last['id'])
+            for item in page_items:
+                key = (item['nome'], item['id'])
+                self.item_keys.append(key)
+                self.row_index[item['id']] = key
+            self.items_data.extend(page_items)
+            self.items_list.controls.extend(self.build_item_row(item) for item in page_items)
+        return bool(page_items)
+
+    def on_list_scroll(self, e: ft.OnScrollEvent):
+        """Carrega a próxima página quando o usuário se aproxima do fim da lista."""
+        if e.pixels >= e.max_scroll_extent - ROW_HEIGHT * LOAD_MORE_THRESHOLD_ROWS:
+            try:
+                if self.load_next_page():
+                    self.page.update()
+            except Exception as ex:
+                logger.error(f"Erro ao carregar mais itens: {ex}", exc_info=True)
+                self.show_snackbar("Erro ao carregar dados.", ft.Colors.RED)
+
+    def on_search_change(self, e):
+        """Agenda a busca (com debounce) a cada tecla digitada."""
+        text = (e.control.value or "").strip()
+        if not text:
+            self.search.cancel()
+            self.search_query = ""
+            self.load_and_update_table()
+            return
+        self.search.submit(text)
+
+    def on_search_results(self, text: str, results: list):
+        """Exibe os resultados de uma busca concluída (chamado pela thread do debounce)."""
+        try:
+            with self._page_lock:
+                self.search_query = text
+                self.items_data = list(results)
+                self.item_keys = []
+                self.row_index = {}
+                # Resultados vêm completos (sem paginação) e em ordem de relevância.
+                self.has_more = False
+                self.items_list.controls = [self.build_item_row(item) for item in results]
+            self.page.update()
+        except Exception as e:
+            logger.error(f"Erro ao exibir resultados da busca: {e}", exc_info=True)
+
+    def load_and_update_table(self, success_message: str = None):
+        """
+        Recarrega a lista a partir da primeira página e atualiza a UI.
+        Opcionalmente, exibe uma mensagem de sucesso.
+        """
+        try:
+            # Espera uma página que esteja sendo carregada pela rolagem: ela não
+            # pode ser acrescentada depois do reinício, nem impedir a primeira página.
+            with self._page_lock:
+                self.search_query = ""
+                self.search_field.value = ""
+                self.items_data = []
+                self.item_keys = []
+                self.row_index = {}
+                self.items_list.controls.clear()
+                self.cursor = None
+                self.has_more = True
+                self._append_next_page()
             
             # Se uma mensagem de sucesso for passada (pelo callback do formulário), exibe-a.
             if success_message:
@@ -95,6 +232,66 @@ class ItensCRUDView(ft.View):
             logger.error(f"Erro ao carregar e atualizar a tabela: {e}", exc_info=True)
             self.show_snackbar("Erro ao carregar dados.", ft.Colors.RED)
 
+    def _remove_row(self, item_id: int):
+        """Remove a linha de um item já carregado (se estiver na lista)."""
+        key = self.row_index.pop(item_id, None)
+        if key is None:
+            return
+        position = bisect.bisect_left(self.item_keys, key)
+        del self.item_keys[position]
+        del self.items_data[position]
+        del self.items_list.controls[position]
+
+    def _insert_row(self, item: dict):
+        """Insere a linha de um item na posição ordenada, se ela estiver no trecho já carregado."""
+        key = (item['nome'], item['id'])
+        # Depois do cursor o item ainda não foi carregado: chegará com a próxima página.
+        if self.has_more and self.cursor is not None and key > self.cursor:
+            return
+        position = bisect.bisect_left(self.item_keys, key)
+        self.item_keys.insert(position, key)
+        self.items_data.insert(position, item)
+        self.items_list.controls.insert(position, self.build_item_row(item))
+        self.row_index[item['id']] = key
+
+    def apply_item_change(self, change: tuple = None, success_message: str = None):
+        """
+        Aplica uma alteração pontual à lista em vez de recarregá-la inteira.
+
+        :param change: Tupla (tipo, id_item) com tipo CHANGE_INSERT, CHANGE_UPDATE
+                       ou CHANGE_DELETE. Se None, a lista é recarregada por completo.
+        :param success_message: Mensagem exibida ao final (opcional).
+
+        Só as linhas afetadas mudam, então o Flet envia ao cliente apenas a
+        diferença em vez da tabela inteira.
+        """
+        if self.search_query:
+            # Com uma busca ativa a ordem é por relevância: refaz a busca.
+            self.on_search_results(self.search_query, queries.search_items(self.search_query, self.search.limit))
+            if success_message:
+                self.show_snackbar(success_message, ft.Colors.GREEN)
+            return
+        if change is None:
+            self.load_and_update_table(success_message)
+            return
+        change_type, item_id = change
+        try:
+            with self._page_lock:
+                if change_type in (CHANGE_UPDATE, CHANGE_DELETE):
+                    self._remove_row(item_id)
+                if change_type in (CHANGE_INSERT, CHANGE_UPDATE):
+                    item = queries.get_item_with_details(item_id)
+                    if item:
+                        self._insert_row(item)
+
+            if success_message:
+                self.show_snackbar(success_message, ft.Colors.GREEN)
+            else:
+                self.page.update()
+        except Exception as e:
+            logger.error(f"Erro ao aplicar alteração na lista de itens: {e}", exc_info=True)
+            self.show_snackbar("Erro ao carregar dados.", ft.Colors.RED)
+
     def open_delete_dialog(self, item_id):
         """Abre o diálogo de confirmação para exclusão."""
         logger.info(f"AÇÃO DO USUÁRIO: Solicitando exclusão do item ID: {item_id}")
@@ -105,7 +302,7 @@ class ItensCRUDView(ft.View):
                 queries.delete_item(item_id)
                 # Passa a instância do diálogo para garantir que o correto seja fechado.
                 self.close_dialog(dialog)
-                self.load_and_update_table("Item excluído com sucesso!")
+                self.apply_item_change((CHANGE_DELETE, item_id), "Item excluído com sucesso!")
             except Exception as ex:
                 logger.error(f"Erro ao excluir item: {ex}", exc_info=True)
                 self.show_snackbar("Erro ao excluir o item.", ft.Colors.RED)
@@ -40,7 +40,7 @@ def create_login_view(on_login_success) -> ft.View:
     error_text = ft.Text(value="", visible=False)  # A cor será herdada do tema
     progress_ring = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
 
-    def handle_login_click(e):
+    async def handle_login_click(e):
         email_field.disabled = True
         password_field.disabled = True
         login_button.disabled = True
@@ -48,7 +48,8 @@ def create_login_view(on_login_success) -> ft.View:
         progress_ring.visible = True
         e.page.update()
 
-        user = auth_service.authenticate_user(
+        # O bcrypt roda no pool de threads; a interface continua respondendo.
+        user = await auth_service.authenticate_user_async(
             email_field.value.strip(), password_field.value
         )
 
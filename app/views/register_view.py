@@ -53,7 +53,7 @@ def create_register_view(page: ft.Page, on_logout, on_register_success) -> ft.Vi
     error_text = ft.Text(value="", visible=False)
     progress_ring = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
 
-    def handle_register_click(e):
+    async def handle_register_click(e):
         # ... (lógica de clique permanece a mesma)
         error_text.visible = False
         if not all([name_field.value, email_field.value, password_field.value, confirm_password_field.value]):
@@ -72,7 +72,7 @@ def create_register_view(page: ft.Page, on_logout, on_register_success) -> ft.Vi
             field.disabled = True
         progress_ring.visible = True
         e.page.update()
-        result, message = auth_service.register_user(
+        result, message = await auth_service.register_user_async(
             name=name_field.value.strip(),
             email=email_field.value.strip(),
             password=password_field.value
@@ -0,0 +1,160 @@
+# =================================================================================
+# BENCHMARK: CÓPIA DE SEGURANÇA E RESTAURAÇÃO (bench_backup.py)
+# Local: benchmarks/bench_backup.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_backup
+# Monta um banco de ~500 MB (BENCH_DB_MB) com um livro de estoque grande, faz a
+# cópia de segurança enquanto uma thread "pisca" a cada 10 ms (a interface) e
+# outra grava movimentações, e depois confere, restaura e tenta restaurar uma
+# cópia corrompida.
+# =================================================================================
+
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.database import database, queries
+from app.database.migrations import CAPTURE_PAUSED_KEY
+from app.services import backup_service
+from app.services.backup_service import BackupError
+
+logging.disable(logging.INFO)
+
+TARGET_MB = int(os.environ.get("BENCH_DB_MB", "500"))
+ITEMS = 5000
+ROWS_PER_ROUND = 500_000
+UI_TICK = 0.010
+WRITE_INTERVAL = 0.050
+
+
+def _build_database(path: str):
+    database.set_database_path(path)
+    database.initialize_database()
+    queries.create_user("Bench", "bench@local", "hash")
+    queries.complete_onboarding(1, "Bench", "Bar Bench", "Estoque Geral")
+    queries.bulk_seed(["Bebidas"], [("Unidade", "un")], [(f"Item {n:05d}", "Bebidas", "Unidade") for n in range(ITEMS)])
+    with database.db_connection() as conn:
+        # Histórico antigo: não precisa ir para a fila de sincronização.
+        conn.execute("INSERT INTO app_metadados (chave, valor) VALUES (?, '1')", (CAPTURE_PAUSED_KEY,))
+        conn.commit()
+        while os.path.getsize(path) + os.path.getsize(path + "-wal") < TARGET_MB * 1024 * 1024:
+            conn.execute(
+                """
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+                INSERT INTO movimentacoes_estoque
+                    (id_item, id_usuario, tipo_movimentacao, quantidade, data_movimentacao, observacao, id_local_estoque)
+                SELECT abs(random()) % ? + 1, 1, 'venda', -(abs(random()) % 5 + 1),
+                       datetime('2024-01-01', '+' || (abs(random()) % 525600) || ' minutes'),
+                       'Comanda ' || (abs(random()) % 100000) || ' - mesa ' || (abs(random()) % 40), 1
+                FROM n
+                """,
+                (ROWS_PER_ROUND, ITEMS),
+            )
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        conn.execute("DELETE FROM app_metadados WHERE chave = ?", (CAPTURE_PAUSED_KEY,))
+        conn.commit()
+
+
+class _Background:
+    """Interface simulada (tick de 10 ms) e um caixa gravando uma venda a cada 50 ms."""
+
+    def __init__(self):
+        self.max_lag = 0.0
+        self.write_latencies = []
+        self._stop = threading.Event()
+        self._threads = [threading.Thread(target=self._ui, daemon=True),
+                         threading.Thread(target=self._writer, daemon=True)]
+
+    def _ui(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            time.sleep(UI_TICK)
+            self.max_lag = max(self.max_lag, time.perf_counter() - t0 - UI_TICK)
+
+    def _writer(self):
+        n = 0
+        while not self._stop.wait(WRITE_INTERVAL):
+            item_id = n % ITEMS + 1
+            t0 = time.perf_counter()
+            queries.apply_stock_movements([(item_id, 1, 1, "venda", -1.0, None)], {(item_id, 1): -1.0}, {item_id: -1.0})
+            self.write_latencies.append(time.perf_counter() - t0)
+            n += 1
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def _count_movements(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM movimentacoes_estoque").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "dose_certa.db")
+        backup_dir = os.path.join(tmp, "backups")
+        t0 = time.perf_counter()
+        _build_database(db_path)
+        size_mb = os.path.getsize(db_path) / 1024 / 1024
+        print(f"Banco de teste: {size_mb:,.0f} MB ({_count_movements(db_path):,} movimentações) "
+              f"montado em {time.perf_counter() - t0:.0f} s.")
+
+        with _Background() as background:
+            manifest = backup_service.create_backup(backup_dir)
+        writes = sorted(background.write_latencies)
+        print(f"Cópia: {manifest['segundos']:.1f} s ({size_mb / manifest['segundos']:,.0f} MB/s, modo {manifest['modo']}) | "
+              f"{manifest['bytes_comprimidos'] / 1024 / 1024:,.0f} MB comprimido "
+              f"({manifest['bytes'] / manifest['bytes_comprimidos']:.1f}x) | atraso máx. da 'interface' "
+              f"{background.max_lag * 1000:.1f} ms | {len(writes)} vendas gravadas durante a cópia, "
+              f"a mais lenta em {writes[-1] * 1000:.1f} ms")
+
+        archive = os.path.join(backup_dir, manifest["arquivo"])
+        t0 = time.perf_counter()
+        backup_service.verify_backup(archive)
+        print(f"Verificação do checksum: {time.perf_counter() - t0:.1f} s")
+
+        restored_path = os.path.join(tmp, "restaurado.db")
+        t0 = time.perf_counter()
+        backup_service.restore_backup(archive, restored_path)
+        print(f"Restauração em outro arquivo (checksum + integrity_check + troca): {time.perf_counter() - t0:.1f} s; "
+              f"{_count_movements(restored_path):,} movimentações")
+
+        corrupted = os.path.join(tmp, "corrompida" + backup_service.BACKUP_SUFFIX)
+        shutil.copy(archive, corrupted)
+        shutil.copy(archive[:-len(backup_service.BACKUP_SUFFIX)] + backup_service.MANIFEST_SUFFIX,
+                    corrupted[:-len(backup_service.BACKUP_SUFFIX)] + backup_service.MANIFEST_SUFFIX)
+        with open(corrupted, "r+b") as f:
+            f.seek(os.path.getsize(corrupted) // 2)
+            f.write(b"\xff" * 16)
+        before = _count_movements(restored_path)
+        try:
+            backup_service.restore_backup(corrupted, restored_path)
+            print("Cópia corrompida: restaurada (NÃO deveria)")
+        except BackupError as e:
+            print(f"Cópia corrompida recusada ({e}); banco intacto: "
+                  f"{'sim' if _count_movements(restored_path) == before else 'NÃO'}")
+
+        live_before = _count_movements(db_path)
+        t0 = time.perf_counter()
+        backup_service.restore_backup(archive)
+        print(f"Restauração sobre o banco em uso: {time.perf_counter() - t0:.1f} s; movimentações "
+              f"{live_before:,} -> {_count_movements(db_path):,} (vendas gravadas depois da cópia descartadas)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# =================================================================================
+# BENCHMARK: LEITURA DE CÓDIGOS DE BARRAS EM CONTAGEM (bench_barcode.py)
+# Local: benchmarks/bench_barcode.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_barcode
+# Simula um leitor keyboard wedge a 20 leituras/s e mede o custo de cada
+# leitura (teclas -> código -> item -> lote) e das gravações em lote.
+# =================================================================================
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.database import database, queries
+from app.database.seeder import INITIAL_CATEGORIES, INITIAL_UNITS, seed_database
+from app.services.barcode_service import BarcodeCache, KeyboardWedgeScanner, ScanBatcher
+
+logging.disable(logging.INFO)
+
+CATALOG_SIZE = 5000
+SCANS = 2000
+SCANS_PER_SECOND = 20
+KEY_INTERVAL = 0.004  # leitores típicos: ~4 ms entre caracteres
+
+
+def write_increments(increments: dict):
+    """Grava um lote de incrementos em uma única transação (executemany)."""
+    with database.db_connection() as conn:
+        with conn:
+            conn.executemany(
+                "UPDATE itens SET quantidade_estoque = quantidade_estoque + ? WHERE id = ?",
+                [(quantity, item_id) for item_id, quantity in increments.items()],
+            )
+
+
+def setup_catalog() -> list:
+    seed_database(
+        INITIAL_CATEGORIES, INITIAL_UNITS,
+        [{"nome": f"Produto {i}", "categoria": INITIAL_CATEGORIES[i % len(INITIAL_CATEGORIES)],
+          "unidade": INITIAL_UNITS[i % len(INITIAL_UNITS)]["nome"]} for i in range(CATALOG_SIZE)],
+    )
+    codes = [f"789{i:010d}" for i in range(CATALOG_SIZE)]
+    with database.db_connection() as conn:
+        with conn:
+            conn.executemany(
+                "UPDATE itens SET codigo_barras = ? WHERE nome = ?",
+                [(code, f"Produto {i}") for i, code in enumerate(codes)],
+            )
+    return codes
+
+
+def simulate(codes: list, batched: bool) -> tuple:
+    """Processa SCANS leituras com carimbos de tempo simulados a 20/s. Retorna (s de CPU, gravações)."""
+    cache = BarcodeCache()
+    cache.warm()
+    writes = 0
+
+    def on_flush(batch):
+        nonlocal writes
+        writes += 1
+        write_increments(batch)
+
+    batcher = ScanBatcher(on_flush, cache=cache)
+    if batched:
+        on_scan = batcher.add_scan
+    else:
+        def on_scan(code):
+            nonlocal writes
+            item = cache.lookup(code)
+            writes += 1
+            write_increments({item["id"]: 1})
+
+    scanner = KeyboardWedgeScanner(on_scan)
+    rng = random.Random(7)
+    clock = 0.0
+    start = time.perf_counter()
+    for _ in range(SCANS):
+        code = rng.choice(codes[:300])  # contagem de um bar: poucas centenas de SKUs
+        for char in code:
+            scanner.feed(char, clock)
+            clock += KEY_INTERVAL
+        scanner.feed("Enter", clock)
+        clock += 1 / SCANS_PER_SECOND
+    batcher.flush()
+    return time.perf_counter() - start, writes
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "barcode.db"))
+        database.initialize_database()
+        codes = setup_catalog()
+
+        cache = BarcodeCache()
+        start = time.perf_counter()
+        cache.warm()
+        print(f"Aquecimento do cache ({CATALOG_SIZE} códigos): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        budget = SCANS / SCANS_PER_SECOND
+        for label, batched in [("uma gravação por bipe", False), ("lotes (ScanBatcher)", True)]:
+            elapsed, writes = simulate(codes, batched)
+            per_scan_ms = elapsed / SCANS * 1000
+            print(f"{label}:")
+            print(f"  {SCANS} leituras em {elapsed * 1000:.1f} ms de processamento "
+                  f"({per_scan_ms:.3f} ms/leitura, {writes} transações)")
+            print(f"  capacidade: {SCANS / elapsed:,.0f} leituras/s "
+                  f"(uso de {elapsed / budget * 100:.2f}% do tempo a {SCANS_PER_SECOND}/s)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
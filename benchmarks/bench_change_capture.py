@@ -0,0 +1,107 @@
+# =================================================================================
+# BENCHMARK: CUSTO DA CAPTURA DE MUDANÇAS (bench_change_capture.py)
+# Local: benchmarks/bench_change_capture.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_change_capture
+# Roda as mesmas cargas de escrita em um banco com os triggers de captura e em
+# outro sem eles, e mede a compactação da fila antes do envio.
+# =================================================================================
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.database import database, queries
+from app.database.migrations import CHANGE_CAPTURE_TABLES
+from app.services import sync_service
+
+logging.disable(logging.INFO)
+
+SEED_ITEMS = 20_000
+SINGLE_ITEMS = 1000
+LEDGER_BATCHES = 2000
+LEDGER_BATCH_SIZE = 20
+COUNTS = 10
+COUNT_ROWS = 2000
+EDITED_ITEMS = 500
+EDITS_PER_ITEM = 20
+
+
+def _drop_capture_triggers():
+    with database.db_connection() as conn:
+        for table in CHANGE_CAPTURE_TABLES:
+            for suffix in ("ai", "au", "ad"):
+                conn.execute(f"DROP TRIGGER IF EXISTS trg_{table}_sync_{suffix}")
+        conn.execute("DELETE FROM sync_outbox")
+        conn.commit()
+
+
+def _timed(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return time.perf_counter() - t0
+
+
+def _workloads(rng: random.Random) -> dict:
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    results = {}
+
+    results["carga inicial (1 transação, 20k itens)"] = _timed(lambda: queries.bulk_seed(
+        ["Bench"], [("Unidade", "un")], [(f"Item {n}", "Bench", "Unidade") for n in range(SEED_ITEMS)]))
+    item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+
+    results["cadastro item a item (1k transações)"] = _timed(lambda: [
+        queries.add_item(f"Avulso {n}", None, None) for n in range(SINGLE_ITEMS)])
+
+    def ledger():
+        for _ in range(LEDGER_BATCHES):
+            picked = rng.sample(item_ids, LEDGER_BATCH_SIZE)
+            queries.apply_stock_movements(
+                [(item_id, 1, user_id, "venda", -1.0, None) for item_id in picked],
+                {(item_id, 1): -1.0 for item_id in picked},
+                {item_id: -1.0 for item_id in picked},
+            )
+    results["livro: 2k lotes de 20 movimentações"] = _timed(ledger)
+
+    def counts():
+        for _ in range(COUNTS):
+            picked = rng.sample(item_ids, COUNT_ROWS)
+            queries.save_stock_count(1, user_id, None, [(item_id, 5.0, 6.0) for item_id in picked],
+                                     [(item_id, -1.0) for item_id in picked])
+    results["contagens: 10 x 2k linhas com ajuste"] = _timed(counts)
+
+    edited = rng.sample(item_ids, EDITED_ITEMS)
+    results["edições de custo (500 itens x 20)"] = _timed(lambda: [
+        queries.update_item_cost(item_id, rng.uniform(1, 50)) for _ in range(EDITS_PER_ITEM) for item_id in edited])
+    return results
+
+
+def main():
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("sem captura", "com captura"):
+            database.set_database_path(os.path.join(tmp, f"{mode.replace(' ', '_')}.db"))
+            database.initialize_database()
+            if mode == "sem captura":
+                _drop_capture_triggers()
+            timings[mode] = _workloads(random.Random(20))
+            if mode == "com captura":
+                before = sync_service.pending_count()
+                t0 = time.perf_counter()
+                removed = sync_service.compact_pending()
+                elapsed = (time.perf_counter() - t0) * 1000
+                print(f"Fila de envio: {before:,} entradas; compactação removeu {removed:,} em {elapsed:.0f} ms "
+                      f"({sync_service.pending_count():,} a enviar).")
+            database.close_pool()
+
+    print(f"{'carga':<42}{'sem captura':>12}{'com captura':>13}{'custo':>9}")
+    for workload, base in timings["sem captura"].items():
+        captured = timings["com captura"][workload]
+        print(f"{workload:<42}{base * 1000:10.0f} ms{captured * 1000:10.0f} ms{(captured / base - 1) * 100:+8.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# =================================================================================
+# BENCHMARK: POOL DE CONEXÕES x CONEXÃO POR CHAMADA (bench_connection_pool.py)
+# Local: benchmarks/bench_connection_pool.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_connection_pool
+# =================================================================================
+
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from app.database import database, queries
+
+# Silencia os logs INFO para medir apenas o custo das conexões e consultas.
+logging.disable(logging.INFO)
+
+ITERATIONS = 2000
+ADMIN_EMAIL = "admin@dosedata.com"
+
+
+def _connect_per_call(sql: str, params: tuple):
+    """Reproduz o caminho antigo: abre, configura, consulta e fecha a cada chamada."""
+    conn = database.get_db_connection()
+    try:
+        return conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+
+
+def login_screen_connect_per_call():
+    """Sequência de consultas de um carregamento de login -> dashboard (caminho antigo)."""
+    _connect_per_call("SELECT 1 FROM usuarios WHERE email != ?", (ADMIN_EMAIL,))
+    user = _connect_per_call("SELECT * FROM usuarios WHERE email = ?", (ADMIN_EMAIL,))
+    _connect_per_call("SELECT 1 FROM estabelecimentos WHERE id_usuario = ?", (user["id"],))
+    _connect_per_call("SELECT * FROM estabelecimentos WHERE id_usuario = ?", (user["id"],))
+
+
+def login_screen_pooled():
+    """A mesma sequência usando a camada de consultas com o pool."""
+    queries.has_real_user()
+    user = queries.get_user_by_email(ADMIN_EMAIL)
+    queries.has_establishment(user["id"])
+    queries.get_establishment_by_user_id(user["id"])
+
+
+def _measure(label: str, func) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    elapsed = time.perf_counter() - start
+    per_call_us = elapsed / ITERATIONS * 1_000_000
+    print(f"{label:<28} {elapsed:8.3f} s total   {per_call_us:8.1f} µs por tela")
+    return elapsed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "bench.db"))
+        database.initialize_database()
+        queries.create_user("Admin", ADMIN_EMAIL, "hash")
+        user = queries.get_user_by_email(ADMIN_EMAIL)
+        queries.complete_onboarding(user["id"], "Admin", "Bar Bench", "Estoque Geral")
+
+        print(f"SQLite {sqlite3.sqlite_version} - {ITERATIONS} carregamentos de tela (4 consultas cada)")
+        old = _measure("Conexão por chamada", login_screen_connect_per_call)
+        new = _measure("Pool de conexões", login_screen_pooled)
+        print(f"Ganho: {old / new:.1f}x")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
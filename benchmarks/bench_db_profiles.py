@@ -0,0 +1,67 @@
+# =================================================================================
+# BENCHMARK: LATÊNCIA DE ESCRITA POR PERFIL DE BANCO (bench_db_profiles.py)
+# Local: benchmarks/bench_db_profiles.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_db_profiles
+# =================================================================================
+
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+
+logging.disable(logging.INFO)
+
+WRITES = 500
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure_profile(profile: str, tmp: str) -> list:
+    """Mede a latência (ms) de cada add_item/update_item com o perfil informado."""
+    database.set_database_path(os.path.join(tmp, f"{profile}.db"), profile=profile)
+    database.initialize_database()
+    scheduler = database.start_checkpoint_scheduler()
+    category_id = queries.find_or_create_category("Destilados")
+    unit_id = queries.find_or_create_unit("Garrafa 1L", "GF 1L")
+
+    latencies = []
+    for i in range(WRITES):
+        start = time.perf_counter()
+        queries.add_item(f"Item {i}", category_id, unit_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    for item_id in range(1, WRITES + 1):
+        start = time.perf_counter()
+        queries.update_item(item_id, f"Item {item_id} (editado)", category_id, unit_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    wal_size = scheduler.wal_size() if scheduler else 0
+    database.stop_checkpoint_scheduler()
+    database.close_pool()
+    if scheduler:
+        print(f"  -wal após os commits: {wal_size / 1024:.0f} KiB")
+    return latencies
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{WRITES} inserts + {WRITES} updates por perfil (um commit por escrita)")
+        for profile in database.DB_PROFILES:
+            print(f"Perfil '{profile}':")
+            latencies = measure_profile(profile, tmp)
+            print(
+                f"  média {statistics.mean(latencies):6.3f} ms   "
+                f"p50 {_percentile(latencies, 50):6.3f} ms   "
+                f"p95 {_percentile(latencies, 95):6.3f} ms   "
+                f"p99 {_percentile(latencies, 99):6.3f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
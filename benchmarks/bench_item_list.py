@@ -0,0 +1,90 @@
+# =================================================================================
+# BENCHMARK: LISTA DE ITENS PAGINADA x CARGA COMPLETA (bench_item_list.py)
+# Local: benchmarks/bench_item_list.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_item_list
+# Com o Flet instalado, também mede a criação dos controles de cada linha.
+# =================================================================================
+
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app.database import database, queries
+from app.database.seeder import INITIAL_CATEGORIES, INITIAL_UNITS, seed_database
+
+logging.disable(logging.INFO)
+
+CATALOG_SIZE = 50_000
+PAGE_SIZE = 50
+
+try:
+    import flet as ft
+    from app.views.itens_crud_view import ItensCRUDView
+except ImportError:
+    ft = None
+
+
+def _build_rows(items: list):
+    """Cria as linhas visuais (somente se o Flet estiver disponível) e devolve os itens."""
+    if ft is not None:
+        view = ItensCRUDView.__new__(ItensCRUDView)
+        for item in items:
+            view.build_item_row(item)
+    return items
+
+
+def _measure(label: str, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<40} {elapsed:9.1f} ms   pico {peak / 1024 / 1024:7.2f} MiB")
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "items.db"))
+        database.initialize_database()
+        seed_database(
+            INITIAL_CATEGORIES, INITIAL_UNITS,
+            [
+                {"nome": f"Item {i:06d}",
+                 "categoria": INITIAL_CATEGORIES[i % len(INITIAL_CATEGORIES)],
+                 "unidade": INITIAL_UNITS[i % len(INITIAL_UNITS)]["nome"]}
+                for i in range(CATALOG_SIZE)
+            ],
+        )
+        rows_label = "consulta + linhas" if ft else "consulta (Flet ausente: sem linhas)"
+        print(f"{CATALOG_SIZE} itens, páginas de {PAGE_SIZE} - {rows_label}")
+
+        print("Carga completa (get_all_items_with_details):")
+        _measure("abrir a tela", lambda: _build_rows(queries.get_all_items_with_details()))
+
+        print("Paginação por chave (get_items_page):")
+        first = _measure("abrir a tela (1ª página)",
+                         lambda: _build_rows(queries.get_items_page(limit=PAGE_SIZE)))
+        last = first[-1]
+        deep = queries.get_items_page(after=(f"Item {CATALOG_SIZE - 1000:06d}", 0), limit=PAGE_SIZE)
+        _measure("página no fim do catálogo (keyset)",
+                 lambda: _build_rows(queries.get_items_page(after=(deep[0]["nome"], deep[0]["id"]), limit=PAGE_SIZE)))
+
+        start = time.perf_counter()
+        pages, cursor = 0, (last["nome"], last["id"])
+        while True:
+            page = queries.get_items_page(after=cursor, limit=PAGE_SIZE)
+            if not page:
+                break
+            pages += 1
+            cursor = (page[-1]["nome"], page[-1]["id"])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  rolar o catálogo inteiro: {pages} páginas, {elapsed / pages:.2f} ms por página")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# =================================================================================
+# BENCHMARK: LATÊNCIA DE LOGIN POR FATOR DE CUSTO DO BCRYPT (bench_login.py)
+# Local: benchmarks/bench_login.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_login
+# =================================================================================
+
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import auth_service
+
+logging.disable(logging.INFO)
+
+COST_FACTORS = [4, 8, 10, 12, 13]
+ATTEMPTS = 5
+PASSWORD = "senha-de-teste"
+
+
+def _median_ms(func) -> float:
+    samples = []
+    for _ in range(ATTEMPTS):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def _ui_stall_during_login(email: str) -> float:
+    """
+    Maior intervalo (ms) entre "quadros" de um loop de eventos de 60 Hz
+    enquanto um login assíncrono está em andamento.
+    """
+    frame = 1 / 60
+    worst = 0.0
+    login = asyncio.ensure_future(auth_service.authenticate_user_async(email, PASSWORD))
+    last = time.perf_counter()
+    while not login.done():
+        await asyncio.sleep(frame)
+        now = time.perf_counter()
+        worst = max(worst, (now - last - frame) * 1000)
+        last = now
+    await login
+    return worst
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "login.db"))
+        database.initialize_database()
+
+        print(f"{'custo':>5}  {'login (mediana)':>16}  {'rehash no 1º login':>18}  {'trava da UI (async)':>20}")
+        for rounds in COST_FACTORS:
+            auth_service.BCRYPT_ROUNDS = rounds
+            email = f"user{rounds}@bench.local"
+            queries.create_user("Bench", email, auth_service._hash_password(PASSWORD))
+
+            login_ms = _median_ms(lambda: auth_service.authenticate_user(email, PASSWORD))
+
+            # Primeiro login após mudar o custo configurado: inclui o rehash.
+            auth_service.BCRYPT_ROUNDS = rounds + 1
+            start = time.perf_counter()
+            auth_service.authenticate_user(email, PASSWORD)
+            rehash_ms = (time.perf_counter() - start) * 1000
+            auth_service.BCRYPT_ROUNDS = rounds
+            queries.update_user_password_hash(
+                queries.get_user_by_email(email)["id"], auth_service._hash_password(PASSWORD)
+            )
+
+            stall_ms = asyncio.run(_ui_stall_during_login(email))
+            print(f"{rounds:>5}  {login_ms:>13.1f} ms  {rehash_ms:>15.1f} ms  {stall_ms:>17.1f} ms")
+
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
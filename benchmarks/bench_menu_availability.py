@@ -0,0 +1,109 @@
+# =================================================================================
+# BENCHMARK: DISPONIBILIDADE DO CARDÁPIO A PARTIR DO ESTOQUE (bench_menu_availability.py)
+# Local: benchmarks/bench_menu_availability.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_menu_availability
+# Uma alteração de saldo deve reavaliar só os itens do cardápio que dependem
+# do item alterado, não o cardápio inteiro.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import stock_ledger_service as ledger
+from app.services.menu_service import MenuAvailability
+
+logging.disable(logging.INFO)
+
+BASE_ITEMS = 2000
+BAR_INGREDIENTS = 150
+SYRUPS = 20
+COCKTAILS = 250
+BOTTLES = 50
+CHANGES = 500
+
+
+def _setup(rng: random.Random) -> tuple:
+    database.initialize_database()
+    queries.bulk_seed(["Bench"], [("Mililitro", "ml")],
+                      [(f"Item SKU{i:x}", "Bench", "Mililitro") for i in range(BASE_ITEMS)])
+    base_ids = [item["id"] for item in queries.get_all_items_with_details()]
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+
+    bar_ids = rng.sample(base_ids, BAR_INGREDIENTS)
+    syrups = []
+    for n in range(SYRUPS):
+        recipe_id = queries.create_recipe(f"Ficha Xarope {n}", [(i, 250) for i in rng.sample(bar_ids, 4)], 1000)
+        item_id = queries.add_item(f"Xarope {n}", None, None)
+        queries.set_item_recipe(item_id, recipe_id)
+        syrups.append(item_id)
+    category = queries.find_or_create_menu_category("Drinks")
+    for n in range(COCKTAILS):
+        componentes = [(i, rng.randint(10, 60)) for i in rng.sample(bar_ids, 4)] + [(rng.choice(syrups), 15)]
+        queries.add_menu_item(category, f"Drink {n}", 30.0, id_ficha_tecnica=queries.create_recipe(f"Drink {n}", componentes))
+    bottles = rng.sample([i for i in base_ids if i not in bar_ids], BOTTLES)
+    for n, item_id in enumerate(bottles):
+        queries.add_menu_item(category, f"Long neck {n}", 12.0, id_item_estoque=item_id)
+
+    stocked = bar_ids + bottles
+    ledger.record_movements([{"id_item": item_id, "id_local_estoque": 1, "tipo": ledger.TIPO_COMPRA,
+                              "quantidade": rng.randint(20, 400)} for item_id in stocked], user_id)
+    return user_id, stocked
+
+
+def main():
+    rng = random.Random(17)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "availability.db"))
+        user_id, stocked = _setup(rng)
+        availability = MenuAvailability(1).attach()
+
+        t0 = time.perf_counter()
+        availability.refresh()
+        full_ms = (time.perf_counter() - t0) * 1000
+        full_evaluations = availability.evaluations
+
+        samples, evaluations, flips = [], [], 0
+        for _ in range(CHANGES):
+            item_id = rng.choice(stocked)
+            delta = rng.choice([-1, 1]) * rng.randint(10, 200)
+            before = availability.evaluations
+            t0 = time.perf_counter()
+            flips += len(availability.apply_stock_changes({(item_id, 1): delta}))
+            samples.append((time.perf_counter() - t0) * 1000)
+            evaluations.append(availability.evaluations - before)
+            # Mantém o banco coerente com o que foi aplicado em memória.
+            with database.db_connection() as conn:
+                with conn:
+                    conn.execute(
+                        "UPDATE saldos_estoque SET quantidade = quantidade + ? WHERE id_item = ? AND id_local_estoque = 1",
+                        (delta, item_id),
+                    )
+
+        incremental = availability.snapshot()
+        recomputed = MenuAvailability(1).snapshot()
+        print(f"Cálculo completo do cardápio ({full_evaluations} itens): {full_ms:6.2f} ms")
+        print(f"Alteração de saldo de 1 item: mediana {statistics.median(samples):6.3f} ms, "
+              f"{statistics.mean(evaluations):.1f} itens do cardápio reavaliados em média "
+              f"(de {full_evaluations}); {flips} mudança(s) de disponibilidade")
+        print(f"Incremental igual ao recálculo completo: {'sim' if incremental == recomputed else 'NÃO'}")
+
+        # Caminho real: uma venda registrada no livro notifica a disponibilidade.
+        before = availability.evaluations
+        ledger.register_sale(stocked[0], 1, 1, user_id)
+        print(f"Venda pelo livro reavaliou {availability.evaluations - before} item(ns) do cardápio")
+        availability.detach()
+        before = availability.evaluations
+        ledger.register_sale(stocked[0], 1, 1, user_id)
+        print(f"Depois de detach(): {availability.evaluations - before} reavaliação(ões)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
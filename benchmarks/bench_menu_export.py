@@ -0,0 +1,92 @@
+# =================================================================================
+# BENCHMARK: EXPORTAÇÃO DO CARDÁPIO DIGITAL ESTÁTICO (bench_menu_export.py)
+# Local: benchmarks/bench_menu_export.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_menu_export
+# Compara montar o cardápio a cada acesso com servir arquivos pré-gerados, e
+# mostra que só há trabalho quando o cardápio muda.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import menu_export_service as export
+from app.services.menu_export_service import MenuExporter
+
+logging.disable(logging.INFO)
+
+CATEGORIES = 12
+MENU_ITEMS = 300
+REQUESTS = 200
+
+
+def _setup(rng: random.Random) -> list:
+    database.initialize_database()
+    categories = [queries.find_or_create_menu_category(f"Categoria {n}", n) for n in range(CATEGORIES)]
+    return [queries.add_menu_item(rng.choice(categories), f"Drink da casa {n}", round(rng.uniform(12, 60), 2),
+                                  descricao=f"Gin, xarope da casa, limão e espuma de gengibre ({n})")
+            for n in range(MENU_ITEMS)]
+
+
+def _ms(func) -> float:
+    t0 = time.perf_counter()
+    func()
+    return (time.perf_counter() - t0) * 1000
+
+
+def main():
+    rng = random.Random(18)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "menu.db"))
+        menu_ids = _setup(rng)
+        out_dir = os.path.join(tmp, "cardapio_digital")
+        exporter = MenuExporter(out_dir, "Bar Bench").attach()
+
+        per_request_ms = statistics.median(
+            _ms(lambda: export.render_html(export.build_menu_payload("Bar Bench"))) for _ in range(REQUESTS)
+        )
+        first_ms = _ms(exporter.export_if_changed)
+        html_name = exporter.read_manifest()["html"]
+        html_path = os.path.join(out_dir, html_name)
+
+        def serve_static():
+            with open(html_path + ".gz", "rb") as f:
+                f.read()
+        static_ms = statistics.median(_ms(serve_static) for _ in range(REQUESTS))
+        unchanged_ms = statistics.median(_ms(exporter.export_if_changed) for _ in range(REQUESTS))
+
+        queries.update_menu_item(menu_ids[0], 1, "Drink da casa 0", 99.0)
+        changed_ms = _ms(exporter.export_if_changed)
+        new_html = exporter.read_manifest()["html"]
+        exporter.detach()
+
+        # Exportação automática: uma rajada de edições gera uma única versão nova.
+        auto = MenuExporter(out_dir, "Bar Bench", auto_export_delay=0.05).attach()
+        auto.export_if_changed()
+        before_auto = auto.read_manifest()["html"]
+        for n, menu_id in enumerate(menu_ids[:10]):
+            queries.update_menu_item(menu_id, 1, f"Drink da casa {n}", 50.0 + n)
+        time.sleep(0.5)
+        auto_html = auto.read_manifest()["html"]
+        auto.detach()
+
+        raw = os.path.getsize(html_path)
+        gz = os.path.getsize(html_path + ".gz")
+        br = os.path.getsize(html_path + ".br") if os.path.exists(html_path + ".br") else None
+        print(f"Cardápio com {MENU_ITEMS} itens em {CATEGORIES} categorias")
+        print(f"Montar a página a cada acesso (SQLite + HTML): {per_request_ms:7.3f} ms por acesso")
+        print(f"Ler a página pré-gerada (.gz):                 {static_ms:7.3f} ms por acesso")
+        print(f"Exportação inicial: {first_ms:.1f} ms | sem mudanças: {unchanged_ms:.4f} ms | "
+              f"após mudar um preço: {changed_ms:.1f} ms (novo arquivo: {new_html != html_name})")
+        print(f"Exportação automática após 10 edições: {'nova versão publicada' if auto_html != before_auto else 'NÃO exportou'}")
+        print(f"Tamanho do HTML: {raw:,} bytes | gzip {gz:,} bytes"
+              + (f" | brotli {br:,} bytes" if br is not None else " | brotli indisponível"))
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# =================================================================================
+# BENCHMARK / TESTE DE CARGA: RECEBIMENTO DE PEDIDOS (bench_order_intake.py)
+# Local: benchmarks/bench_order_intake.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_order_intake
+# Sobe o servidor de pedidos em uma thread (banco temporário) e dispara rajadas
+# de pedidos por várias conexões keep-alive, comparando uma transação por
+# pedido com a gravação em lote. Uma thread que "pisca" a cada 10 ms faz o papel
+# da interface do Flet e mede quanto ela chega a atrasar durante a rajada.
+#
+# Para testar uma instância já rodando (python -m app.services.order_intake_service):
+#   BENCH_TARGET=127.0.0.1:8765 python -m benchmarks.bench_order_intake
+# =================================================================================
+
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from app.database import database, queries
+from app.services.order_intake_service import OrderIntakeServer
+
+logging.disable(logging.INFO)
+
+MENU_ITEMS = 300
+ORDERS = int(os.environ.get("BENCH_ORDERS", "3000"))
+CONNECTIONS = int(os.environ.get("BENCH_CONNECTIONS", "50"))
+BATCH_SIZES = [1, 200]
+UI_TICK = 0.010
+
+
+def _setup(rng: random.Random):
+    database.initialize_database()
+    categories = [queries.find_or_create_menu_category(f"Categoria {n}", n) for n in range(10)]
+    for n in range(MENU_ITEMS):
+        queries.add_menu_item(rng.choice(categories), f"Prato {n}", round(rng.uniform(12, 80), 2))
+
+
+def _random_order(rng: random.Random, menu: list) -> dict:
+    chosen = rng.sample(menu, min(len(menu), rng.randint(1, 5)))
+    itens = [{"id": item["id"], "quantidade": rng.randint(1, 3)} for item in chosen]
+    total = round(sum(next(m["preco"] for m in menu if m["id"] == i["id"]) * i["quantidade"] for i in itens), 2)
+    return {
+        "cliente": {"nome": f"Cliente {rng.randint(1, 10_000)}", "telefone": "11 99999-0000"},
+        "endereco": "Rua das Flores, 123 - apto 45",
+        "itens": itens,
+        "total": total,
+    }
+
+
+async def _request(reader, writer, method: str, path: str, payload=None) -> tuple:
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length) if length else b""
+    return status, json.loads(data) if data else None
+
+
+async def _load(host: str, port: int, orders: list) -> tuple:
+    latencies = []
+    statuses = {}
+    queue = list(orders)
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while queue:
+                order = queue.pop()
+                t0 = time.perf_counter()
+                status, _ = await _request(reader, writer, "POST", "/pedidos", order)
+                latencies.append(time.perf_counter() - t0)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CONNECTIONS)))
+    return time.perf_counter() - t0, latencies, statuses
+
+
+async def _fetch_menu(host: str, port: int) -> list:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        return (await _request(reader, writer, "GET", "/cardapio"))[1]["itens"]
+    finally:
+        writer.close()
+
+
+async def _check_validation(host: str, port: int, menu: list):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        wrong_total = {"cliente": {"nome": "Teste"}, "itens": [{"id": menu[0]["id"], "quantidade": 1}], "total": 0.01}
+        unknown_item = {"cliente": {"nome": "Teste"}, "itens": [{"id": 10 ** 9, "quantidade": 1}]}
+        print(f"Total divergente -> {(await _request(reader, writer, 'POST', '/pedidos', wrong_total))[0]}, "
+              f"item inexistente -> {(await _request(reader, writer, 'POST', '/pedidos', unknown_item))[0]}")
+    finally:
+        writer.close()
+
+
+class _UiTicker:
+    """Simula a thread da interface: mede o maior atraso de um tick de 10 ms."""
+
+    def __init__(self):
+        self.max_lag = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.perf_counter()
+            time.sleep(UI_TICK)
+            self.max_lag = max(self.max_lag, time.perf_counter() - t0 - UI_TICK)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _report(label: str, elapsed: float, latencies: list, statuses: dict, extra: str = ""):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(f"{label}: {len(latencies) / elapsed:7,.0f} pedidos/s | latência p50 {statistics.median(latencies) * 1000:6.1f} ms, "
+          f"p95 {p(0.95):6.1f} ms, p99 {p(0.99):6.1f} ms | respostas {statuses}{extra}")
+
+
+def _run_external(target: str):
+    host, port = target.rsplit(":", 1)
+    rng = random.Random(19)
+    menu = asyncio.run(_fetch_menu(host, int(port)))
+    orders = [_random_order(rng, menu) for _ in range(ORDERS)]
+    elapsed, latencies, statuses = asyncio.run(_load(host, int(port), orders))
+    _report(f"{ORDERS} pedidos em {CONNECTIONS} conexões contra {target}", elapsed, latencies, statuses)
+
+
+def main():
+    target = os.environ.get("BENCH_TARGET")
+    if target:
+        _run_external(target)
+        return
+
+    rng = random.Random(19)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "orders.db"))
+        _setup(rng)
+        print(f"{ORDERS} pedidos por {CONNECTIONS} conexões simultâneas, cardápio com {MENU_ITEMS} itens.")
+        for batch_size in BATCH_SIZES:
+            server = OrderIntakeServer(host="127.0.0.1", port=0, batch_size=batch_size).start_in_thread()
+            menu = asyncio.run(_fetch_menu(server.host, server.port))
+            if batch_size == BATCH_SIZES[0]:
+                asyncio.run(_check_validation(server.host, server.port, menu))
+            orders = [_random_order(rng, menu) for _ in range(ORDERS)]
+            with _UiTicker() as ui:
+                elapsed, latencies, statuses = asyncio.run(_load(server.host, server.port, orders))
+            server.stop_thread()
+            label = "1 transação por pedido" if batch_size == 1 else f"lotes de até {batch_size} pedidos"
+            _report(f"{label:>24}", elapsed, latencies, statuses,
+                    f" | {server.batches} transações (média {server.persisted / max(server.batches, 1):.1f}/lote)"
+                    f" | atraso máx. da 'interface' {ui.max_lag * 1000:.1f} ms")
+
+        with database.db_connection() as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0]
+            totals_ok = conn.execute(
+                """
+                SELECT COUNT(*) FROM pedidos p
+                WHERE ABS(p.total - (SELECT SUM(quantidade * preco_unitario) FROM pedido_itens WHERE id_pedido = p.id)) > 0.005
+                """
+            ).fetchone()[0] == 0
+        print(f"Pedidos gravados: {stored} de {ORDERS * len(BATCH_SIZES)}; totais conferem com os itens: "
+              f"{'sim' if totals_ok else 'NÃO'}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# =================================================================================
+# BENCHMARK: CUSTO DE UM CARDÁPIO COM FICHAS TÉCNICAS ANINHADAS (bench_recipes.py)
+# Local: benchmarks/bench_recipes.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_recipes
+# Precificar 300 drinks depois da primeira vez deve ser só leitura de cache; mudar
+# o custo de um ingrediente recalcula apenas as fichas que dependem dele.
+# =================================================================================
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services.recipe_service import RecipeCycleError, recipe_engine
+
+logging.disable(logging.INFO)
+
+BASE_ITEMS = 2000
+SYRUPS = 20            # sub-receitas (xaropes da casa), usadas por vários drinks
+PREMIXES = 5           # sub-receitas de segundo nível, feitas com xaropes
+COCKTAILS = 300
+RUNS = 20
+
+
+def _setup(rng: random.Random) -> list:
+    database.initialize_database()
+    queries.bulk_seed(["Bench"], [("Mililitro", "ml")],
+                      [(f"Item SKU{i:x}", "Bench", "Mililitro") for i in range(BASE_ITEMS)])
+    base_ids = [item["id"] for item in queries.get_all_items_with_details()]
+    with database.db_connection() as conn:
+        with conn:
+            conn.executemany("UPDATE itens SET custo_unitario = ? WHERE id = ?",
+                             [(round(rng.uniform(0.01, 0.5), 3), item_id) for item_id in base_ids])
+
+    def prepared(nome: str, componentes: list, rendimento: float) -> int:
+        recipe_id = queries.create_recipe(f"Ficha {nome}", componentes, rendimento)
+        item_id = queries.add_item(nome, None, None)
+        queries.set_item_recipe(item_id, recipe_id)
+        return item_id
+
+    syrups = [prepared(f"Xarope {n}", [(i, rng.randint(100, 500)) for i in rng.sample(base_ids, 4)], 1000)
+              for n in range(SYRUPS)]
+    premixes = [prepared(f"Pré-mix {n}", [(s, 200) for s in rng.sample(syrups, 2)]
+                         + [(rng.choice(base_ids), 300)], 500) for n in range(PREMIXES)]
+    cocktails = []
+    for n in range(COCKTAILS):
+        componentes = [(i, rng.randint(10, 60)) for i in rng.sample(base_ids, 4)]
+        componentes.append((rng.choice(syrups), 15))
+        if n % 3 == 0:
+            componentes.append((rng.choice(premixes), 20))
+        cocktails.append(queries.create_recipe(f"Drink {n}", componentes))
+    return cocktails
+
+
+def _time_ms(func, *args) -> float:
+    t0 = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - t0) * 1000
+
+
+def main():
+    rng = random.Random(15)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "recipes.db"))
+        cocktails = _setup(rng)
+        recipe_engine.clear()
+
+        cold_ms = _time_ms(recipe_engine.price_menu, cocktails)
+        warm_ms = min(_time_ms(recipe_engine.price_menu, cocktails) for _ in range(RUNS))
+
+        # Um ingrediente de um xarope muda de preço: só os drinks que usam esse xarope recalculam.
+        syrup_recipe = queries.get_recipe_graph()[1]
+        some_syrup = next(r for r in syrup_recipe if r not in cocktails)
+        ingredient = syrup_recipe[some_syrup][0][0]
+        misses_before = recipe_engine.misses
+        queries.update_item_cost(ingredient, 0.99)
+        after_change_ms = _time_ms(recipe_engine.price_menu, cocktails)
+        recomputed = recipe_engine.misses - misses_before
+
+        print(f"Cardápio de {COCKTAILS} drinks ({SYRUPS} xaropes, {PREMIXES} pré-mixes aninhados):")
+        print(f"  primeira precificação (expansão completa): {cold_ms:7.2f} ms")
+        print(f"  precificação em cache:                     {warm_ms:7.2f} ms")
+        print(f"  após mudar o custo de 1 ingrediente:       {after_change_ms:7.2f} ms "
+              f"({recomputed} ficha(s) reexpandida(s))")
+
+        # Ciclo: o xarope passa a usar um drink que o usa.
+        cyclic_drink = next(r for r in cocktails if some_syrup in recipe_engine._dependencies[r][1])
+        drink_item = queries.add_item("Drink como ingrediente", None, None)
+        queries.set_item_recipe(drink_item, cyclic_drink)
+        queries.update_recipe(some_syrup, "Ficha Xarope ciclo", 1000, componentes=[(drink_item, 100)])
+        try:
+            recipe_engine.explode(cyclic_drink)
+            print("  ciclo NÃO detectado")
+        except RecipeCycleError as e:
+            print(f"  ciclo detectado: {e}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# =================================================================================
+# BENCHMARK: CACHE DE CATEGORIAS E UNIDADES (bench_reference_cache.py)
+# Local: benchmarks/bench_reference_cache.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_reference_cache
+# Compara a listagem de itens com as junções antigas contra a listagem sem
+# junções (nomes resolvidos pelo cache), mede a abertura do formulário de itens
+# (categorias + unidades) com e sem cache e confere a invalidação: uma categoria
+# criada por find_or_create_category aparece na próxima leitura.
+# =================================================================================
+
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+
+logging.disable(logging.INFO)
+
+ITEMS = 20_000
+CATEGORIES = 60
+UNITS = 12
+ROUNDS = 30
+FORM_OPENS = 2000
+
+# A consulta de listagem como era antes do cache.
+_JOINED_LIST_SQL = """
+    SELECT
+        i.id, i.nome, i.id_categoria, i.id_unidade_medida,
+        c.nome as categoria,
+        u.nome as unidade
+    FROM itens i
+    LEFT JOIN categorias c ON i.id_categoria = c.id
+    LEFT JOIN unidades_medida u ON i.id_unidade_medida = u.id
+    ORDER BY i.nome
+"""
+
+
+def _joined_list():
+    with database.db_connection() as conn:
+        return [dict(row) for row in conn.execute(_JOINED_LIST_SQL).fetchall()]
+
+
+def _form_without_cache():
+    with database.db_connection() as conn:
+        categories = [dict(row) for row in conn.execute("SELECT id, nome FROM categorias ORDER BY nome")]
+        units = [dict(row) for row in conn.execute("SELECT id, nome, sigla FROM unidades_medida ORDER BY nome")]
+    return categories, units
+
+
+def _median_ms(fn, rounds: int) -> float:
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "dose_certa.db"))
+        database.initialize_database()
+        queries.bulk_seed([f"Categoria {n:02d}" for n in range(CATEGORIES)],
+                          [(f"Unidade {n:02d}", f"u{n}") for n in range(UNITS)],
+                          [(f"Item {n:05d}", f"Categoria {n % CATEGORIES:02d}", f"Unidade {n % UNITS:02d}")
+                           for n in range(ITEMS)])
+
+        same = _joined_list() == queries.get_all_items_with_details()
+        print(f"Listagem sem junções igual à antiga: {'ok' if same else 'FALHOU'}")
+
+        joined = _median_ms(_joined_list, ROUNDS)
+        cached = _median_ms(queries.get_all_items_with_details, ROUNDS)
+        print(f"Lista de {ITEMS:,} itens (mediana de {ROUNDS}): com junções {joined:.1f} ms | "
+              f"sem junções + cache {cached:.1f} ms ({joined / cached:.2f}x)")
+
+        page = _median_ms(lambda: queries.get_items_page(limit=50), ROUNDS * 10)
+        print(f"Primeira página (50 itens, sem junções + cache): {page:.3f} ms")
+
+        before = queries.get_reference_cache_stats()
+        t0 = time.perf_counter()
+        for _ in range(FORM_OPENS):
+            _form_without_cache()
+        uncached = (time.perf_counter() - t0) / FORM_OPENS * 1e6
+        t0 = time.perf_counter()
+        for _ in range(FORM_OPENS):
+            queries.get_all_categories()
+            queries.get_all_units()
+        hit = (time.perf_counter() - t0) / FORM_OPENS * 1e6
+        after = queries.get_reference_cache_stats()
+        print(f"Abertura do formulário (categorias + unidades, {FORM_OPENS} vezes): "
+              f"consultas {uncached:.0f} µs | cache {hit:.0f} µs ({uncached / hit:.1f}x); "
+              f"acertos +{after['acertos'] - before['acertos']}, faltas +{after['faltas'] - before['faltas']}")
+
+        new_id = queries.find_or_create_category("Categoria nova")
+        visible = any(row["id"] == new_id for row in queries.get_all_categories())
+        item_id = queries.add_item("Item com categoria nova", new_id, 1)
+        detail = queries.get_item_with_details(item_id) if item_id else None
+        print(f"Invalidação após find_or_create_category: "
+              f"{'ok' if visible and detail and detail['categoria'] == 'Categoria nova' else 'FALHOU'}")
+        print(f"Contadores: {queries.get_reference_cache_stats()}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# =================================================================================
+# BENCHMARK: BAIXA DE ESTOQUE POR VENDAS (bench_sales_depletion.py)
+# Local: benchmarks/bench_sales_depletion.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_sales_depletion
+# Compara vendas/s da abordagem ingênua (expansão recursiva + um UPDATE por
+# ingrediente por venda) com vetores pré-compilados aplicados em lote.
+# =================================================================================
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import stock_ledger_service as ledger
+from app.services.menu_service import menu_index
+from app.services.sales_service import record_sales
+
+logging.disable(logging.INFO)
+
+BASE_ITEMS = 2000
+BAR_INGREDIENTS = 150  # os drinks usam um conjunto pequeno de insumos do bar
+SYRUPS = 20
+COCKTAILS = 250
+BOTTLES = 50          # itens vendidos direto do estoque (id_item_estoque)
+NAIVE_SALES = 2000
+BATCH_SIZES = [1, 10, 50, 200]
+BATCHED_SALES = 20_000
+
+
+def _setup(rng: random.Random) -> tuple:
+    database.initialize_database()
+    queries.bulk_seed(["Bench"], [("Mililitro", "ml")],
+                      [(f"Item SKU{i:x}", "Bench", "Mililitro") for i in range(BASE_ITEMS)])
+    base_ids = [item["id"] for item in queries.get_all_items_with_details()]
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+
+    bar_ids = rng.sample(base_ids, BAR_INGREDIENTS)
+    syrups = []
+    for n in range(SYRUPS):
+        recipe_id = queries.create_recipe(f"Ficha Xarope {n}", [(i, 250) for i in rng.sample(bar_ids, 4)], 1000)
+        item_id = queries.add_item(f"Xarope {n}", None, None)
+        queries.set_item_recipe(item_id, recipe_id)
+        syrups.append(item_id)
+
+    category = queries.find_or_create_menu_category("Drinks")
+    menu_ids = []
+    for n in range(COCKTAILS):
+        componentes = [(i, rng.randint(10, 60)) for i in rng.sample(bar_ids, 4)] + [(rng.choice(syrups), 15)]
+        recipe_id = queries.create_recipe(f"Drink {n}", componentes)
+        menu_ids.append(queries.add_menu_item(category, f"Drink {n}", 30.0, id_ficha_tecnica=recipe_id))
+    for n, item_id in enumerate(rng.sample(base_ids, BOTTLES)):
+        menu_ids.append(queries.add_menu_item(category, f"Long neck {n}", 12.0, id_item_estoque=item_id))
+    return user_id, menu_ids
+
+
+def _popular_choice(rng: random.Random, menu_ids: list):
+    """Poucos itens concentram a maior parte das vendas (distribuição de Zipf)."""
+    weights = [1 / (rank + 1) for rank in range(len(menu_ids))]
+    return lambda: rng.choices(menu_ids, weights)[0]
+
+
+def _naive_sale(conn, menu_item_id: int, user_id: int):
+    """Referência: expande a ficha recursivamente no banco e grava cada ingrediente separado."""
+    id_item_estoque, id_ficha = conn.execute(
+        "SELECT id_item_estoque, id_ficha_tecnica FROM cardapio_itens WHERE id = ?", (menu_item_id,)
+    ).fetchone()
+
+    def walk(recipe_id: int, factor: float):
+        rendimento = conn.execute("SELECT rendimento FROM fichas_tecnicas WHERE id = ?", (recipe_id,)).fetchone()[0]
+        for item_id, quantidade, sub in conn.execute(
+            """
+            SELECT f.id_item, f.quantidade, i.id_ficha_tecnica FROM ficha_tecnica_itens f
+            JOIN itens i ON i.id = f.id_item WHERE f.id_ficha_tecnica = ?
+            """, (recipe_id,)
+        ).fetchall():
+            if sub is None:
+                yield item_id, factor * quantidade / rendimento
+            else:
+                yield from walk(sub, factor * quantidade / rendimento)
+
+    deductions = walk(id_ficha, 1.0) if id_ficha is not None else [(id_item_estoque, 1.0)]
+    with conn:
+        for item_id, qty in deductions:
+            conn.execute(
+                """
+                INSERT INTO movimentacoes_estoque
+                    (id_item, id_local_estoque, id_usuario, tipo_movimentacao, quantidade)
+                VALUES (?, 1, ?, 'venda', ?)
+                """,
+                (item_id, user_id, -qty),
+            )
+            conn.execute(
+                """
+                INSERT INTO saldos_estoque (id_item, id_local_estoque, quantidade) VALUES (?, 1, ?)
+                ON CONFLICT (id_item, id_local_estoque) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+                """,
+                (item_id, -qty),
+            )
+            conn.execute("UPDATE itens SET quantidade_estoque = quantidade_estoque - ? WHERE id = ?", (qty, item_id))
+
+
+def main():
+    rng = random.Random(16)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "sales.db"))
+        user_id, menu_ids = _setup(rng)
+        pick = _popular_choice(rng, menu_ids)
+
+        with database.db_connection() as conn:
+            t0 = time.perf_counter()
+            for _ in range(NAIVE_SALES):
+                _naive_sale(conn, pick(), user_id)
+            naive_rate = NAIVE_SALES / (time.perf_counter() - t0)
+        print(f"Ingênua (expansão recursiva + UPDATE por ingrediente, 1 transação por venda): {naive_rate:8,.0f} vendas/s")
+
+        t0 = time.perf_counter()
+        compiled = menu_index.compile_all()
+        print(f"Compilação dos vetores de {compiled} itens do cardápio: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        for batch_size in BATCH_SIZES:
+            batches = BATCHED_SALES // batch_size if batch_size > 1 else NAIVE_SALES
+            t0 = time.perf_counter()
+            for _ in range(batches):
+                record_sales([(pick(), 1) for _ in range(batch_size)], 1, user_id)
+            rate = batches * batch_size / (time.perf_counter() - t0)
+            print(f"Vetores pré-compilados, lotes de {batch_size:>3} vendas: {rate:10,.0f} vendas/s")
+
+        differences = ledger.rebuild_balances()
+        print(f"Saldos conferem com o livro: {'sim' if not any(differences.values()) else 'NÃO'}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# =================================================================================
+# BENCHMARK: BUSCA TEXTUAL FTS5 NO CATÁLOGO (bench_search.py)
+# Local: benchmarks/bench_search.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_search
+# Meta: menos de 10 ms por busca em um catálogo de 100 mil itens.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.database.seeder import INITIAL_CATEGORIES, INITIAL_UNITS, INITIAL_ITEMS, seed_database
+
+logging.disable(logging.INFO)
+
+CATALOG_SIZE = 100_000
+TARGET_MS = 10.0
+QUERIES = ["gin tanq", "chivas", "vodka", "agua", "w bl", "licor 43", "garrafa 750 gin", "xyz inexistente"]
+REPEAT = 50
+
+
+def synthetic_catalog(size: int) -> list:
+    """
+    Variações dos itens iniciais (marca + linha + código de SKU) até `size`
+    itens. O código começa por letras para não criar milhares de termos
+    numéricos artificiais que colidiriam com volumes como "750ml".
+    """
+    rng = random.Random(42)
+    words = ["Reserva", "Premium", "Especial", "Clássico", "Tradicional", "Edição", "Ouro", "Prata"]
+    catalog = list(INITIAL_ITEMS)
+    for i in range(size - len(catalog)):
+        base = rng.choice(INITIAL_ITEMS)
+        catalog.append({
+            "nome": f"{base['nome']} {rng.choice(words)} SKU{i:x}",
+            "categoria": base["categoria"],
+            "unidade": base["unidade"],
+        })
+    return catalog
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "search.db"))
+        database.initialize_database()
+        start = time.perf_counter()
+        seed_database(INITIAL_CATEGORIES, INITIAL_UNITS, synthetic_catalog(CATALOG_SIZE))
+        print(f"Catálogo de {CATALOG_SIZE} itens carregado (com triggers FTS) em "
+              f"{time.perf_counter() - start:.1f} s")
+
+        worst = 0.0
+        for text in QUERIES:
+            samples = []
+            for _ in range(REPEAT):
+                t0 = time.perf_counter()
+                results = queries.search_items(text, 50)
+                samples.append((time.perf_counter() - t0) * 1000)
+            p95 = sorted(samples)[int(0.95 * (len(samples) - 1))]
+            worst = max(worst, p95)
+            top = results[0]["nome"] if results else "-"
+            print(f"  {text!r:<20} mediana {statistics.median(samples):6.2f} ms   p95 {p95:6.2f} ms   "
+                  f"{len(results):3d} resultados (1º: {top})")
+        status = "OK" if worst < TARGET_MS else "ACIMA DA META"
+        print(f"Pior p95: {worst:.2f} ms (meta < {TARGET_MS:.0f} ms) - {status}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# =================================================================================
+# BENCHMARK: POVOAMENTO EM LOTE x FIND-OR-CREATE POR LINHA (bench_seeder.py)
+# Local: benchmarks/bench_seeder.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_seeder
+# =================================================================================
+
+import logging
+import os
+import tempfile
+import time
+
+from app.database import database, queries
+from app.database.seeder import INITIAL_CATEGORIES, INITIAL_UNITS, INITIAL_ITEMS, seed_database
+
+logging.disable(logging.INFO)
+
+LARGE_CATALOG_SIZE = 5000
+
+
+def legacy_seed(categories, units, items):
+    """Caminho antigo: uma conexão e um commit por categoria, unidade e item."""
+    category_ids = {name: queries.find_or_create_category(name) for name in categories}
+    unit_ids = {u["nome"]: queries.find_or_create_unit(u["nome"], u["sigla"]) for u in units}
+    for item in items:
+        queries.create_item_if_not_exists(
+            item["nome"], category_ids[item["categoria"]], unit_ids[item["unidade"]]
+        )
+
+
+def large_catalog(size: int) -> list:
+    """Catálogo sintético de distribuidor com `size` SKUs."""
+    return [
+        {
+            "nome": f"SKU {i:06d}",
+            "categoria": INITIAL_CATEGORIES[i % len(INITIAL_CATEGORIES)],
+            "unidade": INITIAL_UNITS[i % len(INITIAL_UNITS)]["nome"],
+        }
+        for i in range(size)
+    ]
+
+
+def _timed(label: str, func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"  {label:<34} {elapsed:9.1f} ms")
+    return elapsed
+
+
+def run(tmp: str, name: str, seeder, categories, units, items):
+    database.set_database_path(os.path.join(tmp, f"{name}.db"))
+    database.initialize_database()
+    _timed("primeira execução (banco vazio)", seeder, categories, units, items)
+    _timed("execução a quente (já povoado)", seeder, categories, units, items)
+    database.close_pool()
+
+
+def main():
+    catalogs = [
+        ("catálogo inicial", INITIAL_ITEMS),
+        (f"catálogo externo ({LARGE_CATALOG_SIZE} SKUs)", large_catalog(LARGE_CATALOG_SIZE)),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, items in catalogs:
+            print(f"{label}:")
+            print(" find-or-create por linha")
+            run(tmp, f"legacy-{len(items)}", legacy_seed, INITIAL_CATEGORIES, INITIAL_UNITS, items)
+            print(" carga em lote")
+            run(tmp, f"bulk-{len(items)}", seed_database, INITIAL_CATEGORIES, INITIAL_UNITS, items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# =================================================================================
+# BENCHMARK: PARTIDA A FRIO x PARTIDA A QUENTE (bench_startup.py)
+# Local: benchmarks/bench_startup.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_startup
+# Mede o trabalho de banco feito em DoseCertaApp.__init__ antes do primeiro
+# page.go("/"), que domina o tempo até o primeiro quadro.
+# =================================================================================
+
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from app.database import database
+from app.database.database import initialize_database
+from app.database.seeder import seed_database
+from app.services import auth_service, startup_service
+
+logging.disable(logging.INFO)
+
+WARM_RUNS = 20
+
+
+def legacy_startup():
+    """Sequência antiga: tudo é executado em toda partida."""
+    initialize_database()
+    auth_service.create_default_user()
+    seed_database()
+
+
+def _new_process(db_path: str):
+    """Simula um novo processo: pool recriado, nenhuma conexão quente."""
+    database.set_database_path(db_path)
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, startup in [("sequência antiga", legacy_startup),
+                               ("impressão digital", startup_service.bootstrap_database)]:
+            db_path = os.path.join(tmp, f"{startup.__name__}.db")
+            _new_process(db_path)
+            cold = _timed(startup)
+            warm = []
+            for _ in range(WARM_RUNS):
+                _new_process(db_path)
+                warm.append(_timed(startup))
+            database.close_pool()
+            print(f"{label}:")
+            print(f"  partida a frio                 {cold:8.1f} ms")
+            print(f"  partida a quente (mediana/{WARM_RUNS}) {statistics.median(warm):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
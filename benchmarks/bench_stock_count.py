@@ -0,0 +1,77 @@
+# =================================================================================
+# BENCHMARK: GRAVAÇÃO DE UMA CONTAGEM DE ESTOQUE (bench_stock_count.py)
+# Local: benchmarks/bench_stock_count.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_stock_count
+# Uma contagem de 500 itens deve ser gravada bem abaixo de 1 segundo.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import stock_ledger_service as ledger
+from app.services.stock_count_service import CountSession, find_pending_sessions
+
+logging.disable(logging.INFO)
+
+ITEMS = 2000
+COUNTED_ITEMS = 500
+ROUNDS = 5
+
+
+def _setup() -> int:
+    database.initialize_database()
+    queries.bulk_seed(["Bench"], [("Unidade", "un")],
+                      [(f"Item SKU{i:x}", "Bench", "Unidade") for i in range(ITEMS)])
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    return user_id
+
+
+def main():
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "count.db"))
+        user_id = _setup()
+        item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+        ledger.record_movements([{"id_item": item_id, "id_local_estoque": 1, "tipo": ledger.TIPO_COMPRA,
+                                  "quantidade": rng.randint(1, 50)} for item_id in item_ids], user_id)
+
+        start_ms, entry_us, commit_ms = [], [], []
+        for _ in range(ROUNDS):
+            t0 = time.perf_counter()
+            session = CountSession.start(1, user_id)
+            start_ms.append((time.perf_counter() - t0) * 1000)
+
+            for item_id in rng.sample(item_ids, COUNTED_ITEMS):
+                t0 = time.perf_counter()
+                session.set_count(item_id, rng.randint(0, 50))
+                entry_us.append((time.perf_counter() - t0) * 1_000_000)
+
+            # Simula o app fechando no meio: a sessão retomada deve ser idêntica.
+            resumed = CountSession.resume(find_pending_sessions()[0])
+            assert resumed.counted == session.counted and resumed.system_quantities == session.system_quantities
+            session._close_journal()
+
+            t0 = time.perf_counter()
+            count_id = resumed.commit()
+            commit_ms.append((time.perf_counter() - t0) * 1000)
+            assert count_id is not None and not find_pending_sessions()
+            assert all(ledger.get_balance(item_id, 1) == qty for item_id, qty in resumed.counted.items())
+
+        differences = ledger.rebuild_balances()
+        print(f"Início da sessão (saldos de {ITEMS} itens): {statistics.median(start_ms):6.1f} ms")
+        print(f"Lançamento de um item (com fsync do diário): {statistics.median(entry_us):6.0f} µs (mediana)")
+        print(f"Gravação de {COUNTED_ITEMS} itens + ajustes + fotografia: {statistics.median(commit_ms):6.1f} ms "
+              f"(mediana), pior {max(commit_ms):.1f} ms")
+        print(f"Saldos após as contagens conferem com o livro: {'sim' if not any(differences.values()) else 'NÃO'}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
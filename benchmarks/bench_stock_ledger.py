@@ -0,0 +1,72 @@
+# =================================================================================
+# BENCHMARK: LEITURA DE SALDO x TAMANHO DO LIVRO (bench_stock_ledger.py)
+# Local: benchmarks/bench_stock_ledger.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_stock_ledger
+# O saldo materializado deve custar o mesmo com 10 mil ou 1 milhão de movimentações.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.database.seeder import seed_database
+from app.services import stock_ledger_service as ledger
+
+logging.disable(logging.INFO)
+
+HISTORY_SIZES = [10_000, 100_000, 1_000_000]
+BATCH = 10_000
+READS = 2000
+
+
+def _setup() -> tuple:
+    database.initialize_database()
+    seed_database()
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+    return user_id, item_ids
+
+
+def main():
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "ledger.db"))
+        user_id, item_ids = _setup()
+        written = 0
+        for target in HISTORY_SIZES:
+            start, before = time.perf_counter(), written
+            while written < target:
+                ledger.record_movements(
+                    [{"id_item": rng.choice(item_ids), "id_local_estoque": 1,
+                      "tipo": rng.choice([ledger.TIPO_COMPRA, ledger.TIPO_VENDA]),
+                      "quantidade": rng.randint(1, 6)} for _ in range(BATCH)],
+                    user_id,
+                )
+                written += BATCH
+            write_s = time.perf_counter() - start
+
+            samples = []
+            for _ in range(READS):
+                item_id = rng.choice(item_ids)
+                t0 = time.perf_counter()
+                ledger.get_balance(item_id, 1)
+                samples.append((time.perf_counter() - t0) * 1_000_000)
+
+            t0 = time.perf_counter()
+            differences = ledger.rebuild_balances()
+            verify_s = time.perf_counter() - t0
+            ok = not any(differences.values())
+            print(f"{written:>9} movimentações: leitura de saldo mediana {statistics.median(samples):6.1f} µs | "
+                  f"verificação do livro {verify_s * 1000:7.1f} ms ({'confere' if ok else 'DIVERGE'}) | "
+                  f"gravação em lotes de {BATCH}: {(written - before) / write_s:,.0f}/s")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
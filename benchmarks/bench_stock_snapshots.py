@@ -0,0 +1,143 @@
+# =================================================================================
+# BENCHMARK: SALDO EM DATA PASSADA COM FOTOGRAFIAS (bench_stock_snapshots.py)
+# Local: benchmarks/bench_stock_snapshots.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_stock_snapshots
+# Gera 5 anos de movimentações para 2 mil itens, com uma fotografia por semana
+# (como numa contagem semanal), e compara a consulta "saldo no fechamento do
+# dia X" somando o livro inteiro x partindo da fotografia mais próxima.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app.database import database, queries
+from app.services import stock_ledger_service as ledger
+
+logging.disable(logging.INFO)
+
+ITEMS = 2000
+YEARS = int(os.environ.get("BENCH_YEARS", 5))
+MOVEMENTS_PER_DAY = 1000
+SNAPSHOT_EVERY_DAYS = 7
+QUERIES = 200
+LOCAL_ID = 1
+
+
+def _setup() -> int:
+    database.initialize_database()
+    queries.bulk_seed(["Bench"], [("Unidade", "un")],
+                      [(f"Item SKU{i:x}", "Bench", "Unidade") for i in range(ITEMS)])
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    return user_id
+
+
+def _generate_history(user_id: int, item_ids: list, first_day: date, days: int, rng: random.Random) -> int:
+    """
+    Grava o histórico com datas retroativas direto nas tabelas (a API do livro
+    sempre usa o instante atual), mantendo saldos_estoque coerente dia a dia.
+    """
+    total = 0
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        rows, deltas = [], {}
+        for n in range(MOVEMENTS_PER_DAY):
+            item_id = rng.choice(item_ids)
+            qty = rng.randint(1, 6) * (1 if rng.random() < 0.5 else -1)
+            stamp = f"{day.isoformat()} {8 + n * 14 // MOVEMENTS_PER_DAY:02d}:{n % 60:02d}:00"
+            rows.append((item_id, LOCAL_ID, user_id, "compra" if qty > 0 else "venda", qty, stamp))
+            deltas[item_id] = deltas.get(item_id, 0) + qty
+        with database.db_connection() as conn:
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO movimentacoes_estoque
+                        (id_item, id_local_estoque, id_usuario, tipo_movimentacao, quantidade, data_movimentacao)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    rows,
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO saldos_estoque (id_item, id_local_estoque, quantidade) VALUES (?, ?, ?)
+                    ON CONFLICT (id_item, id_local_estoque) DO UPDATE SET quantidade = quantidade + excluded.quantidade
+                    """,
+                    [(item_id, LOCAL_ID, delta) for item_id, delta in deltas.items()],
+                )
+        total += len(rows)
+        if (offset + 1) % SNAPSHOT_EVERY_DAYS == 0:
+            ledger.take_snapshot(LOCAL_ID, data_snapshot=f"{day.isoformat()} 23:00:00")
+    return total
+
+
+def _full_replay(as_of: str, id_item: int = None) -> dict:
+    """Referência: soma todas as movimentações desde o início."""
+    item_filter = "" if id_item is None else " AND id_item = ?"
+    params = (LOCAL_ID, as_of) if id_item is None else (LOCAL_ID, as_of, id_item)
+    with database.db_connection() as conn:
+        return {row[0]: row[1] for row in conn.execute(
+            "SELECT id_item, SUM(quantidade) FROM movimentacoes_estoque "
+            "WHERE id_local_estoque = ? AND data_movimentacao <= ?" + item_filter + " GROUP BY id_item",
+            params,
+        )}
+
+
+def _time_ms(func, *args) -> tuple:
+    t0 = time.perf_counter()
+    result = func(*args)
+    return (time.perf_counter() - t0) * 1000, result
+
+
+def _same(a: dict, b: dict) -> bool:
+    return all(abs(a.get(k, 0) - b.get(k, 0)) < 1e-6 for k in a.keys() | b.keys())
+
+
+def main():
+    rng = random.Random(12)
+    days = 365 * YEARS
+    first_day = date.today() - timedelta(days=days)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "snapshots.db"))
+        user_id = _setup()
+        item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+
+        t0 = time.perf_counter()
+        total = _generate_history(user_id, item_ids, first_day, days, rng)
+        print(f"Histórico: {total:,} movimentações, {days // SNAPSHOT_EVERY_DAYS} fotografias "
+              f"({time.perf_counter() - t0:.1f} s para gerar)")
+
+        replay_item, snap_item, replay_local, snap_local = [], [], [], []
+        mismatches = 0
+        for n in range(QUERIES):
+            as_of = ledger._as_timestamp(first_day + timedelta(days=rng.randrange(days)))
+            item_id = rng.choice(item_ids)
+
+            ms, expected = _time_ms(_full_replay, as_of, item_id)
+            replay_item.append(ms)
+            ms, value = _time_ms(ledger.get_balance_as_of, item_id, LOCAL_ID, as_of)
+            snap_item.append(ms)
+            mismatches += abs(expected.get(item_id, 0) - value) > 1e-6
+
+            if n % 10 == 0:
+                ms, expected = _time_ms(_full_replay, as_of)
+                replay_local.append(ms)
+                ms, values = _time_ms(ledger.get_balances_as_of, LOCAL_ID, as_of)
+                snap_local.append(ms)
+                mismatches += not _same(expected, values)
+
+        print(f"Saldo de 1 item na data:      livro inteiro {statistics.median(replay_item):8.2f} ms | "
+              f"fotografia + delta {statistics.median(snap_item):6.2f} ms (medianas)")
+        print(f"Saldos do local inteiro:      livro inteiro {statistics.median(replay_local):8.2f} ms | "
+              f"fotografia + delta {statistics.median(snap_local):6.2f} ms (medianas)")
+        print(f"Resultados idênticos à soma do livro: {'sim' if not mismatches else f'NÃO ({mismatches})'}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
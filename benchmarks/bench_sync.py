@@ -0,0 +1,142 @@
+# =================================================================================
+# BENCHMARK: SINCRONIZAÇÃO EM LOTES COMPRIMIDOS (bench_sync.py)
+# Local: benchmarks/bench_sync.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_sync
+# Um aparelho "A" envia seus dados para a nuvem de teste e um aparelho "B"
+# vazio os recebe, pela pasta local, pelo servidor HTTP local e por um
+# transporte que falha em parte das chamadas. Mede linhas/s e bytes por linha.
+# =================================================================================
+
+import json
+import logging
+import os
+import random
+import tempfile
+import zlib
+
+from app.database import database, queries
+from app.services import sync_service
+from app.services.sync_service import (HttpTransport, LocalFolderTransport, MockCloudServer, SyncTransport,
+                                       SyncTransportError, SyncWorker)
+
+logging.disable(logging.WARNING)
+
+ITEMS = 2000
+MOVEMENT_BATCHES = 500
+MOVEMENTS_PER_BATCH = 20
+COUNT_ROWS = 1000
+FAILURE_RATE = 0.2
+
+
+class FlakyTransport(SyncTransport):
+    """Falha (como uma rede instável) em parte das chamadas ao transporte de verdade."""
+
+    def __init__(self, inner: SyncTransport, rng: random.Random):
+        self.inner = inner
+        self.rng = rng
+
+    def _maybe_fail(self):
+        if self.rng.random() < FAILURE_RATE:
+            raise SyncTransportError("Falha simulada.")
+
+    def push(self, device_id, batch_id, data):
+        self._maybe_fail()
+        self.inner.push(device_id, batch_id, data)
+        # A confirmação também pode se perder depois de o lote chegar.
+        self._maybe_fail()
+
+    def pull(self, cursor, device_id, limit):
+        self._maybe_fail()
+        return self.inner.pull(cursor, device_id, limit)
+
+
+def _make_device_a(path: str, rng: random.Random):
+    database.set_database_path(path)
+    database.initialize_database()
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    queries.bulk_seed([f"Categoria {n}" for n in range(20)], [("Mililitro", "ml"), ("Unidade", "un")],
+                      [(f"Item SKU{n:05d} - descrição do produto", f"Categoria {n % 20}", "Unidade")
+                       for n in range(ITEMS)])
+    item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+    for item_id in rng.sample(item_ids, 500):
+        queries.update_item_cost(item_id, round(rng.uniform(1, 80), 2))
+    for _ in range(MOVEMENT_BATCHES):
+        picked = rng.sample(item_ids, MOVEMENTS_PER_BATCH)
+        queries.apply_stock_movements(
+            [(item_id, 1, user_id, "compra", float(rng.randint(1, 24)), "Nota fiscal 123") for item_id in picked],
+            {(item_id, 1): 0.0 for item_id in picked}, {},
+        )
+    queries.save_stock_count(1, user_id, "Contagem mensal",
+                             [(item_id, 10.0, 12.0) for item_id in rng.sample(item_ids, COUNT_ROWS)],
+                             [(item_id, -2.0) for item_id in item_ids[:COUNT_ROWS // 2]])
+    # Os saldos de A vêm do livro, para comparar com os de B no fim.
+    from app.services import stock_ledger_service
+    stock_ledger_service.rebuild_balances(apply=True)
+
+
+def _balances_by_name() -> tuple:
+    """Saldos por nome do item e do local (os ids locais de B não são os de A)."""
+    with database.db_connection() as conn:
+        by_local = {(row[0], row[1]): row[2] for row in conn.execute(
+            """
+            SELECT i.nome, l.nome, s.quantidade FROM saldos_estoque s
+            JOIN itens i ON i.id = s.id_item JOIN locais_estoque l ON l.id = s.id_local_estoque
+            """)}
+        by_item = {row[0]: row[1] for row in conn.execute("SELECT nome, quantidade_estoque FROM itens")}
+    return by_local, by_item
+
+
+def _raw_json_size(data: bytes) -> int:
+    return len(json.dumps(sync_service.decode_batch(data), ensure_ascii=False, separators=(",", ":")).encode())
+
+
+def _scenario(label: str, tmp: str, make_transport, rng: random.Random):
+    a_path, b_path = os.path.join(tmp, f"{label}_a.db"), os.path.join(tmp, f"{label}_b.db")
+    cloud = os.path.join(tmp, f"{label}_nuvem")
+    transport, cleanup = make_transport(cloud)
+
+    _make_device_a(a_path, rng)
+    a_balances = _balances_by_name()
+    worker = SyncWorker(transport, max_attempts=10, backoff_base=0.001)
+    sent = worker.sync_once()
+    database.close_pool()
+
+    database.set_database_path(b_path)
+    database.initialize_database()
+    received = SyncWorker(transport, max_attempts=10, backoff_base=0.001).sync_once()
+    b_balances = _balances_by_name()
+    database.close_pool()
+    cleanup()
+
+    raw = sum(_raw_json_size(open(os.path.join(cloud, name), "rb").read())
+              for name in os.listdir(cloud) if name.endswith(".lote")) if os.path.isdir(cloud) else 0
+    rows = sent["linhas_enviadas"]
+    print(f"{label:<22} envio {rows / sent['segundos']:8,.0f} linhas/s | recebimento "
+          f"{received['linhas_recebidas'] / received['segundos']:8,.0f} linhas/s | "
+          f"{sent['bytes_enviados'] / rows:5.1f} bytes/linha comprimido"
+          + (f" ({raw / rows:5.1f} em JSON puro)" if raw else "")
+          + f" | {sent['lotes_enviados']} lotes, {worker.retries} repetições no envio"
+          + f" | saldos iguais em B: {'sim' if a_balances == b_balances else 'NÃO'}")
+
+
+def main():
+    print(f"Formato dos lotes: {'msgpack' if sync_service.msgpack else 'JSON'} + zlib; "
+          f"{sync_service.BATCH_SIZE} mudanças por lote.")
+    with tempfile.TemporaryDirectory() as tmp:
+        _scenario("pasta local", tmp, lambda cloud: (LocalFolderTransport(cloud), lambda: None), random.Random(21))
+
+        def http(cloud):
+            server = MockCloudServer(cloud).start()
+            return HttpTransport(server.url), server.stop
+        _scenario("HTTP local", tmp, http, random.Random(21))
+
+        def flaky(cloud):
+            rng = random.Random(7)
+            return FlakyTransport(LocalFolderTransport(cloud), rng), lambda: None
+        _scenario(f"rede instável ({FAILURE_RATE:.0%})", tmp, flaky, random.Random(21))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# =================================================================================
+# BENCHMARK: JUNÇÃO DE EDIÇÕES CONCORRENTES ENTRE APARELHOS (bench_sync_merge.py)
+# Local: benchmarks/bench_sync_merge.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_sync_merge
+# Dois aparelhos partem do mesmo cadastro, trabalham desconectados e depois
+# sincronizam pela pasta local. Confere os casos de conflito (campos diferentes,
+# mesmo campo, exclusão x edição, livro dos dois lados), a convergência dos
+# dois bancos e mede a junção de ~100 mil mudanças pendentes.
+# =================================================================================
+
+import logging
+import os
+import random
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import sync_service
+from app.services.sync_service import LocalFolderTransport, SyncWorker
+
+logging.disable(logging.WARNING)
+
+ITEMS = 40_000
+A_COST_EDITS = 40_000
+A_MOVEMENT_BATCHES = 600
+MOVEMENTS_PER_BATCH = 100
+B_NAME_EDITS = 20_000
+B_COST_EDITS = 5_000
+B_MOVEMENT_BATCHES = 50
+BATCH_SIZE = 5000
+
+
+def _use(path: str):
+    database.set_database_path(path)
+    database.initialize_database()
+
+
+def _worker(cloud: str) -> SyncWorker:
+    return SyncWorker(LocalFolderTransport(cloud), batch_size=BATCH_SIZE, pull_limit=50)
+
+
+def _movements(rng: random.Random, item_ids: list, batches: int, tipo: str):
+    for _ in range(batches):
+        picked = rng.sample(item_ids, MOVEMENTS_PER_BATCH)
+        deltas = {item_id: float(rng.randint(1, 12)) for item_id in picked}
+        queries.apply_stock_movements(
+            [(item_id, 1, 1, tipo, quantity, None) for item_id, quantity in deltas.items()],
+            {(item_id, 1): quantity for item_id, quantity in deltas.items()}, deltas,
+        )
+
+
+def _bulk_update(sql: str, params: list):
+    with database.db_connection() as conn:
+        with conn:
+            conn.executemany(sql, params)
+
+
+def _snapshot() -> dict:
+    with database.db_connection() as conn:
+        return {
+            "itens": conn.execute("SELECT id, nome, id_categoria, custo_unitario FROM itens ORDER BY id").fetchall(),
+            "movimentacoes": conn.execute("SELECT COUNT(*), SUM(quantidade) FROM movimentacoes_estoque").fetchone(),
+            "saldos": queries.get_materialized_balances(),
+        }
+
+
+def main():
+    rng = random.Random(22)
+    merge_time = [0.0, 0]
+    pure_merge = sync_service.merge_remote_tables
+
+    def timed_merge(tables, state, local_node, remote_node):
+        t0 = time.perf_counter()
+        result = pure_merge(tables, state, local_node, remote_node)
+        merge_time[0] += time.perf_counter() - t0
+        merge_time[1] += sum(len(t.get("linhas") or []) + len(t.get("apagadas") or []) for t in tables)
+        return result
+    sync_service.merge_remote_tables = timed_merge
+
+    with tempfile.TemporaryDirectory() as tmp:
+        a_path, b_path, cloud = (os.path.join(tmp, name) for name in ("a.db", "b.db", "nuvem"))
+
+        # Cadastro comum: A cria e envia, B recebe.
+        _use(a_path)
+        queries.create_user("Bench", "bench@local", "hash")
+        queries.complete_onboarding(1, "Bench", "Bar Bench", "Estoque Geral")
+        queries.bulk_seed([f"Categoria {n}" for n in range(20)], [("Unidade", "un")],
+                          [(f"Item {n:05d}", f"Categoria {n % 20}", "Unidade") for n in range(ITEMS)])
+        item_ids = [item["id"] for item in queries.get_all_items_with_details()]
+        _worker(cloud).sync_once()
+        _use(b_path)
+        _worker(cloud).sync_once()
+        x, y, z = item_ids[:3]
+        busy = item_ids[3:]
+
+        # Desconectados. A: custo de X, Y e de muitos itens, exclui Z, movimenta o estoque.
+        _use(a_path)
+        queries.update_item_cost(x, 11.0)
+        queries.update_item_cost(y, 1.0)
+        queries.delete_item(z)
+        a_costs = {item_id: round(rng.uniform(1, 80), 2) for item_id in rng.sample(busy, A_COST_EDITS - 3)}
+        _bulk_update("UPDATE itens SET custo_unitario = ? WHERE id = ?", [(c, i) for i, c in a_costs.items()])
+        _movements(rng, busy, A_MOVEMENT_BATCHES, "compra")
+        a_pending = sync_service.pending_count()
+
+        # B (depois): renomeia X, muda o custo de Y, edita Z, renomeia e recustea outros itens.
+        time.sleep(0.01)
+        _use(b_path)
+        queries.update_item(x, "Item X renomeado em B", 1, 1)
+        queries.update_item_cost(y, 2.0)
+        queries.update_item_cost(z, 99.0)
+        renamed = rng.sample(busy, B_NAME_EDITS)
+        _bulk_update("UPDATE itens SET nome = nome || ' (B)' WHERE id = ?", [(i,) for i in renamed])
+        b_costs = {item_id: 0.5 for item_id in rng.sample(busy, B_COST_EDITS)}
+        _bulk_update("UPDATE itens SET custo_unitario = ? WHERE id = ?", [(c, i) for i, c in b_costs.items()])
+        _movements(rng, busy, B_MOVEMENT_BATCHES, "venda")
+        b_pending = sync_service.pending_count()
+
+        # Reencontro: B envia, A envia e recebe, B recebe (a junção grande) e A recebe o resto.
+        _worker(cloud).sync_once()
+        _use(a_path)
+        _worker(cloud).sync_once()
+        _use(b_path)
+        merge_time[:] = [0.0, 0]
+        big = _worker(cloud).sync_once()
+        big_merge = tuple(merge_time)
+        b_state = _snapshot()
+        b_item = {row[0]: row for row in b_state["itens"]}
+        _use(a_path)
+        _worker(cloud).sync_once()
+        a_state = _snapshot()
+        database.close_pool()
+
+    sync_service.merge_remote_tables = pure_merge
+    expected_costs = {**a_costs, **b_costs}
+    checks = {
+        "campos diferentes (X: custo de A + nome de B)": b_item[x][1:] == ("Item X renomeado em B", 1, 11.0),
+        "mesmo campo (Y: vence a edição mais nova, de B)": b_item[y][3] == 2.0,
+        "exclusão x edição (Z continua apagado)": z not in b_item,
+        "custos de A e de B (B mais novo nos conflitos)": all(b_item[i][3] == c for i, c in expected_costs.items()),
+        "nomes editados em B": all(b_item[i][1].endswith(" (B)") for i in renamed),
+        "livro com as movimentações dos dois": b_state["movimentacoes"][0] ==
+            (A_MOVEMENT_BATCHES + B_MOVEMENT_BATCHES) * MOVEMENTS_PER_BATCH,
+        "A e B convergiram (itens, livro e saldos)": a_state == b_state,
+    }
+    for label, ok in checks.items():
+        print(f"{label:<52} {'ok' if ok else 'FALHOU'}")
+    print(f"Pendentes: A {a_pending:,} mudanças, B {b_pending:,}.")
+    print(f"B recebeu {big['linhas_recebidas']:,} linhas em {big['lotes_recebidos']} lotes: "
+          f"{big['segundos']:.2f} s no total; junção pura {big_merge[0]:.2f} s "
+          f"({big_merge[1] / max(big_merge[0], 1e-9):,.0f} linhas/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# =================================================================================
+# BENCHMARK: BANCOS POR ESTABELECIMENTO (bench_tenants.py)
+# Local: benchmarks/bench_tenants.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_tenants
+# Cria 200 estabelecimentos (um arquivo de banco cada) e mede a latência das
+# consultas roteadas por database.use_establishment(), com 8 threads, contra o
+# mesmo volume em um banco único, com acesso uniforme e concentrado, com todos
+# os pools abertos e com um LRU menor que o número de estabelecimentos. Confere
+# também que nenhum estabelecimento enxerga dados de outro.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from app.database import database, queries
+from app.services.barcode_service import barcode_cache
+
+logging.disable(logging.INFO)
+
+TENANTS = 200
+ITEMS_PER_TENANT = 1000
+MOVEMENT_BATCHES = 10
+MOVEMENTS_PER_BATCH = 50
+THREADS = 8
+REQUESTS_PER_THREAD = 1500
+HOT_TENANTS = 20
+HOT_SHARE = 0.8
+SMALL_LRU = 50
+
+
+def _seed(rng: random.Random, tenant: int = None):
+    prefix = f"T{tenant}" if tenant is not None else "Principal"
+    queries.create_user("Bench", "bench@local", "hash")
+    queries.complete_onboarding(1, "Bench", f"Bar {prefix}", "Estoque Geral")
+    queries.bulk_seed([f"{prefix} Categoria {n}" for n in range(20)], [("Unidade", "un")],
+                      [(f"{prefix} Item {n:04d}", f"{prefix} Categoria {n % 20}", "Unidade")
+                       for n in range(ITEMS_PER_TENANT)])
+    for _ in range(MOVEMENT_BATCHES):
+        picked = rng.sample(range(1, ITEMS_PER_TENANT + 1), MOVEMENTS_PER_BATCH)
+        queries.apply_stock_movements([(item_id, 1, 1, "compra", 6.0, None) for item_id in picked],
+                                      {(item_id, 1): 6.0 for item_id in picked}, {item_id: 6.0 for item_id in picked})
+
+
+def _request(tenant, rng: random.Random, timings: dict):
+    t0 = time.perf_counter()
+    if tenant is None:
+        queries.get_stock_balance(rng.randint(1, ITEMS_PER_TENANT), 1)
+    else:
+        with database.use_establishment(tenant):
+            queries.get_stock_balance(rng.randint(1, ITEMS_PER_TENANT), 1)
+    timings["saldo"].append(time.perf_counter() - t0)
+    if rng.random() < 0.1:
+        t0 = time.perf_counter()
+        if tenant is None:
+            queries.get_all_items_with_details()
+        else:
+            with database.use_establishment(tenant):
+                queries.get_all_items_with_details()
+        timings["lista"].append(time.perf_counter() - t0)
+
+
+def _run(label: str, pick_tenant):
+    timings = {"saldo": [], "lista": []}
+    lock = threading.Lock()
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        local = {"saldo": [], "lista": []}
+        for _ in range(REQUESTS_PER_THREAD):
+            _request(pick_tenant(rng), rng, local)
+        with lock:
+            for key, values in local.items():
+                timings[key].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+
+    def pct(values, q):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(q * len(values)))] * 1000
+    point, listing = timings["saldo"], timings["lista"]
+    print(f"{label:<40} {len(point) / elapsed:8,.0f} req/s | saldo p50 {statistics.median(point) * 1000:5.2f} "
+          f"p99 {pct(point, 0.99):6.2f} ms | lista de itens p50 {statistics.median(listing) * 1000:5.1f} "
+          f"p99 {pct(listing, 0.99):6.1f} ms | pools abertos {len(database._tenant_pools)}")
+
+
+def main():
+    rng = random.Random(24)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "principal.db"))
+        database.set_tenant_directory(os.path.join(tmp, "estabelecimentos"))
+        database.initialize_database()
+        _seed(rng)
+
+        t0 = time.perf_counter()
+        for tenant in range(1, TENANTS + 1):
+            with database.use_establishment(tenant):
+                _seed(rng, tenant)
+        print(f"{TENANTS} estabelecimentos x {ITEMS_PER_TENANT} itens criados em {time.perf_counter() - t0:.1f} s "
+              f"({THREADS} threads, {REQUESTS_PER_THREAD} pedidos cada; 10% também listam os itens).")
+
+        isolated = True
+        for tenant in rng.sample(range(1, TENANTS + 1), 20):
+            with database.use_establishment(tenant):
+                names = [item["nome"] for item in queries.get_all_items_with_details()]
+            isolated &= len(names) == ITEMS_PER_TENANT and all(name.startswith(f"T{tenant} ") for name in names)
+        print(f"Isolamento (20 estabelecimentos sorteados): {'ok' if isolated else 'FALHOU'}")
+
+        # Caches dos serviços: o mesmo código de barras em dois estabelecimentos,
+        # e uma edição em um deles invalida só o cache dele.
+        for tenant in (1, 2):
+            with database.use_establishment(tenant):
+                queries.update_item(1, f"T{tenant} Item 0000", 1, 1, codigo_barras="7890000000001")
+                barcode_cache.lookup("7890000000001")
+        with database.use_establishment(2):
+            queries.update_item(1, "T2 Item renomeado", 1, 1)
+        found = {}
+        for tenant in (1, 2):
+            with database.use_establishment(tenant):
+                found[tenant] = (barcode_cache.lookup("7890000000001") or {}).get("nome")
+        cache_ok = found == {1: "T1 Item 0000", 2: "T2 Item renomeado"} and barcode_cache.lookup("7890000000001") is None
+        print(f"Isolamento dos caches (código de barras em 2 estabelecimentos): {'ok' if cache_ok else 'FALHOU'}")
+
+        _run("banco único (sem estabelecimento)", lambda r: None)
+        _run(f"{TENANTS} bancos, uniforme", lambda r: r.randint(1, TENANTS))
+        _run(f"{TENANTS} bancos, {HOT_SHARE:.0%} em {HOT_TENANTS}",
+             lambda r: r.randint(1, HOT_TENANTS) if r.random() < HOT_SHARE else r.randint(1, TENANTS))
+        # Mais estabelecimentos que pools abertos: o LRU fecha e reabre arquivos.
+        default_limit = database.TENANT_MAX_POOLS
+        database.TENANT_MAX_POOLS = SMALL_LRU
+        database.close_tenant_pools()
+        _run(f"{TENANTS} bancos, LRU {SMALL_LRU}, uniforme", lambda r: r.randint(1, TENANTS))
+        database.close_tenant_pools()
+        _run(f"{TENANTS} bancos, LRU {SMALL_LRU}, {HOT_SHARE:.0%} em {HOT_TENANTS}",
+             lambda r: r.randint(1, HOT_TENANTS) if r.random() < HOT_SHARE else r.randint(1, TENANTS))
+        database.TENANT_MAX_POOLS = default_limit
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# =================================================================================
+# BENCHMARK: RELATÓRIO DE DIVERGÊNCIAS DE CONTAGEM (bench_variance_report.py)
+# Local: benchmarks/bench_variance_report.py
+# Execução (na raiz do projeto): python -m benchmarks.bench_variance_report
+# O relatório sobre 1 milhão de linhas de contagem_itens deve sair em menos de 1 s.
+# =================================================================================
+
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.database import database, queries
+from app.services import variance_report_service as report_service
+
+logging.disable(logging.INFO)
+
+ITEMS = 2000
+CATEGORIES = 20
+LOCATIONS = 2
+COUNTS = 500  # 500 contagens x 2000 itens = 1 milhão de linhas
+RUNS = 5
+
+
+def _setup(rng: random.Random):
+    database.initialize_database()
+    categories = [f"Categoria {n}" for n in range(CATEGORIES)]
+    queries.bulk_seed(categories, [("Unidade", "un")],
+                      [(f"Item SKU{i:x}", categories[i % CATEGORIES], "Unidade") for i in range(ITEMS)])
+    queries.create_user("Bench", "bench@local", "hash")
+    user_id = queries.get_user_by_email("bench@local")["id"]
+    queries.complete_onboarding(user_id, "Bench", "Bar Bench", "Estoque Geral")
+    with database.db_connection() as conn:
+        with conn:
+            conn.executemany("INSERT INTO locais_estoque (id_estabelecimento, nome) VALUES (1, ?)",
+                             [(f"Local {n}",) for n in range(2, LOCATIONS + 1)])
+            conn.executemany("UPDATE itens SET custo_unitario = ? WHERE id = ?",
+                             [(round(rng.uniform(1, 80), 2), item_id) for item_id in range(1, ITEMS + 1)])
+            conn.executemany(
+                "INSERT INTO contagens (id_local_estoque, id_usuario, data_contagem) VALUES (?, ?, ?)",
+                [(1 + n % LOCATIONS, user_id, f"2024-{1 + n % 12:02d}-{1 + n % 28:02d} 08:00:00")
+                 for n in range(COUNTS)],
+            )
+            conn.executemany(
+                """
+                INSERT INTO contagem_itens (id_contagem, id_item, quantidade_contada, quantidade_sistema)
+                VALUES (?, ?, ?, ?)
+                """,
+                ((count_id, item_id, rng.randint(0, 20), rng.randint(0, 20))
+                 for count_id in range(1, COUNTS + 1) for item_id in range(1, ITEMS + 1)),
+            )
+
+
+def main():
+    rng = random.Random(14)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.set_database_path(os.path.join(tmp, "report.db"))
+        _setup(rng)
+
+        samples = []
+        for _ in range(RUNS):
+            t0 = time.perf_counter()
+            report = report_service.build_variance_report()
+            samples.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        headers, table_rows = report_service.as_table(report["itens"])
+        report_service.write_csv(report["itens"], os.path.join(tmp, "divergencias.csv"))
+        output_ms = (time.perf_counter() - t0) * 1000
+
+        engine = "NumPy" if report_service.np is not None else "array (sem NumPy)"
+        print(f"{COUNTS * ITEMS:,} linhas de contagem_itens, cálculo com {engine}")
+        print(f"Relatório (itens, categorias, locais): mediana {statistics.median(samples) * 1000:6.0f} ms, "
+              f"pior {max(samples) * 1000:6.0f} ms")
+        print(f"Tabela + CSV de {len(table_rows)} itens: {output_ms:.0f} ms")
+        worst = report["locais"][0]
+        print(f"Maior perda por local: {worst['nome']} {worst['perda_pct']}% (R$ {worst['valor_perda']:.2f})")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
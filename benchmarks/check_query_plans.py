@@ -0,0 +1,99 @@
+# =================================================================================
+# VERIFICAÇÃO DOS PLANOS DE CONSULTA (check_query_plans.py)
+# Local: benchmarks/check_query_plans.py
+# Execução (na raiz do projeto): python -m benchmarks.check_query_plans
+# Falha (código de saída 1) se alguma consulta quente voltar a fazer table scan.
+# =================================================================================
+
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+
+from app.database import database
+from app.database.migrations import LATEST_VERSION, explain_query_plan, get_schema_version
+
+logging.disable(logging.INFO)
+
+# (descrição, SQL, parâmetros, índice esperado no plano)
+HOT_QUERIES = [
+    ("has_establishment / get_establishment_by_user_id",
+     "SELECT * FROM estabelecimentos WHERE id_usuario = ?", (1,),
+     "idx_estabelecimentos_id_usuario"),
+    ("locais de um estabelecimento",
+     "SELECT * FROM locais_estoque WHERE id_estabelecimento = ?", (1,),
+     "idx_locais_estoque_id_estabelecimento"),
+    ("movimentações de um item por período",
+     "SELECT * FROM movimentacoes_estoque WHERE id_item = ? AND data_movimentacao >= ?", (1, "2024-01-01"),
+     "idx_movimentacoes_item_data"),
+    ("movimentações por data",
+     "SELECT * FROM movimentacoes_estoque WHERE data_movimentacao >= ?", ("2024-01-01",),
+     "idx_movimentacoes_data"),
+    ("itens de uma contagem",
+     "SELECT * FROM contagem_itens WHERE id_contagem = ?", (1,),
+     "idx_contagem_itens_contagem_item"),
+    ("histórico de contagens de um item",
+     "SELECT * FROM contagem_itens WHERE id_item = ?", (1,),
+     "idx_contagem_itens_item_quantidades"),
+    ("ingredientes de uma ficha técnica",
+     "SELECT * FROM ficha_tecnica_itens WHERE id_ficha_tecnica = ?", (1,),
+     "idx_ficha_tecnica_itens_ficha"),
+    ("página de itens (keyset em nome, id)",
+     "SELECT id, nome FROM itens WHERE (nome, id) > (?, ?) ORDER BY nome, id LIMIT 50", ("Gin", 10),
+     "sqlite_autoindex_itens_1"),
+    ("busca por código de barras",
+     "SELECT * FROM itens WHERE codigo_barras = ?", ("7891234567890",),
+     "idx_itens_codigo_barras"),
+    ("fotografia de saldos mais recente até uma data",
+     "SELECT id, id_ultima_movimentacao FROM snapshots_estoque WHERE id_local_estoque = ? AND data_snapshot <= ? "
+     "ORDER BY data_snapshot DESC, id DESC LIMIT 1", (1, "2024-01-03 23:59:59"),
+     "idx_snapshots_estoque_local_data"),
+    ("movimentações de um item após a fotografia",
+     "SELECT SUM(quantidade) FROM movimentacoes_estoque WHERE id_local_estoque = ? AND id > ? AND id_item = ?",
+     (1, 1000, 1), "idx_movimentacoes_local_item"),
+]
+
+
+def check_plans(conn: sqlite3.Connection) -> list:
+    """Retorna a lista de falhas (vazia se todas as consultas usam o índice esperado)."""
+    failures = []
+    for label, sql, params, index_name in HOT_QUERIES:
+        plan = explain_query_plan(conn, sql, params)
+        uses_index = any(index_name in detail for detail in plan)
+        full_scan = any(detail.startswith("SCAN") for detail in plan)
+        status = "OK" if uses_index and not full_scan else "FALHOU"
+        print(f"[{status}] {label}: {' | '.join(plan)}")
+        if status != "OK":
+            failures.append(label)
+    return failures
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "plans.db")
+
+        # Simula um dose_certa.db antigo: tabelas criadas sem índices (user_version 0).
+        legacy = sqlite3.connect(db_path)
+        for table_sql in database.CREATE_TABLES_SQL:
+            legacy.execute(table_sql)
+        legacy.commit()
+        legacy.close()
+
+        database.set_database_path(db_path)
+        database.initialize_database()
+        with database.db_connection() as conn:
+            version = get_schema_version(conn)
+            assert version == LATEST_VERSION, f"user_version {version} != {LATEST_VERSION}"
+            failures = check_plans(conn)
+        database.close_pool()
+
+    if failures:
+        print(f"{len(failures)} consulta(s) fazendo table scan.")
+        return 1
+    print(f"Todas as consultas usam índices (esquema na versão {LATEST_VERSION}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
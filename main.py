@@ -3,16 +3,20 @@
 # =================================================================================
 import flet as ft
 import logging
-from app.services import auth_service
+from app.services import startup_service
+from app.services import stock_ledger_service
+from app.services import order_intake_service
+from app.services import backup_service
+from app.services import menu_export_service
+from app.services.barcode_service import barcode_cache
 from app.views.login_view import create_login_view
 from app.views.onboarding_view import create_onboarding_view
 from app.views.register_view import create_register_view
 from app.views.dashboard_view import create_dashboard_view
 from app.views.cadastros_view import create_cadastros_view
 from app.views.itens_crud_view import ItensCRUDView
-from app.database.seeder import seed_database
 from app.database import queries
-from app.database.database import initialize_database
+from app.database.database import start_checkpoint_scheduler
 from app.styles.style import AppThemes
 
 # Configuração de Logging Detalhada para Depuração
@@ -33,9 +37,13 @@ class DoseCertaApp:
         self.setup_routes()
         
         # Inicialização do banco e dados.
-        initialize_database()
-        auth_service.create_default_user() 
-        seed_database()
+        # Na partida a quente, uma única leitura de metadados substitui tudo isso.
+        startup_service.bootstrap_database()
+        start_checkpoint_scheduler()
+        stock_ledger_service.take_daily_snapshots_in_background()
+        backup_service.take_daily_backup_in_background()
+        # Pedidos do delivery (opcional: DOSE_CERTA_PEDIDOS=1), em thread própria.
+        order_intake_service.start_in_background()
         
         self.page.go("/")
 
@@ -43,7 +51,12 @@ class DoseCertaApp:
 
     def on_login_success(self, user: dict):
         self.current_user = user
+        # Aquece o cache de códigos de barras para as contagens com leitor.
+        barcode_cache.warm_in_background()
         if queries.has_establishment(user['id']):
+            # Mantém o cardápio digital (pasta cardapio_digital) atualizado a cada escrita no cardápio.
+            establishment = queries.get_establishment_by_user_id(user['id'])
+            menu_export_service.start_auto_export(establishment["nome"] if establishment else None)
             self.page.go("/dashboard")
         else:
             self.page.go("/onboarding")